@@ -0,0 +1,51 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import mock
+
+from sure import that
+
+from unclebob.runners import Nose
+from unclebob.management.commands import test as command
+
+
+@mock.patch.object(command, 'USE_SOUTH', True)
+@mock.patch.object(command, 'call_command')
+@mock.patch.object(command, 'patch_for_test_db_setup', create=True)
+@mock.patch('django.test.utils.get_runner')
+def test_south_still_gets_patched_for_unclebob(get_runner, patch, call):
+    u"the test command patches south's syncdb but leaves migrating to Nose"
+
+    runner = mock.Mock(spec=Nose)
+    runner.run_tests.return_value = 0
+    get_runner.return_value = type('Runner', (Nose,), {
+        '__new__': lambda cls, **kw: runner,
+    })
+
+    command.Command().handle(verbosity=1)
+
+    patch.assert_called_once_with()
+    assert that(call.call_count).equals(0)
+    runner.run_tests.assert_called_once_with((), verbosity=1)
@@ -0,0 +1,126 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+from mock import Mock, patch
+from sure import that
+from django.conf import settings
+
+from unclebob import cover
+from unclebob.runners import Nose
+
+
+def test_get_packages_reads_the_cover_package_arguments():
+    u"get_packages returns the packages of every --cover-package argument"
+
+    nose_argv = [
+        'nosetests', '-s', '--cover-inclusive',
+        '--cover-package="app_one"',
+        '--cover-package=app_two',
+    ]
+    assert that(cover.get_packages(nose_argv)).equals(['app_one', 'app_two'])
+
+
+def test_without_nose_coverage_leaves_the_cover_arguments():
+    u"without_nose_coverage only takes nose's coverage plugin out"
+
+    nose_argv = [
+        'nosetests', '-s', '--with-coverage', '--cover-inclusive',
+        '--cover-package="app_one"',
+    ]
+    assert that(cover.without_nose_coverage(nose_argv)).equals([
+        'nosetests', '-s', '--cover-inclusive', '--cover-package="app_one"',
+    ])
+
+
+@patch.object(cover, 'coverage')
+@patch.object(cover, 'cache')
+@patch.object(cover, 'glob')
+@patch.object(cover.os, 'remove')
+def test_measurement_start_erases_older_data_files(remove, glob, cache,
+                                                   coverage):
+    u"Measurement.start removes the data files of older runs"
+
+    cache.writable_path.return_value = '/cache/coverage/.coverage'
+    glob.return_value = ['/cache/coverage/.coverage.host.1.2']
+
+    measurement = cover.Measurement(['app_one'])
+    measurement.start()
+
+    cache.writable_path.assert_called_once_with('coverage', '.coverage')
+    coverage.Coverage.assert_called_once_with(
+        data_file='/cache/coverage/.coverage', data_suffix=True,
+        branch=False, timid=False, source=['app_one'])
+    glob.assert_called_once_with('/cache/coverage/.coverage*')
+    remove.assert_called_once_with('/cache/coverage/.coverage.host.1.2')
+    coverage.Coverage.return_value.start.assert_called_once_with()
+
+
+@patch.object(cover, 'coverage')
+@patch.object(cover, 'cache')
+def test_measurement_combine_writes_the_reports(cache, coverage):
+    u"Measurement.combine saves, combines and writes the html and xml reports"
+
+    cache.writable_path.return_value = '/cache/coverage/.coverage'
+    measured, combined = Mock(), Mock()
+    coverage.Coverage.side_effect = [measured, combined]
+    settings.UNCLEBOB_COVERAGE_HTML = '/reports/html'
+    settings.UNCLEBOB_COVERAGE_XML = '/reports/coverage.xml'
+    try:
+        measurement = cover.Measurement(['app_one'])
+        assert that(measurement.combine()).equals(combined)
+    finally:
+        del settings.UNCLEBOB_COVERAGE_HTML
+        del settings.UNCLEBOB_COVERAGE_XML
+
+    measured.stop.assert_called_once_with()
+    measured.save.assert_called_once_with()
+
+    coverage.Coverage.assert_called_with(
+        data_file='/cache/coverage/.coverage', source=['app_one'])
+    combined.combine.assert_called_once_with()
+    combined.html_report.assert_called_once_with(directory='/reports/html')
+    combined.xml_report.assert_called_once_with(
+        outfile='/reports/coverage.xml')
+
+
+@patch.object(cover, 'coverage', None)
+def test_start_measuring_coverage_needs_the_coverage_package():
+    u"without the coverage package the tests run without measuring"
+
+    runner = Nose()
+    measurement = runner.start_measuring_coverage(
+        {'coverage': True}, ['nosetests', '--cover-package="app_one"'])
+    assert that(measurement).equals(None)
+
+
+@patch.object(cover, 'Measurement')
+def test_start_measuring_coverage_only_when_asked(Measurement):
+    u"start_measuring_coverage does nothing without --coverage"
+
+    runner = Nose()
+    assert that(runner.start_measuring_coverage(
+        {'coverage': False}, ['nosetests'])).equals(None)
+    assert that(Measurement.called).equals(False)
@@ -0,0 +1,206 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import mock
+import shutil
+import tempfile
+
+from sure import that, that_with_context
+from django.conf import settings
+
+from unclebob import databases
+
+
+def make_connection(alias, engine, name):
+    connection = mock.Mock()
+    connection.alias = alias
+    connection.settings_dict = {'ENGINE': engine, 'NAME': name}
+    return connection
+
+
+def prepare_a_template(context, *args, **kw):
+    context.directory = tempfile.mkdtemp()
+    context.template = os.path.join(context.directory, 'test_uncle.bob')
+    open(context.template, 'w').write('migrated schema')
+
+    context.connection = make_connection(
+        'default', 'django.db.backends.sqlite3', context.template)
+    context.old_databases = settings.DATABASES
+    settings.DATABASES = {'default': {'NAME': context.template}}
+
+
+def and_remove_it(context, *args, **kw):
+    settings.DATABASES = context.old_databases
+    shutil.rmtree(context.directory)
+
+
+def test_get_clone_name_keeps_the_extension():
+    u"get_clone_name suffixes the name with the worker index"
+
+    assert that(databases.get_clone_name('/tmp/uncle.bob', 2)).equals(
+        '/tmp/uncle_worker2.bob')
+    assert that(databases.get_clone_name('test_uncle', 0)).equals(
+        'test_uncle_worker0')
+
+
+def test_in_memory_databases_are_not_cloned():
+    u"TemplateClones leaves in-memory sqlite databases for fork to copy"
+
+    connection = make_connection(
+        'default', 'django.db.backends.sqlite3', ':memory:')
+
+    with mock.patch.object(databases, 'connections', {'default': connection}):
+        clones = databases.TemplateClones(([(connection, 'uncle.bob', True)],
+                                           {}))
+        assert that(clones.get_aliases()).equals([])
+
+
+def test_get_unclonable_engines():
+    u"get_unclonable_engines names the engines that have no clone_database"
+
+    connections = [
+        make_connection('default', 'django.db.backends.sqlite3', 'a'),
+        make_connection('other', 'django.db.backends.mysql', 'b'),
+        make_connection('more', 'django.db.backends.mysql', 'c'),
+        make_connection('pg', 'django.db.backends.postgresql_psycopg2', 'd'),
+    ]
+
+    with mock.patch.object(databases, 'get_test_connections',
+                           return_value=connections):
+        assert that(databases.get_unclonable_engines()).equals(
+            ['django.db.backends.mysql'])
+
+
+@that_with_context(prepare_a_template, and_remove_it)
+def test_sqlite_template_is_copied_per_worker(context):
+    u"TemplateClones copies a sqlite test database file once per worker"
+
+    fake_connections = mock.Mock()
+    fake_connections.all.return_value = [context.connection]
+    fake_connections.__getitem__ = lambda self, alias: context.connection
+
+    with mock.patch.object(databases, 'connections', fake_connections):
+        clones = databases.TemplateClones(
+            ([(context.connection, 'uncle.bob', True)], {}))
+        clones.create(2)
+
+        first, second = clones.clones['default']
+        assert that(open(first).read()).equals('migrated schema')
+        assert that(open(second).read()).equals('migrated schema')
+
+        clones.prepare(1)
+        assert that(context.connection.settings_dict['NAME']).equals(second)
+        assert that(settings.DATABASES['default']['NAME']).equals(second)
+
+        clones.drop()
+        assert not os.path.exists(first)
+        assert not os.path.exists(second)
+
+
+@mock.patch.object(databases, 'get_maintenance_connection')
+def test_postgresql_is_cloned_from_a_template(get_maintenance_connection):
+    u"clone_database uses CREATE DATABASE ... TEMPLATE on postgresql"
+
+    connection = make_connection(
+        'default', 'django.db.backends.postgresql_psycopg2', 'test_uncle')
+    maintenance = get_maintenance_connection.return_value
+    maintenance.ops.quote_name = lambda name: '"%s"' % name
+    cursor = maintenance.cursor.return_value
+
+    clone = databases.clone_database(connection, 'uncle', 3)
+
+    assert that(clone).equals('test_uncle_worker3')
+    get_maintenance_connection.assert_called_once_with(connection, 'uncle')
+    cursor.execute.assert_called_with(
+        'CREATE DATABASE "test_uncle_worker3" TEMPLATE "test_uncle"')
+
+
+def prepare_an_app(context, *args, **kw):
+    context.app = tempfile.mkdtemp()
+    os.makedirs(os.path.join(context.app, 'migrations'))
+    open(os.path.join(context.app, 'models.py'), 'w').write('# models')
+    open(os.path.join(context.app, 'migrations', '0001_initial.py'),
+         'w').write('# initial')
+    open(os.path.join(context.app, 'views.py'), 'w').write('# views')
+
+
+def and_remove_the_app(context, *args, **kw):
+    shutil.rmtree(context.app)
+
+
+@that_with_context(prepare_an_app, and_remove_the_app)
+def test_find_schema_files_takes_models_and_migrations(context):
+    u"find_schema_files lists the models and the migrations of an app"
+
+    assert that(databases.find_schema_files(context.app)).equals([
+        os.path.join(context.app, 'models.py'),
+        os.path.join(context.app, 'migrations', '0001_initial.py'),
+    ])
+
+
+@mock.patch.object(databases, 'get_test_connections')
+@that_with_context(prepare_an_app, and_remove_the_app)
+def test_fingerprint_changes_with_the_migrations(context, get_connections):
+    u"get_fingerprint changes when a migration changes, but not for views"
+
+    get_connections.return_value = []
+    before = databases.get_fingerprint([context.app])
+
+    open(os.path.join(context.app, 'views.py'), 'w').write('# changed')
+    assert that(databases.get_fingerprint([context.app])).equals(before)
+
+    open(os.path.join(context.app, 'migrations', '0002_more.py'),
+         'w').write('# more')
+    assert databases.get_fingerprint([context.app]) != before
+
+
+@mock.patch.object(databases, 'get_test_connections')
+@that_with_context(prepare_an_app, and_remove_the_app)
+def test_fingerprint_changes_with_the_installed_apps(context,
+                                                     get_connections):
+    u"get_fingerprint changes when an app gets installed or removed"
+
+    get_connections.return_value = []
+    old_apps = settings.INSTALLED_APPS
+    try:
+        before = databases.get_fingerprint([context.app])
+        settings.INSTALLED_APPS = list(old_apps) + ['django.contrib.admin']
+        assert databases.get_fingerprint([context.app]) != before
+    finally:
+        settings.INSTALLED_APPS = old_apps
+
+
+@mock.patch.object(databases, 'get_test_connections')
+@mock.patch.object(databases.cache, 'read')
+def test_is_up_to_date_compares_the_stored_fingerprint(read, get_connections):
+    u"is_up_to_date needs the same fingerprint and existing databases"
+
+    get_connections.return_value = []
+    read.return_value = 'abc'
+
+    assert that(databases.is_up_to_date('abc')).equals(True)
+    assert that(databases.is_up_to_date('def')).equals(False)
+    read.assert_called_with(databases.FINGERPRINT_FILE)
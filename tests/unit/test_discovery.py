@@ -0,0 +1,179 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import imp
+import json
+import mock
+import shutil
+import tempfile
+
+from os.path import abspath, dirname, join
+from sure import that, that_with_context
+
+from unclebob import discovery
+
+LOCAL_FILE = lambda *path: join(abspath(dirname(__file__)), *path)
+PROJECT_FILE = lambda *path: abspath(LOCAL_FILE('..', '..', *path))
+
+
+def test_find_test_modules_walks_the_test_directories():
+    u"find_test_modules lists the test modules under the given paths"
+
+    modules = discovery.find_test_modules([
+        PROJECT_FILE('apps', 'foo', 'tests'),
+        PROJECT_FILE('bar', 'tests', 'unit', 'test_bar.py'),
+    ])
+
+    assert that(modules).equals([
+        PROJECT_FILE('apps', 'foo', 'tests', 'functional', 'test_foo.py'),
+        PROJECT_FILE('apps', 'foo', 'tests', 'integration', 'test_foo.py'),
+        PROJECT_FILE('apps', 'foo', 'tests', 'unit', 'test_foo.py'),
+        PROJECT_FILE('bar', 'tests', 'unit', 'test_bar.py'),
+    ])
+
+
+def prepare_a_tree(context, *args, **kw):
+    context.root = tempfile.mkdtemp()
+    context.unit = join(context.root, 'tests', 'unit')
+    os.makedirs(context.unit)
+    open(join(context.root, 'tests', '__init__.py'), 'w').close()
+    open(join(context.unit, '__init__.py'), 'w').close()
+    open(join(context.unit, 'test_one.py'), 'w').close()
+    open(join(context.unit, '_test_ignored.py'), 'w').close()
+    open(join(context.unit, 'helpers.py'), 'w').close()
+
+
+def and_remove_it(context, *args, **kw):
+    shutil.rmtree(context.root)
+
+
+@that_with_context(prepare_a_tree, and_remove_it)
+def test_walk_test_modules_takes_the_directory_mtimes(context):
+    u"walk_test_modules lists the test modules and the directory mtimes"
+
+    modules, directories = discovery.walk_test_modules(context.root)
+
+    assert that(modules).equals([join(context.unit, 'test_one.py')])
+    assert that(sorted(directories)).equals([
+        context.root,
+        join(context.root, 'tests'),
+        context.unit,
+    ])
+
+
+@that_with_context(prepare_a_tree, and_remove_it)
+def test_index_skips_walking_fresh_directories(context):
+    u"DiscoveryIndex only walks again when a directory mtime changes"
+
+    index = discovery.DiscoveryIndex()
+    first = index.get_test_modules(context.root)
+    assert that(index.dirty).equals(True)
+
+    index.dirty = False
+    with mock.patch.object(discovery, 'walk_test_modules') as walk:
+        assert that(index.get_test_modules(context.root)).equals(first)
+        assert that(walk.call_count).equals(0)
+
+    open(join(context.unit, 'test_two.py'), 'w').close()
+    os.utime(context.unit, (0, 0))
+
+    assert that(index.get_test_modules(context.root)).equals([
+        join(context.unit, 'test_one.py'),
+        join(context.unit, 'test_two.py'),
+    ])
+    assert that(index.dirty).equals(True)
+
+
+@that_with_context(prepare_a_tree, and_remove_it)
+def test_walk_test_modules_follows_the_nose_arguments(context):
+    u"walk_test_modules leaves out what --ignore-files and --match rule out"
+
+    open(join(context.unit, 'test_two.py'), 'w').close()
+    open(join(context.unit, 'check_three.py'), 'w').close()
+
+    selector = discovery.get_selector([
+        # like in nose, these replace its default ^_ and ^\. patterns
+        'nosetests', '--exe', '--ignore-files=^_', '--ignore-files=^test_one',
+        '--cover-package="unclebob"',
+    ])
+    modules, _ = discovery.walk_test_modules(context.root, selector)
+    assert that(modules).equals([join(context.unit, 'test_two.py')])
+
+    selector = discovery.get_selector(['nosetests', '--match=^check'])
+    modules, _ = discovery.walk_test_modules(context.root, selector)
+    assert that(modules).equals([join(context.unit, 'check_three.py')])
+
+
+@mock.patch.object(discovery, 'cache')
+def test_index_forgets_the_test_modules_of_other_nose_arguments(cache):
+    u"DiscoveryIndex.load drops the modules found with other nose arguments"
+
+    tests = {'/apps/foo/tests': {'modules': [], 'directories': {}}}
+    selector = discovery.get_selector(['nosetests'])
+    cache.read.return_value = json.dumps({
+        'apps': {'foo': '/apps/foo'},
+        'tests': tests,
+        'selection': discovery.get_selection(selector),
+    })
+
+    assert that(discovery.DiscoveryIndex.load(selector).tests).equals(tests)
+
+    index = discovery.DiscoveryIndex.load(discovery.get_selector([
+        'nosetests', '--ignore-files=^test_bar',
+    ]))
+    assert that(index.tests).equals({})
+    assert that(index.apps).equals({'foo': '/apps/foo'})
+
+
+@that_with_context(prepare_a_tree, and_remove_it)
+def test_index_forgets_apps_that_are_gone(context):
+    u"DiscoveryIndex.get_app_path ignores paths that are no packages anymore"
+
+    index = discovery.DiscoveryIndex(apps={
+        'tests': join(context.root, 'tests'),
+        'gone': join(context.root, 'gone'),
+    })
+
+    assert that(index.get_app_path('tests')).equals(
+        join(context.root, 'tests'))
+    assert that(index.get_app_path('gone')).equals(None)
+
+
+@mock.patch.object(imp, 'load_module')
+def test_find_app_path_does_not_import_the_app(load_module):
+    u"find_app_path finds packages, dotted or not, without importing them"
+
+    assert that(discovery.find_app_path('unclebob')).equals(
+        PROJECT_FILE('unclebob'))
+    assert that(discovery.find_app_path('unclebob.management')).equals(
+        PROJECT_FILE('unclebob', 'management'))
+    assert that(load_module.call_count).equals(0)
+
+
+def test_find_app_path_of_a_plain_module():
+    u"find_app_path gives the directory of apps that are plain modules"
+
+    assert that(discovery.find_app_path('bourbon')).equals(PROJECT_FILE())
@@ -0,0 +1,107 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from sure import that, that_with_context
+
+from unclebob import failures
+
+THIS_MODULE = os.path.relpath(__file__.replace('.pyc', '.py'))
+
+
+def test_get_test_name_is_what_nose_takes():
+    u"get_test_name turns a test address into a name nose can run"
+
+    filename = os.path.abspath(THIS_MODULE)
+    assert that(failures.get_test_name(
+        (filename, 'tests.unit.test_failures', 'Case.test_a'))).equals(
+        '%s:Case.test_a' % THIS_MODULE)
+    assert that(failures.get_test_name(
+        (filename, 'tests.unit.test_failures', None))).equals(THIS_MODULE)
+    assert that(failures.get_test_name((None, 'foo', None))).equals(None)
+
+
+def prepare_the_cache(context, *args, **kw):
+    context.directory = tempfile.mkdtemp()
+    settings.UNCLEBOB_CACHE_DIR = context.directory
+
+
+def and_remove_it(context, *args, **kw):
+    del settings.UNCLEBOB_CACHE_DIR
+    shutil.rmtree(context.directory)
+
+
+@that_with_context(prepare_the_cache, and_remove_it)
+def test_save_failures_merges_with_the_previous_run(context):
+    u"save_failures forgets the tests that passed and keeps the others"
+
+    first = '%s:test_a' % THIS_MODULE
+    second = '%s:test_b' % THIS_MODULE
+
+    failures.save_failures({first: False, second: False})
+    failures.save_failures({first: True})
+
+    assert that(failures.load_failures()).equals([second])
+
+
+@that_with_context(prepare_the_cache, and_remove_it)
+def test_load_failures_ignores_the_modules_that_are_gone(context):
+    u"load_failures skips the failures of test modules that were removed"
+
+    failures.save_failures({'gone/test_gone.py:test_a': False})
+
+    assert that(failures.load_failures()).equals([])
+
+
+def test_select_failures_keeps_those_under_the_paths():
+    u"select_failures keeps the failures found under the selected paths"
+
+    names = [
+        'apps/foo/tests/unit/test_foo.py:test_a',
+        'apps/foo/tests/functional/test_foo.py:test_b',
+        'apps/foobar/tests/unit/test_foobar.py',
+    ]
+
+    assert that(failures.select_failures(names, [
+        'apps/foo/tests/unit',
+    ])).equals([
+        'apps/foo/tests/unit/test_foo.py:test_a',
+    ])
+    assert that(failures.select_failures(names, ['apps/foo'])).equals(
+        names[:2])
+
+
+def test_failed_first_moves_the_failed_modules_up():
+    u"failed_first runs the modules with failures before the others"
+
+    modules = ['test_a.py', 'test_b.py', 'test_c.py', 'test_d.py']
+    assert that(failures.failed_first(modules, [
+        'test_c.py:Case.test_x',
+        'test_d.py',
+    ])).equals(['test_c.py', 'test_d.py', 'test_a.py', 'test_b.py'])
@@ -0,0 +1,135 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import json
+import mock
+import shutil
+import tempfile
+
+from StringIO import StringIO
+from django.conf import settings
+from sure import that, that_with_context
+
+from unclebob import fixtures
+
+
+def prepare_the_cache(context, *args, **kw):
+    context.directory = tempfile.mkdtemp()
+    settings.UNCLEBOB_CACHE_DIR = context.directory
+
+
+def and_remove_it(context, *args, **kw):
+    del settings.UNCLEBOB_CACHE_DIR
+    shutil.rmtree(context.directory)
+
+
+@mock.patch.object(fixtures, 'is_current', lambda signatures: True)
+@mock.patch.object(fixtures, 'get_signature', lambda model: 'foo.Thing:id')
+@mock.patch.object(fixtures.serializers, 'deserialize')
+@that_with_context(prepare_the_cache, and_remove_it)
+def test_read_objects_deserializes_each_fixture_once(context, deserialize):
+    u"read_objects keeps what was deserialized, keyed by the content"
+
+    deserialize.side_effect = lambda format, content, **kw: [
+        fixtures.serializers.base.DeserializedObject(ValueError(content))]
+
+    first = fixtures.read_objects('json', StringIO('[1]'), using='default')
+    again = fixtures.read_objects('json', StringIO('[1]'), using='default')
+    other = fixtures.read_objects('json', StringIO('[2]'), using='default')
+
+    assert that(deserialize.call_count).equals(2)
+    assert that(str(again[0].object)).equals(str(first[0].object))
+    assert that(str(other[0].object)).equals('[2]')
+
+
+@mock.patch.object(fixtures.serializers, 'deserialize')
+@that_with_context(prepare_the_cache, and_remove_it)
+def test_read_objects_deserializes_natural_keys_every_time(context,
+                                                          deserialize):
+    u"read_objects leaves the fixtures that use natural keys out of the cache"
+
+    deserialize.return_value = []
+    content = json.dumps([{
+        'model': 'auth.permission',
+        'pk': 1,
+        'fields': {'codename': 'add_thing', 'name': 'Can add thing',
+                   'content_type': ['auth', 'user']},
+    }])
+
+    fixtures.read_objects('json', StringIO(content), using='default')
+    fixtures.read_objects('json', StringIO(content), using='default')
+
+    assert that(deserialize.call_count).equals(2)
+
+
+def test_uses_natural_keys_looks_at_the_related_fields():
+    u"uses_natural_keys spots the foreign keys and m2m given by natural key"
+
+    by_pk = [{
+        'model': 'auth.group', 'pk': 1,
+        'fields': {'name': 'staff', 'permissions': [1, 2]},
+    }]
+    by_natural_key = [{
+        'model': 'auth.group', 'pk': 1,
+        'fields': {'name': 'staff',
+                   'permissions': [['add_user', 'auth', 'user']]},
+    }]
+
+    assert that(fixtures.uses_natural_keys(
+        'json', json.dumps(by_pk))).equals(False)
+    assert that(fixtures.uses_natural_keys(
+        'json', json.dumps(by_natural_key))).equals(True)
+    assert that(fixtures.uses_natural_keys(
+        'xml', '<field rel="ManyToOneRel"><natural>auth</natural></field>')) \
+        .equals(True)
+
+
+@mock.patch.object(fixtures, 'save_in_bulk')
+def test_batched_saves_the_whole_fixture_at_once(save_in_bulk):
+    u"batched puts the saves off until loaddata went through the fixture"
+
+    objects = [mock.Mock(), mock.Mock()]
+    for batched in fixtures.batched(objects, 'default'):
+        batched.save(using='default')
+        assert that(save_in_bulk.call_count).equals(0)
+
+    save_in_bulk.assert_called_once_with(objects, 'default')
+
+
+def test_the_cache_is_only_on_while_unclebob_runs():
+    u"is_enabled needs the setting and a test run going on"
+
+    settings.UNCLEBOB_FIXTURE_CACHE = True
+    old_running = os.environ.pop('UNCLEBOB_RUNNING', None)
+    try:
+        assert that(fixtures.is_enabled()).equals(False)
+        os.environ['UNCLEBOB_RUNNING'] = '/project'
+        assert that(fixtures.is_enabled()).equals(True)
+    finally:
+        del settings.UNCLEBOB_FIXTURE_CACHE
+        os.environ.pop('UNCLEBOB_RUNNING')
+        if old_running is not None:
+            os.environ['UNCLEBOB_RUNNING'] = old_running
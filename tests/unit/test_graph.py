@@ -0,0 +1,190 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import mock
+import shutil
+import tempfile
+
+from os.path import join
+from sure import that, that_with_context
+
+from unclebob import graph
+
+
+def write(path, content=''):
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    open(path, 'w').write(content)
+
+
+def prepare_a_project(context, *args, **kw):
+    context.project = tempfile.mkdtemp()
+    project = lambda *path: join(context.project, *path)
+    context.file = project
+
+    write(project('shop', '__init__.py'))
+    write(project('shop', 'models.py'), 'import os\n')
+    write(project('shop', 'views.py'), 'from shop import models\n')
+    write(project('shop', 'tests', '__init__.py'))
+    write(project('shop', 'tests', 'unit', '__init__.py'))
+    write(project('shop', 'tests', 'unit', 'test_views.py'),
+          'from shop.views import *\n')
+    write(project('shop', 'tests', 'unit', 'test_math.py'),
+          'import math\n')
+    write(project('shop', 'templates', 'cart.html'))
+
+
+def and_remove_it(context, *args, **kw):
+    shutil.rmtree(context.project)
+
+
+def test_find_imports_sees_every_kind_of_import():
+    u"find_imports finds plain, from and relative imports"
+
+    source = tempfile.NamedTemporaryFile(suffix='.py')
+    source.write('import a.b\nfrom c import d\nfrom . import e\n')
+    source.flush()
+
+    assert that(graph.find_imports(source.name)).equals([
+        ('a.b', 0),
+        ('c', 0),
+        ('c.d', 0),
+        ('', 1),
+        ('e', 1),
+    ])
+
+
+@that_with_context(prepare_a_project, and_remove_it)
+def test_select_follows_the_imports(context):
+    u"ImportGraph.select picks the test modules that import what changed"
+
+    imports = graph.ImportGraph([context.project], context.project)
+    tests = [
+        context.file('shop', 'tests', 'unit', 'test_math.py'),
+        context.file('shop', 'tests', 'unit', 'test_views.py'),
+    ]
+
+    selected = imports.select(tests, [context.file('shop', 'models.py')])
+    assert that(selected).equals([
+        context.file('shop', 'tests', 'unit', 'test_views.py'),
+    ])
+
+    assert that(imports.select(tests, [])).equals([])
+
+
+@that_with_context(prepare_a_project, and_remove_it)
+def test_select_takes_the_whole_app_for_other_files(context):
+    u"ImportGraph.select runs the whole app when a non-python file changed"
+
+    imports = graph.ImportGraph([context.project], context.project)
+    tests = [
+        context.file('shop', 'tests', 'unit', 'test_math.py'),
+        context.file('shop', 'tests', 'unit', 'test_views.py'),
+    ]
+
+    selected = imports.select(
+        tests, [context.file('shop', 'templates', 'cart.html')],
+        app_paths=[context.file('shop')])
+
+    assert that(selected).equals(tests)
+
+
+@that_with_context(prepare_a_project, and_remove_it)
+def test_select_takes_everything_for_what_no_test_imports(context):
+    u"ImportGraph.select runs every test when nothing traces the change"
+
+    imports = graph.ImportGraph([context.project], context.project)
+    tests = [
+        context.file('shop', 'tests', 'unit', 'test_math.py'),
+        context.file('shop', 'tests', 'unit', 'test_views.py'),
+    ]
+    write(context.file('bourbon.py'))
+    write(context.file('settings.py'))
+
+    for changed in ('bourbon.py', 'settings.py', 'requirements.txt'):
+        selected = imports.select(tests, [context.file(changed)],
+                                  app_paths=[context.file('shop')])
+        assert that(selected).equals(tests)
+
+
+@that_with_context(prepare_a_project, and_remove_it)
+def test_select_takes_the_database_tests_for_migrations(context):
+    u"ImportGraph.select runs every test but the unit ones for migrations"
+
+    imports = graph.ImportGraph([context.project], context.project)
+    functional = context.file('shop', 'tests', 'functional', 'test_cart.py')
+    write(functional, 'import math\n')
+    migration = context.file('shop', 'migrations', '0001_initial.py')
+    write(migration)
+
+    tests = [
+        context.file('shop', 'tests', 'unit', 'test_math.py'),
+        functional,
+    ]
+    selected = imports.select(tests, [migration],
+                              app_paths=[context.file('shop')])
+    assert that(selected).equals([functional])
+
+
+@that_with_context(prepare_a_project, and_remove_it)
+def test_graph_only_parses_changed_files_again(context):
+    u"ImportGraph keeps the imports of the files that did not change"
+
+    imports = graph.ImportGraph([context.project], context.project)
+    views = context.file('shop', 'views.py')
+    imports.get_dependencies(views)
+
+    with mock.patch.object(graph, 'find_imports') as find_imports:
+        imports.get_dependencies(views)
+        assert that(find_imports.call_count).equals(0)
+
+        os.utime(views, (0, 0))
+        find_imports.return_value = []
+        assert that(imports.get_dependencies(views)).equals([])
+        find_imports.assert_called_once_with(views)
+
+
+@mock.patch.object(graph.subprocess, 'check_output')
+def test_get_changed_files_asks_git(check_output):
+    u"get_changed_files lists the changed and the untracked files"
+
+    check_output.side_effect = [
+        '/project\n',
+        'shop/models.py\n',
+        'shop/new.py\n',
+    ]
+
+    assert that(graph.get_changed_files('origin/master')).equals([
+        '/project/shop/models.py',
+        '/project/shop/new.py',
+    ])
+    assert that(list(check_output.call_args_list)).equals([
+        mock.call(('git', 'rev-parse', '--show-toplevel')),
+        mock.call(('git', 'diff', '--name-only', 'origin/master', '--')),
+        mock.call(('git', 'ls-files', '--others', '--exclude-standard',
+                   '--full-name', '/project')),
+    ])
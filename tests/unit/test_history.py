@@ -0,0 +1,106 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import shutil
+import tempfile
+
+from sure import that
+
+from unclebob.history import History, estimate_durations
+
+
+def record(test, module, seconds, outcome='success'):
+    return dict(test=test, module=module, app='foo', kind='unit',
+                seconds=seconds, outcome=outcome)
+
+
+def test_history_reports_the_slowest_tests():
+    u"History keeps the tests of a run and knows which ones were slow"
+
+    history = History(':memory:')
+    run = history.add_run([
+        record('test_fast', 'test_a.py', 0.1),
+        record('test_slow', 'test_b.py', 2.0),
+    ], [('setup_databases', 100.0, 3.0)])
+
+    assert that(history.get_slowest_tests(run, 1)).equals([
+        (u'test_slow', u'foo', u'unit', 2.0),
+    ])
+    assert that(history.get_totals_by('app', run)).equals([
+        (u'foo', 2, 2.1),
+    ])
+    assert that(history.get_phases(run)).equals([
+        (u'setup_databases', 3.0),
+    ])
+    assert 'test_slow' in history.format_report(run, 5)
+
+
+def test_history_forgets_old_runs():
+    u"History only keeps the latest runs"
+
+    history = History(':memory:', keep=2)
+    for seconds in (1.0, 2.0, 3.0):
+        history.add_run([record('test_a', 'test_a.py', seconds)], [])
+
+    runs = history.connection.execute('SELECT COUNT(*) FROM runs')
+    assert that(runs.fetchone()[0]).equals(2)
+
+
+def test_history_knows_the_average_module_duration():
+    u"History.get_module_durations averages the time of each module"
+
+    history = History(':memory:')
+    history.add_run([
+        record('test_a', 'test_a.py', 1.0),
+        record('test_b', 'test_a.py', 1.0),
+    ], [])
+    history.add_run([record('test_a', 'test_a.py', 4.0)], [])
+
+    assert that(history.get_module_durations()).equals({
+        u'test_a.py': 3.0,
+    })
+
+
+def test_estimate_durations_falls_back_to_file_size():
+    u"estimate_durations scales file sizes when there is no history"
+
+    directory = tempfile.mkdtemp()
+    small = os.path.join(directory, 'test_small.py')
+    big = os.path.join(directory, 'test_big.py')
+    open(small, 'w').write('x' * 10)
+    open(big, 'w').write('x' * 30)
+
+    try:
+        assert that(estimate_durations([small, big], {})).equals({
+            small: 10.0,
+            big: 30.0,
+        })
+        assert that(estimate_durations([small, big], {small: 2.0})).equals({
+            small: 2.0,
+            big: 6.0,
+        })
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,96 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+from sure import that
+
+from unclebob import memory
+
+
+class Thing(object):
+    pass
+
+
+def test_count_types_counts_the_tracked_objects():
+    u"count_types counts the objects the garbage collector tracks per type"
+
+    things = [Thing() for _ in range(3)]
+    counts = memory.count_types()
+    assert that(counts['%s.Thing' % __name__]).equals(3)
+    del things
+
+
+def test_grown_types_lists_the_types_that_gained_objects():
+    u"grown_types returns the types that gained the most objects"
+
+    before = {'foo.Bar': 10, 'foo.Baz': 5, 'foo.Gone': 3}
+    after = {'foo.Bar': 12, 'foo.Baz': 105, 'foo.New': 1}
+    assert that(memory.grown_types(before, after)).equals([
+        (100, 'foo.Baz'),
+        (2, 'foo.Bar'),
+        (1, 'foo.New'),
+    ])
+
+
+def test_format_report_lists_the_allocations_then_the_leaks():
+    u"format_report shows the peaks, then what the tests held on to"
+
+    records = [
+        dict(test='test_peak', app='foo', kind='unit', peak=50.0, held=0.0,
+             reset=True, types=[]),
+        dict(test='test_leak', app='bar', kind='integration', peak=10.0,
+             held=8.0, reset=True, types=[(1000, 'bar.models.Bar')]),
+    ]
+    assert that(memory.format_report(records, 1)).equals('\n'.join([
+        '',
+        "Uncle Bob's 1 tests that allocated the most:",
+        '      50.0MB  test_peak (foo unit)',
+        '',
+        "Uncle Bob's 1 tests that held on to the most memory:",
+        '       8.0MB  test_leak (bar integration)',
+        '              +1000 bar.models.Bar',
+    ]))
+
+
+def test_the_peak_starts_over_for_every_test():
+    u"reset_peak_rss brings the peak down to what the process holds now"
+
+    if not memory.reset_peak_rss():
+        return  # no procfs, the peak is the all-time one
+
+    allocated = ' ' * 64 * 1024 * 1024
+    peak = memory.get_peak_rss()
+    del allocated
+
+    assert memory.reset_peak_rss()
+    assert memory.get_peak_rss() < peak - 32
+
+
+def test_format_report_tells_when_the_peak_is_the_all_time_one():
+    u"format_report says so when the peak could not start over per test"
+
+    records = [dict(test='test_peak', app='foo', kind='unit', peak=50.0,
+                    held=0.0, reset=False, types=[])]
+    assert that(memory.format_report(records, 1).splitlines()[1]).equals(
+        "Uncle Bob's 1 tests that raised the all-time peak the most:")
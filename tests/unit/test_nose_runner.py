@@ -24,6 +24,8 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
 import os
+import shutil
+import tempfile
 import sys
 import imp
 import mock
@@ -34,7 +36,7 @@ from django.conf import settings
 from django.core import management
 from sure import that, that_with_context
 
-from unclebob.runners import Nose
+from unclebob.runners import Nose, collect
 
 
 def get_settings(obj):
@@ -52,6 +54,10 @@ def prepare_stuff(context, *args, **kw):
         'is_integration': False,
     }
     context.old_argv = sys.argv[:]
+    # keeps the runs below from writing .unclebob/last-failed.json and
+    # from sampling
+    settings.UNCLEBOB_RECORD_FAILURES = False
+    settings.UNCLEBOB_SAMPLING = False
     sys.stdout = StringIO()
     sys.stderr = StringIO()
     context.runner.get_argv_options = lambda: context.options
@@ -63,7 +69,7 @@ def and_cleanup_the_mess(context, *args, **kw):
     sys.stderr = sys.__stderr__
     sys.argv = context.old_argv
 
-    original_settings = get_settings(context.old_settings)
+    original_settings = context.old_settings
     for attr in get_settings(settings):
         if attr not in original_settings:
             delattr(settings, attr)
@@ -257,26 +263,20 @@ def test_doesnt_migrate_without_south_tests_migrate(context, call_command):
 @mock.patch.object(imp, 'load_module')
 @mock.patch.object(imp, 'find_module')
 @that_with_context(prepare_stuff, and_cleanup_the_mess)
-def test_get_paths_for_imports_the_module_and_returns_its_path(context,
-                                                               find_module,
-                                                               load_module,
-                                                               exists):
-    u"get_paths_for retrieves the module dirname"
+def test_get_paths_for_finds_the_module_and_returns_its_path(context,
+                                                             find_module,
+                                                             load_module,
+                                                             exists):
+    u"get_paths_for retrieves the module dirname without importing it"
 
-    module_mock = mock.Mock()
-    module_mock.__file__ = '/path/to/file.py'
-
-    find_module.return_value = ('file', 'pathname', 'description')
-    load_module.return_value = module_mock
+    find_module.return_value = (None, '/path/to', ('', '', imp.PKG_DIRECTORY))
     exists.return_value = True
 
     expected_path = context.runner.get_paths_for(['bazfoobar'])
     assert that(expected_path).equals(['/path/to'])
 
     find_module.assert_called_once_with('bazfoobar')
-    load_module.assert_called_once_with(
-        'bazfoobar', 'file', 'pathname', 'description',
-    )
+    assert that(load_module.call_count).equals(0)
 
 
 @mock.patch.object(os.path, 'exists')
@@ -287,11 +287,7 @@ def test_get_paths_appends_more_paths(context, find_module, load_module,
                                       exists):
     u"get_paths_for retrieves the module dirname and appends stuff"
 
-    module_mock = mock.Mock()
-    module_mock.__file__ = '/path/to/file.py'
-
-    find_module.return_value = ('file', 'pathname', 'description')
-    load_module.return_value = module_mock
+    find_module.return_value = (None, '/path/to', ('', '', imp.PKG_DIRECTORY))
     exists.return_value = True
 
     expected_path = context.runner.get_paths_for(
@@ -301,9 +297,7 @@ def test_get_paths_appends_more_paths(context, find_module, load_module,
     assert that(expected_path).equals(['/path/to/one/more/place'])
 
     find_module.assert_called_once_with('bazfoobar')
-    load_module.assert_called_once_with(
-        'bazfoobar', 'file', 'pathname', 'description',
-    )
+    assert that(load_module.call_count).equals(0)
 
 
 @mock.patch.object(os.path, 'exists')
@@ -316,11 +310,7 @@ def test_get_paths_ignore_paths_that_doesnt_exist(context,
                                                   exists):
     u"get_paths_for ignore paths that doesn't exist"
 
-    module_mock = mock.Mock()
-    module_mock.__file__ = '/path/to/file.py'
-
-    find_module.return_value = ('file', 'pathname', 'description')
-    load_module.return_value = module_mock
+    find_module.return_value = (None, '/path/to', ('', '', imp.PKG_DIRECTORY))
     exists.return_value = False
 
     expected_path = context.runner.get_paths_for(
@@ -330,9 +320,7 @@ def test_get_paths_ignore_paths_that_doesnt_exist(context,
     assert that(expected_path).equals([])
 
     find_module.assert_called_once_with('bazfoobar')
-    load_module.assert_called_once_with(
-        'bazfoobar', 'file', 'pathname', 'description',
-    )
+    assert that(load_module.call_count).equals(0)
 
 
 @mock.patch.object(nose, 'run')
@@ -768,11 +756,7 @@ def test_get_paths_for_never_return_duplicates(
     exists):
     u"get_paths_for never return duplicates"
 
-    module_mock = mock.Mock()
-    module_mock.__file__ = '/path/to/file.py'
-
-    find_module.return_value = ('file', 'pathname', 'description')
-    load_module.return_value = module_mock
+    find_module.return_value = (None, '/path/to', ('', '', imp.PKG_DIRECTORY))
 
     exists.return_value = True
 
@@ -1021,3 +1005,638 @@ def test_setting_NO_DATABASE_has_priority_integration(context, nose_run):
 
     assert context.runner.migrate_to_south_if_needed.call_count == 0, \
         "migrate_to_south_if_needed was called when it shouldn't"
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_argv_options_processes(context):
+    u"Nose should parse sys.argv and figure out how many processes to use"
+    sys.argv = ['./manage.py', 'test', '--processes=4']
+    runner = Nose()
+
+    opts = runner.get_argv_options()
+    assert that(opts['processes']).equals(4)
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_processes_falls_back_to_settings(context):
+    u"Nose.get_processes uses settings.UNCLEBOB_PROCESSES or defaults to 1"
+
+    assert that(context.runner.get_processes({})).equals(1)
+
+    settings.UNCLEBOB_PROCESSES = 8
+    assert that(context.runner.get_processes({})).equals(8)
+    assert that(context.runner.get_processes({'processes': 2})).equals(2)
+
+
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_running_in_processes_splits_the_paths(context, nose_run):
+    u"with more than one process the paths are handed to run_in_processes"
+
+    context.options['is_unit'] = True
+    context.options['processes'] = 3
+
+    context.runner.get_apps = mock.Mock()
+    context.runner.get_apps.return_value = ['john', 'doe']
+
+    context.runner.get_nose_argv = mock.Mock()
+    context.runner.get_nose_argv.return_value = ['nose', 'argv']
+
+    context.runner.get_paths_for = mock.Mock()
+    context.runner.get_paths_for.return_value = [
+        '/apps/john/tests/unit',
+        '/apps/doe/tests/unit',
+    ]
+
+    context.runner.run_in_processes = mock.Mock()
+    context.runner.run_in_processes.return_value = (False, [])
+
+    result = context.runner.run_tests([])
+
+    assert that(result).equals(1)
+    assert that(nose_run.call_count).equals(0)
+    context.runner.run_in_processes.assert_called_once_with(
+        ['nose', 'argv'],
+        ['/apps/john/tests/unit', '/apps/doe/tests/unit'],
+        3,
+        old_config=None,
+        plugins=[],
+    )
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_argv_options_reuse_db(context):
+    u"Nose should parse sys.argv and figure out whether to reuse the db"
+    sys.argv = ['./manage.py', 'test', '--reuse-db']
+    runner = Nose()
+
+    opts = runner.get_argv_options()
+    assert that(opts['reuse_db']).equals(True)
+
+
+@mock.patch('unclebob.runners.databases')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_setup_reused_databases_when_up_to_date(context, databases):
+    u"setup_reused_databases doesn't build nor migrate an up to date db"
+
+    databases.can_be_reused.return_value = True
+    databases.is_up_to_date.return_value = True
+    databases.point_to_test_databases.return_value = 'reused config'
+
+    context.runner.get_apps = mock.Mock(return_value=['john'])
+    context.runner.get_paths_for = mock.Mock(return_value=['/apps/john'])
+    context.runner.setup_databases = mock.Mock()
+    context.runner.migrate_to_south_if_needed = mock.Mock()
+
+    old_config = context.runner.setup_reused_databases()
+
+    assert that(old_config).equals('reused config')
+    databases.get_fingerprint.assert_called_once_with(['/apps/john'])
+    assert that(context.runner.setup_databases.call_count).equals(0)
+    assert that(context.runner.migrate_to_south_if_needed.call_count).equals(0)
+
+
+@mock.patch('unclebob.runners.databases')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_setup_reused_databases_rebuilds_when_outdated(context, databases):
+    u"setup_reused_databases rebuilds and migrates when the schema changed"
+
+    databases.can_be_reused.return_value = True
+    databases.is_up_to_date.return_value = False
+    databases.get_fingerprint.return_value = 'new fingerprint'
+
+    context.runner.get_apps = mock.Mock(return_value=['john'])
+    context.runner.get_paths_for = mock.Mock(return_value=['/apps/john'])
+    context.runner.setup_databases = mock.Mock(return_value='new config')
+    context.runner.migrate_to_south_if_needed = mock.Mock()
+
+    old_config = context.runner.setup_reused_databases()
+
+    assert that(old_config).equals('new config')
+    context.runner.migrate_to_south_if_needed.assert_called_once_with()
+    databases.save_fingerprint.assert_called_once_with('new fingerprint')
+
+
+@mock.patch('unclebob.runners.databases')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_teardown_databases_leaves_a_reused_db(context, databases):
+    u"teardown_databases won't destroy a reused test database"
+
+    context.runner.reuse_db = True
+    context.runner.teardown_databases('old config')
+
+    databases.leave_test_databases.assert_called_once_with('old config')
+
+
+@mock.patch('unclebob.runners.snapshots')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_setup_migrated_databases_loads_a_snapshot(context, snapshots):
+    u"setup_migrated_databases loads the snapshot instead of migrating"
+
+    context.runner.snapshots = True
+    context.runner.get_schema_fingerprint = mock.Mock(return_value='abc')
+    context.runner.setup_databases = mock.Mock()
+    context.runner.migrate_to_south_if_needed = mock.Mock()
+
+    snapshots.has_snapshots.return_value = True
+    snapshots.load_snapshots.return_value = 'snapshot config'
+
+    assert that(context.runner.setup_migrated_databases()).equals(
+        'snapshot config')
+    snapshots.load_snapshots.assert_called_once_with('abc')
+    assert that(context.runner.setup_databases.call_count).equals(0)
+    assert that(context.runner.migrate_to_south_if_needed.call_count).equals(0)
+
+
+@mock.patch('unclebob.runners.snapshots')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_setup_migrated_databases_saves_a_snapshot(context, snapshots):
+    u"setup_migrated_databases migrates and saves a snapshot the first time"
+
+    context.runner.snapshots = True
+    context.runner.get_schema_fingerprint = mock.Mock(return_value='abc')
+    context.runner.setup_databases = mock.Mock(return_value='config')
+    context.runner.migrate_to_south_if_needed = mock.Mock()
+
+    snapshots.has_snapshots.return_value = False
+
+    assert that(context.runner.setup_migrated_databases()).equals('config')
+    context.runner.migrate_to_south_if_needed.assert_called_once_with()
+    snapshots.save_snapshots.assert_called_once_with('config', 'abc')
+
+
+@mock.patch.object(imp, 'load_module')
+@mock.patch.object(imp, 'find_module')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_paths_for_uses_the_discovery_index(context, find_module,
+                                                load_module):
+    u"get_paths_for won't import apps the discovery index knows about"
+
+    context.runner.discovery_index = mock.Mock()
+    context.runner.discovery_index.get_app_path.return_value = \
+        os.path.dirname(__file__)
+
+    paths = context.runner.get_paths_for(['known_app'])
+
+    assert that(paths).equals([os.path.abspath(os.path.dirname(__file__))])
+    assert that(find_module.call_count).equals(0)
+    assert that(load_module.call_count).equals(0)
+
+
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_nothing_runs_when_no_test_is_affected(context, nose_run):
+    u"with --changed-since nothing runs when no test module is affected"
+
+    context.options['is_unit'] = True
+    context.options['changed_since'] = 'origin/master'
+
+    context.runner.get_apps = mock.Mock(return_value=['john'])
+    context.runner.get_paths_for = mock.Mock(return_value=[
+        '/apps/john/tests/unit',
+    ])
+    context.runner.select_changed_tests = mock.Mock(return_value=[])
+
+    assert that(context.runner.run_tests([])).equals(0)
+    context.runner.select_changed_tests.assert_called_once_with(
+        ['john'], ['/apps/john/tests/unit'], 'origin/master')
+    assert that(nose_run.call_count).equals(0)
+
+
+def run_an_empty_directory(context):
+    context.directory = tempfile.mkdtemp()
+    context.runner.get_apps = mock.Mock(return_value=['john'])
+    context.runner.get_nose_argv = mock.Mock(return_value=['nosetests'])
+    context.runner.get_paths_for = mock.Mock(return_value=[
+        context.directory,
+    ])
+
+    try:
+        return context.runner.run_tests([])
+    finally:
+        shutil.rmtree(context.directory)
+
+
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_empty_test_directories_never_leave_nose_without_paths(context,
+                                                               nose_run):
+    u"the discovery index keeps the test directories that hold no module"
+
+    context.options['is_unit'] = True
+    nose_run.return_value = True
+
+    assert that(run_an_empty_directory(context)).equals(0)
+    nose_run.assert_called_once_with(argv=['nosetests', context.directory])
+
+
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_failed_first_never_leaves_nose_without_paths(context, nose_run):
+    u"--failed-first keeps the test directories that hold no module"
+
+    context.options['is_unit'] = True
+    context.options['failed_first'] = True
+    settings.UNCLEBOB_DISCOVERY_INDEX = False
+    nose_run.return_value = True
+
+    assert that(run_an_empty_directory(context)).equals(0)
+    assert that(nose_run.call_args[1]['argv']).equals(
+        ['nosetests', context.directory])
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_plugins_times_the_tests_when_asked_to(context):
+    u"Nose.get_plugins adds the Durations plugin when recording durations"
+
+    from unclebob.plugins import Durations
+
+    assert that(context.runner.get_plugins({})).equals([])
+
+    context.runner.record_durations = True
+    plugins = context.runner.get_plugins({})
+    assert that(len(plugins)).equals(1)
+    assert that(plugins[0]).is_a(Durations)
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_plugins_counts_the_queries_when_asked_to(context):
+    u"Nose.get_plugins adds the Queries plugin for --queries or the limits"
+
+    from unclebob.plugins import Queries
+
+    plugins = context.runner.get_plugins({'queries': 10})
+    assert that(len(plugins)).equals(1)
+    assert that(plugins[0]).is_a(Queries)
+
+    settings.UNCLEBOB_MAX_QUERIES = {'john': 50}
+    try:
+        plugins = context.runner.get_plugins({})
+    finally:
+        del settings.UNCLEBOB_MAX_QUERIES
+
+    assert that(plugins[0].limits).equals({'john': 50})
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_record_durations(context):
+    u"--durations or settings.UNCLEBOB_RECORD_DURATIONS record durations"
+
+    assert that(context.runner.get_record_durations({})).equals(False)
+    assert that(context.runner.get_record_durations(
+        {'durations': 10})).equals(True)
+
+    settings.UNCLEBOB_RECORD_DURATIONS = True
+    assert that(context.runner.get_record_durations({})).equals(True)
+
+
+@mock.patch('unclebob.runners.History')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_save_durations_stores_every_worker_report(context, History):
+    u"Nose.save_durations stores the tests of every report and the phases"
+
+    history = History.open.return_value
+    history.add_run.return_value = 7
+    history.format_report.return_value = 'the report'
+
+    with context.runner.timer.phase('tests'):
+        pass
+
+    context.runner.save_durations([
+        {'unclebob-durations': ['first']},
+        {'unclebob-durations': ['second']},
+    ], count=3)
+
+    history.add_run.assert_called_once_with(
+        ['first', 'second'], context.runner.timer.phases)
+    history.format_report.assert_called_once_with(7, 3)
+    assert that(sys.stdout.getvalue()).contains('the report')
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_argv_options_shard(context):
+    u"Nose should parse sys.argv and figure out which shard to run"
+    sys.argv = ['./manage.py', 'test', '--shard=2/8']
+    runner = Nose()
+
+    opts = runner.get_argv_options()
+    assert that(opts['shard']).equals((2, 8))
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_get_argv_options_invalid_shard(context):
+    u"Nose should refuse shards out of range"
+    sys.argv = ['./manage.py', 'test', '--shard=9/8']
+    runner = Nose()
+
+    try:
+        runner.get_argv_options()
+        assert False, 'should have refused --shard=9/8'
+    except SystemExit:
+        pass
+
+
+@mock.patch('unclebob.runners.find_test_modules')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_select_shard_balances_the_modules(context, find_test_modules):
+    u"Nose.select_shard picks one of the balanced buckets of modules"
+
+    find_test_modules.return_value = [
+        os.path.abspath('test_a.py'),
+        os.path.abspath('test_b.py'),
+        os.path.abspath('test_c.py'),
+    ]
+    context.runner.get_module_weights = mock.Mock(return_value={
+        'test_a.py': 10.0,
+        'test_b.py': 1.0,
+        'test_c.py': 1.0,
+    })
+
+    assert that(context.runner.select_shard(['/tests'], (1, 2))).equals([
+        os.path.abspath('test_a.py'),
+    ])
+    assert that(context.runner.select_shard(['/tests'], (2, 2))).equals([
+        os.path.abspath('test_b.py'),
+        os.path.abspath('test_c.py'),
+    ])
+
+
+@mock.patch('unclebob.runners.save_failures')
+@mock.patch('unclebob.runners.load_failures')
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_last_failed_reruns_the_failed_unit_tests_only(context, nose_run,
+                                                        load_failures,
+                                                        save_failures):
+    u"with --last-failed only the failed tests run, unit ones need no db"
+
+    context.options['last_failed'] = True
+    load_failures.return_value = [
+        '/apps/john/tests/unit/test_john.py:Case.test_a',
+        '/apps/jane/tests/functional/test_jane.py:test_b',
+    ]
+
+    context.runner.get_apps = mock.Mock(return_value=['john'])
+    context.runner.get_nose_argv = mock.Mock(return_value=['nosetests'])
+    context.runner.get_paths_for = mock.Mock(return_value=[
+        '/apps/john/tests',
+    ])
+    context.runner.setup_databases = mock.Mock()
+
+    nose_run.return_value = True
+    assert that(context.runner.run_tests([])).equals(0)
+
+    assert that(nose_run.call_args[1]['argv']).equals([
+        'nosetests',
+        '/apps/john/tests/unit/test_john.py:Case.test_a',
+    ])
+    assert that(context.runner.setup_databases.call_count).equals(0)
+    assert that(save_failures.call_count).equals(1)
+
+
+@mock.patch('unclebob.runners.databases')
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_unclonable_databases_run_in_a_single_process(context, nose_run,
+                                                      databases):
+    u"workers need copies of the test database, otherwise one process runs"
+
+    context.options['processes'] = 4
+    databases.get_unclonable_engines.return_value = [
+        'django.db.backends.mysql']
+
+    context.runner.get_apps = mock.Mock(return_value=['bar'])
+    context.runner.get_nose_argv = mock.Mock(return_value=['nosetests'])
+    context.runner.get_paths_for = mock.Mock(return_value=['/apps/bar'])
+    context.runner.run_in_processes = mock.Mock()
+    context.runner.prepare_databases = mock.Mock(return_value='old config')
+    context.runner.teardown_databases = mock.Mock()
+    context.runner.teardown_test_environment = mock.Mock()
+
+    nose_run.return_value = True
+    assert that(context.runner.run_tests(['bar'])).equals(0)
+
+    assert that(context.runner.run_in_processes.call_count).equals(0)
+    nose_run.assert_called_once_with(argv=['nosetests', '/apps/bar'])
+
+
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_the_database_is_torn_down_when_the_tests_blow_up(context, nose_run):
+    u"the test database goes away even if running the tests raises"
+
+    context.runner.get_apps = mock.Mock(return_value=['bar'])
+    context.runner.get_nose_argv = mock.Mock(return_value=['nosetests'])
+    context.runner.get_paths_for = mock.Mock(return_value=['/apps/bar'])
+    context.runner.prepare_databases = mock.Mock(return_value='old config')
+    context.runner.teardown_databases = mock.Mock()
+    context.runner.teardown_test_environment = mock.Mock()
+
+    nose_run.side_effect = RuntimeError('boom')
+    try:
+        context.runner.run_tests(['bar'])
+    except RuntimeError:
+        pass
+    else:
+        assert False, 'run_tests should have raised'
+
+    context.runner.teardown_databases.assert_called_once_with('old config')
+
+
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_apps_with_unit_tests_only_still_get_a_database(context, nose_run):
+    u"without --unit the database is set up, whatever the directories are"
+
+    context.runner.get_apps = mock.Mock(return_value=['bar'])
+    context.runner.get_nose_argv = mock.Mock(return_value=['nosetests'])
+    context.runner.get_paths_for = mock.Mock(return_value=[
+        '/apps/bar/tests/unit',
+    ])
+    context.runner.prepare_databases = mock.Mock(return_value='old config')
+    context.runner.teardown_databases = mock.Mock()
+    context.runner.teardown_test_environment = mock.Mock()
+
+    nose_run.return_value = True
+    assert that(context.runner.run_tests(['bar'])).equals(0)
+
+    context.runner.prepare_databases.assert_called_once_with()
+    context.runner.teardown_databases.assert_called_once_with('old config')
+
+
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_needs_database_unless_every_test_is_a_unit_test(context):
+    u"needs_database is false when only unit tests were selected"
+
+    assert that(context.runner.needs_database([
+        '/apps/john/tests/unit',
+        '/apps/john/tests/unit/test_john.py:test_a',
+    ])).equals(False)
+    assert that(context.runner.needs_database([
+        '/apps/john/tests/unit',
+        '/apps/john/tests/functional/test_john.py',
+    ])).equals(True)
+    assert that(context.runner.needs_database(['/apps/john/tests'])).equals(
+        True)
+    assert that(context.runner.needs_database([])).equals(True)
+
+
+@mock.patch('unclebob.runners.parallel')
+@mock.patch.object(nose, 'run')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_overlap_db_setup_runs_the_unit_tests_meanwhile(context, nose_run,
+                                                        parallel):
+    u"with --overlap-db-setup the unit tests start before the database"
+
+    context.options['overlap_db_setup'] = True
+    calls = []
+
+    context.runner.get_apps = mock.Mock(return_value=['john'])
+    context.runner.get_nose_argv = mock.Mock(return_value=['nosetests'])
+    context.runner.get_paths_for = mock.Mock(return_value=['/apps/john'])
+    context.runner.split_unit_tests = mock.Mock(return_value=(
+        ['/apps/john/tests/unit/test_john.py'],
+        ['/apps/john/tests/functional/test_john.py'],
+    ))
+    context.runner.get_module_weights = mock.Mock(return_value={})
+    context.runner.prepare_databases = mock.Mock(
+        side_effect=lambda: calls.append('database'))
+    context.runner.teardown_databases = mock.Mock()
+    context.runner.teardown_test_environment = mock.Mock()
+
+    parallel.balance.return_value = [['/apps/john/tests/unit/test_john.py']]
+    workers = parallel.Workers.return_value.start_all.return_value
+    parallel.Workers.return_value.start_all.side_effect = \
+        lambda buckets: calls.append('unit') or workers
+    workers.wait.return_value = (False, [])
+    nose_run.return_value = True
+
+    assert that(context.runner.run_tests([])).equals(1)
+    assert that(calls).equals(['unit', 'database'])
+    nose_run.assert_called_once_with(argv=[
+        'nosetests',
+        '/apps/john/tests/functional/test_john.py',
+    ])
+
+
+@mock.patch('unclebob.runners.parallel')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_unit_workers_get_the_test_environment(context, parallel):
+    u"the unit tests forked early still get the test environment and bourbon"
+
+    context.runner.get_module_weights = mock.Mock(return_value={})
+    context.runner.setup_test_environment = mock.Mock()
+    context.runner.sip_some_bourbon = mock.Mock()
+    parallel.balance.return_value = [['/apps/john/tests/unit/test_john.py']]
+
+    context.runner.start_unit_tests(
+        ['nosetests'], ['/apps/john/tests/unit/test_john.py'], 1, [])
+
+    prepare = parallel.Workers.call_args[1]['prepare']
+    assert that(context.runner.setup_test_environment.call_count).equals(0)
+
+    prepare(0)
+    context.runner.setup_test_environment.assert_called_once_with()
+    context.runner.sip_some_bourbon.assert_called_once_with()
+
+
+@mock.patch('unclebob.runners.find_test_modules')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_run_tiers_gives_each_kind_a_process(context, find_test_modules):
+    u"run_tiers runs every kind of tests in a worker of its own"
+
+    find_test_modules.return_value = [
+        '/apps/john/tests/unit/test_john.py',
+        '/apps/john/tests/functional/test_john.py',
+        '/apps/doe/tests/functional/test_doe.py',
+        '/apps/doe/tests/test_doe.py',
+    ]
+    context.runner.run_buckets = mock.Mock(return_value=(True, []))
+
+    result = context.runner.run_tiers(['nosetests'], ['/apps'], 'config')
+
+    assert that(result).equals((True, []))
+    context.runner.run_buckets.assert_called_once_with(['nosetests'], [
+        ['/apps/john/tests/functional/test_john.py',
+         '/apps/doe/tests/functional/test_doe.py'],
+        ['/apps/doe/tests/test_doe.py'],
+        ['/apps/john/tests/unit/test_john.py'],
+    ], 'config', ())
+
+
+@mock.patch('unclebob.runners.parallel')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_the_unit_tier_gets_the_test_environment(context, parallel):
+    u"with --tiers-parallel the unit tier gets the environment and bourbon"
+
+    context.options['tiers_parallel'] = True
+
+    context.runner.get_apps = mock.Mock(return_value=['john'])
+    context.runner.get_nose_argv = mock.Mock(return_value=['nosetests'])
+    context.runner.get_paths_for = mock.Mock(return_value=['/apps/john'])
+    context.runner.split_unit_tests = mock.Mock(return_value=(
+        ['/apps/john/tests/unit/test_john.py'],
+        ['/apps/john/tests/functional/test_john.py'],
+    ))
+    context.runner.get_module_weights = mock.Mock(return_value={})
+    context.runner.prepare_databases = mock.Mock(return_value='old config')
+    context.runner.teardown_databases = mock.Mock()
+    context.runner.teardown_test_environment = mock.Mock()
+    context.runner.setup_test_environment = mock.Mock()
+    context.runner.sip_some_bourbon = mock.Mock()
+    context.runner.run_tiers = mock.Mock(return_value=(True, []))
+
+    parallel.balance.return_value = [['/apps/john/tests/unit/test_john.py']]
+    workers = parallel.Workers.return_value.start_all.return_value
+    workers.wait.return_value = (True, [])
+
+    assert that(context.runner.run_tests([])).equals(0)
+
+    sips = context.runner.sip_some_bourbon.call_count
+    parallel.Workers.call_args[1]['prepare'](0)
+    context.runner.setup_test_environment.assert_called_once_with()
+    assert that(context.runner.sip_some_bourbon.call_count).equals(sips + 1)
+
+
+@mock.patch('unclebob.runners.find_stale_modules')
+@mock.patch('unclebob.runners.TemplateClones')
+@mock.patch('unclebob.runners.parallel')
+@that_with_context(prepare_stuff, and_cleanup_the_mess)
+def test_every_watched_run_gets_a_copy_of_the_database(context, parallel,
+                                                       TemplateClones,
+                                                       find_stale_modules):
+    u"the reruns of --watch never see what the previous ones left behind"
+
+    find_stale_modules.return_value = []
+    parallel.run_in_processes.return_value = (True, [])
+    clones = TemplateClones.return_value
+
+    assert that(context.runner.run_watched(
+        ['nosetests'], ['/apps/john/tests/test_john.py'], mock.Mock(),
+        set(), [], 'old config')).equals((True, []))
+
+    TemplateClones.assert_called_once_with('old config')
+    clones.create.assert_called_once_with(1)
+    parallel.run_in_processes.call_args[1]['prepare'](0)
+    clones.prepare.assert_called_once_with(0)
+    clones.drop.assert_called_once_with()
+
+
+def test_collect_puts_the_reports_of_every_process_together():
+    u"collect joins the records of a plugin, or the items of a dict report"
+
+    durations = mock.Mock()
+    durations.name = 'durations'
+    outcomes = mock.Mock()
+    outcomes.name = 'outcomes'
+
+    reports = [
+        {'durations': [{'test': 'a'}], 'outcomes': {'a': 'success'}},
+        {'durations': None},
+        {'durations': [{'test': 'b'}], 'outcomes': {'b': 'failure'}},
+    ]
+
+    assert that(collect(reports, durations)).equals(
+        [{'test': 'a'}, {'test': 'b'}])
+    assert that(dict(collect(reports, outcomes))).equals(
+        {'a': 'success', 'b': 'failure'})
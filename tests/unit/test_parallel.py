@@ -0,0 +1,140 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import mock
+import multiprocessing
+
+from sure import that
+
+from unclebob import parallel
+
+
+def test_balance_packs_the_heaviest_modules_first():
+    u"balance gives each module to the lightest bucket, heaviest first"
+
+    buckets = parallel.balance(['a', 'b', 'c', 'd'], 2, {
+        'a': 5.0,
+        'b': 3.0,
+        'c': 2.0,
+        'd': 1.0,
+    })
+    assert that(buckets).equals([
+        ['a', 'd'],
+        ['b', 'c'],
+    ])
+
+
+def test_balance_is_deterministic_on_ties():
+    u"balance breaks ties by name, so every node gets the same buckets"
+
+    first = parallel.balance(['b', 'a', 'c'], 2, {})
+    second = parallel.balance(['c', 'b', 'a'], 2, {})
+
+    assert that(first).equals(second)
+    assert that(first).equals([['a', 'c'], ['b']])
+
+
+@mock.patch.object(parallel.nose, 'run')
+def test_run_worker_reports_its_result(nose_run):
+    u"run_worker runs nose on its modules and puts a report on the queue"
+
+    nose_run.return_value = True
+    results = mock.Mock()
+    prepare = mock.Mock()
+
+    parallel.run_worker(2, ['nose', 'argv'], ['test_a.py'], results, prepare)
+
+    prepare.assert_called_once_with(2)
+    assert that(nose_run.call_args[1]['argv']).equals([
+        'nose', 'argv', 'test_a.py',
+    ])
+
+    report = results.put.call_args[0][0]
+    assert that(report['worker']).equals(2)
+    assert that(report['passed']).equals(True)
+
+
+def test_gather_stops_when_workers_are_gone():
+    u"gather won't wait forever for workers that died without reporting"
+
+    results = multiprocessing.Queue()
+    results.put({'worker': 1, 'passed': True})
+    worker = mock.Mock()
+    worker.is_alive.return_value = False
+
+    reports = parallel.gather(results, [worker, worker])
+    assert that(reports).equals([{'worker': 1, 'passed': True}])
+
+
+def test_gather_takes_the_reports_of_workers_that_just_exited():
+    u"gather drains the reports put right before the last worker exited"
+
+    results = mock.Mock()
+    results.get.side_effect = parallel.Empty()
+    results.get_nowait.side_effect = [
+        {'worker': 0, 'passed': True},
+        {'worker': 1, 'passed': True},
+    ]
+    worker = mock.Mock()
+    worker.is_alive.return_value = False
+
+    reports = parallel.gather(results, [worker, worker])
+    assert that(reports).equals([
+        {'worker': 0, 'passed': True},
+        {'worker': 1, 'passed': True},
+    ])
+
+
+def test_gather_respawns_the_recycled_workers():
+    u"gather replaces the workers that left modules behind"
+
+    results = multiprocessing.Queue()
+    results.put({'worker': 0, 'passed': True, 'remaining': ['test_b.py']})
+    worker = mock.Mock()
+    worker.is_alive.return_value = True
+
+    def respawn(index, modules):
+        results.put({'worker': index, 'passed': True, 'remaining': []})
+
+    respawn = mock.Mock(side_effect=respawn)
+    reports = parallel.gather(results, [worker], respawn=respawn)
+
+    respawn.assert_called_once_with(0, ['test_b.py'])
+    assert that(len(reports)).equals(2)
+
+
+@mock.patch.object(parallel.nose, 'run')
+def test_run_worker_hands_over_what_it_did_not_run(nose_run):
+    u"with limits run_worker reports the modules it did not get to"
+
+    nose_run.return_value = True
+    results = mock.Mock()
+
+    parallel.run_worker(0, ['nose'], ['test_a.py'], results,
+                        limits={'max_tests': 10})
+
+    recycler = nose_run.call_args[1]['addplugins'][-1]
+    assert that(recycler.name).equals('unclebob-recycler')
+    assert that(results.put.call_args[0][0]['remaining']).equals([])
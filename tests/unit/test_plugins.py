@@ -0,0 +1,364 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import mock
+import types
+
+from sure import that
+
+from unclebob import plugins
+from unclebob.discovery import classify
+
+
+def fake_nose_case(name, filename):
+    test = mock.Mock()
+    test.id.return_value = name
+    test.address.return_value = (filename, name, None)
+    return test
+
+
+def test_classify_finds_the_app_and_the_kind():
+    u"classify tells the app and the kind of a test module"
+
+    assert that(classify('/apps/foo/tests/unit/test_foo.py')).equals(
+        ('foo', 'unit'))
+    assert that(classify('/apps/foo/tests/test_foo.py')).equals(
+        ('foo', None))
+    assert that(classify('/apps/foo/test_foo.py')).equals((None, None))
+
+
+@mock.patch.object(plugins.time, 'time')
+def test_durations_times_every_test(time):
+    u"Durations records how long every test took and how it went"
+
+    durations = plugins.Durations()
+    test = fake_nose_case('foo.tests.unit.test_foo.test_a',
+                     '/apps/foo/tests/unit/test_foo.py')
+
+    time.return_value = 10.0
+    durations.startTest(test)
+    durations.addFailure(test, None)
+    time.return_value = 10.5
+    durations.stopTest(test)
+
+    assert that(durations.get_report()).equals([{
+        'test': 'foo.tests.unit.test_foo.test_a',
+        'module': '/apps/foo/tests/unit/test_foo.py',
+        'app': 'foo',
+        'kind': 'unit',
+        'seconds': 0.5,
+        'outcome': 'failure',
+    }])
+
+
+def test_outcomes_remembers_which_tests_passed():
+    u"Outcomes tells which tests passed, by the names nose runs them with"
+
+    outcomes = plugins.Outcomes()
+    passing = fake_nose_case('test_a', '/apps/foo/tests/unit/test_foo.py')
+    failing = fake_nose_case('test_b', '/apps/foo/tests/unit/test_bar.py')
+    failing.address.return_value = (
+        '/apps/foo/tests/unit/test_bar.py', 'test_bar', 'Case.test_b')
+
+    for test in (passing, failing):
+        outcomes.startTest(test)
+        if test is failing:
+            outcomes.addFailure(test, None)
+        outcomes.stopTest(test)
+
+    assert that(outcomes.get_report()).equals({
+        os.path.relpath('/apps/foo/tests/unit/test_foo.py'): True,
+        os.path.relpath('/apps/foo/tests/unit/test_bar.py') +
+        ':Case.test_b': False,
+    })
+
+
+def fake_module(filename):
+    module = types.ModuleType('fake')
+    module.__file__ = filename
+    return module
+
+
+def test_recycler_stops_after_the_module_that_hit_the_limit():
+    u"Recycler stops the run between modules once max_tests ran"
+
+    recycler = plugins.Recycler(['/apps/test_a.py', '/apps/test_b.py'],
+                                max_tests=1)
+    result = mock.Mock()
+    result.shouldStop = False
+    recycler.prepareTestResult(result)
+
+    first = fake_module('/apps/test_a.pyc')
+    recycler.startContext(first)
+    recycler.startTest(fake_nose_case('test_x', '/apps/test_a.py'))
+    recycler.stopContext(first)
+
+    assert that(result.shouldStop).equals(True)
+    assert that(recycler.get_report()).equals(['/apps/test_b.py'])
+
+
+def test_recycler_watches_the_memory():
+    u"Recycler stops the run once the worker grew past max_rss megabytes"
+
+    recycler = plugins.Recycler(['/apps/test_a.py'], max_rss=100,
+                                get_rss=lambda: 50.0)
+    result = mock.Mock()
+    result.shouldStop = False
+    recycler.prepareTestResult(result)
+
+    recycler.stopContext(fake_module('/apps/test_a.py'))
+    assert that(result.shouldStop).equals(False)
+    assert that(recycler.get_report()).equals([])
+
+    recycler.get_rss = lambda: 150.0
+    recycler.stopContext(fake_module('/apps/test_a.py'))
+    assert that(result.shouldStop).equals(True)
+
+
+@mock.patch.object(plugins, 'databases')
+def test_rollback_wraps_the_tests_of_the_given_kinds(databases):
+    u"Rollback rolls back what the tests of the given kinds did"
+
+    databases.start_rolled_back_transaction.return_value = True
+    rollback = plugins.Rollback(['functional'])
+    functional = fake_nose_case('test_a',
+                                '/apps/foo/tests/functional/test_foo.py')
+    unit = fake_nose_case('test_b', '/apps/foo/tests/unit/test_foo.py')
+
+    for test in (functional, unit):
+        test.test = None
+        rollback.startTest(test)
+        rollback.stopTest(test)
+
+    assert that(databases.start_rolled_back_transaction.call_count).equals(1)
+    assert that(databases.rollback_transaction.call_count).equals(1)
+
+
+def test_rollback_leaves_django_test_cases_alone():
+    u"Rollback leaves the transactions of django test cases to them"
+
+    from django.test import TestCase
+
+    class Case(TestCase):
+        def test_nothing(self):
+            pass
+
+    test = fake_nose_case('test_a', '/apps/foo/tests/functional/test_foo.py')
+    test.test = Case('test_nothing')
+
+    assert that(plugins.Rollback(['functional']).wants(test)).equals(False)
+
+
+class FakeConnection(object):
+    alias = 'default'
+    use_debug_cursor = None
+
+    def __init__(self):
+        self.queries = []
+
+    def query(self, sql):
+        self.queries.append({'sql': sql, 'time': '0.010'})
+
+
+@mock.patch.object(plugins, 'connections')
+def test_queries_counts_the_queries_of_every_test(connections):
+    u"Queries records how many queries each test ran, and their shapes"
+
+    connection = FakeConnection()
+    connections.all.return_value = [connection]
+    counter = plugins.Queries()
+    test = fake_nose_case('test_a', '/apps/foo/tests/integration/test_foo.py')
+
+    counter.startTest(test)
+    assert that(connection.use_debug_cursor).equals(True)
+    for pk in (1, 2):
+        connection.query('SELECT * FROM "foo" WHERE "id" = %d' % pk)
+    counter.stopTest(test)
+
+    assert that(connection.use_debug_cursor).equals(None)
+    record, = counter.get_report()
+    assert that(record['queries']).equals(2)
+    assert that(record['app']).equals('foo')
+    assert that(record['repeated']).equals([
+        (2, 'SELECT * FROM "foo" WHERE "id" = ?'),
+    ])
+
+
+@mock.patch.object(plugins, 'connections')
+def test_queries_fails_the_tests_over_the_limit_of_their_app(connections):
+    u"Queries makes the tests that run too many queries for their app fail"
+
+    import unittest
+
+    connection = FakeConnection()
+    connections.all.return_value = [connection]
+
+    class Case(unittest.TestCase):
+        def test_loop(self):
+            for pk in range(3):
+                connection.query('SELECT %d' % pk)
+
+    counter = plugins.Queries({'foo': 2, '*': 10})
+    test = fake_nose_case('test_a', '/apps/foo/tests/integration/test_foo.py')
+    test.test = Case('test_loop')
+
+    counter.startTest(test)
+    assert test.test.test_loop.when.called.to.throw(
+        AssertionError,
+        'the test ran 3 sql queries, UNCLEBOB_MAX_QUERIES allows 2')
+
+
+@mock.patch.object(plugins.memory, 'reset_peak_rss')
+@mock.patch.object(plugins.memory, 'get_peak_rss')
+def test_memory_measures_every_test(get_peak_rss, reset_peak_rss):
+    u"Memory records how much each test raised the peak and held on to"
+
+    reset_peak_rss.return_value = True
+    get_peak_rss.side_effect = [100.0, 130.0]
+    get_rss = mock.Mock(side_effect=[90.0, 95.5])
+    measure = plugins.Memory(get_rss)
+    test = fake_nose_case('test_a', '/apps/foo/tests/integration/test_foo.py')
+
+    measure.beforeTest(test)
+    measure.afterTest(test)
+
+    assert that(measure.get_report()).equals([dict(
+        test='test_a',
+        module='/apps/foo/tests/integration/test_foo.py',
+        app='foo',
+        kind='integration',
+        peak=30.0,
+        reset=True,
+        held=5.5,
+        types=[],
+    )])
+
+
+@mock.patch.object(plugins.profiling, 'get_profile_path')
+def test_profile_profiles_the_tests_it_wants(get_profile_path):
+    u"Profile writes a pstats file per test of the kind or app it was given"
+
+    import tempfile
+
+    get_profile_path.return_value = tempfile.mktemp(suffix='.pstats')
+    profile = plugins.Profile('unit')
+    unit = fake_nose_case('test_a', '/apps/foo/tests/unit/test_foo.py')
+    functional = fake_nose_case('test_b',
+                                '/apps/foo/tests/functional/test_foo.py')
+    try:
+        for test in (unit, functional):
+            profile.beforeTest(test)
+            profile.afterTest(test)
+
+        record, = profile.get_report()
+        assert that(record['test']).equals('test_a')
+        assert that(record['path']).equals(get_profile_path.return_value)
+        assert that(os.path.exists(record['path'])).equals(True)
+    finally:
+        os.remove(get_profile_path.return_value)
+
+
+def test_sampling_samples_on_its_own_in_forked_workers():
+    u"Sampling starts a sampler of its own where the parent's doesn't run"
+
+    sampler = mock.Mock()
+    sampler.is_running.return_value = False
+    sampler.start.return_value = True
+    sampler.get_stacks.return_value = {'tests;test_a;case.py:1(run)': 3}
+    sampling = plugins.Sampling(sampler)
+    test = fake_nose_case('test_a', '/apps/foo/tests/unit/test_foo.py')
+
+    sampling.begin()
+    sampling.beforeTest(test)
+    assert that(sampler.test).equals('test_a')
+    sampling.afterTest(test)
+    assert that(sampler.test).equals(None)
+    sampling.finalize(None)
+
+    sampler.stop.assert_called_once_with()
+    assert that(sampling.get_report()).equals(
+        {'tests;test_a;case.py:1(run)': 3})
+
+
+def test_sampling_leaves_the_samples_of_the_parent_to_it():
+    u"Sampling reports nothing when the sampler of the runner is running"
+
+    sampler = mock.Mock()
+    sampler.is_running.return_value = True
+    sampling = plugins.Sampling(sampler)
+
+    sampling.begin()
+    sampling.finalize(None)
+
+    assert that(sampler.start.called).equals(False)
+    assert that(sampler.stop.called).equals(False)
+    assert that(sampling.get_report()).equals(None)
+
+
+def test_describe_tells_where_a_test_comes_from():
+    u"describe gives the id, module, app and kind of a test, plus fields"
+
+    test = fake_nose_case('test_a', '/apps/foo/tests/unit/test_foo.py')
+    assert that(plugins.describe(test, seconds=1.0)).equals(dict(
+        test='test_a',
+        module='/apps/foo/tests/unit/test_foo.py',
+        app='foo',
+        kind='unit',
+        seconds=1.0,
+    ))
+
+
+@mock.patch.object(plugins.time, 'time')
+def test_trace_records_when_each_test_ran_and_where(time):
+    u"Trace records when each test started, for how long, and its process"
+
+    time.side_effect = [10.0, 11.0, 11.5, 12.0]
+    tracer = plugins.Trace()
+    test = fake_nose_case('test_a', '/apps/foo/tests/unit/test_foo.py')
+
+    tracer.begin()
+    tracer.beforeTest(test)
+    tracer.addFailure(test, None)
+    tracer.afterTest(test)
+    tracer.finalize(None)
+
+    assert that(tracer.get_report()).equals([
+        dict(test='test_a', module='/apps/foo/tests/unit/test_foo.py',
+             app='foo', kind='unit', started=11.0, seconds=0.5,
+             outcome='failure', pid=os.getpid()),
+        dict(test=None, started=10.0, seconds=2.0, pid=os.getpid()),
+    ])
+
+
+def test_plugins_do_not_add_nose_options():
+    u"unclebob plugins are always enabled and add no --with-* option"
+
+    parser = mock.Mock()
+    durations = plugins.Durations()
+    durations.options(parser, {})
+
+    assert that(parser.add_option.call_count).equals(0)
+    assert that(durations.enabled).equals(True)
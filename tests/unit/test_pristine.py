@@ -0,0 +1,113 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import sqlite3
+
+from sure import that
+
+from unclebob import pristine
+
+
+class FakeConnection(object):
+    "just enough of a django connection to an in-memory sqlite database"
+
+    class ops(object):
+        @staticmethod
+        def quote_name(name):
+            return '"%s"' % name
+
+    def __init__(self):
+        self.connection = sqlite3.connect(':memory:')
+
+    def cursor(self):
+        return self.connection.cursor()
+
+
+def count(connection, table):
+    cursor = connection.cursor()
+    cursor.execute('SELECT count(*) FROM %s' % table)
+    return cursor.fetchone()[0]
+
+
+def test_restore_pristine_copy_puts_back_the_migrated_rows():
+    u"restore_pristine_copy throws away what was written after the copy"
+
+    connection = FakeConnection()
+    connection.connection.executescript('''
+        CREATE TABLE thing (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT);
+        INSERT INTO thing (name) VALUES ('migrated');
+    ''')
+    pristine.keep_pristine_copy(connection)
+
+    connection.connection.executescript('''
+        INSERT INTO thing (name) VALUES ('written by a test');
+        DELETE FROM thing WHERE name = 'migrated';
+    ''')
+    pristine.restore_pristine_copy(connection)
+
+    cursor = connection.cursor()
+    cursor.execute('SELECT id, name FROM thing')
+    assert that(cursor.fetchall()).equals([(1, u'migrated')])
+
+    cursor.execute("INSERT INTO thing (name) VALUES ('next')")
+    assert that(cursor.lastrowid).equals(2)
+
+
+def test_pristine_copy_of_a_table_named_sequences():
+    u"keep_pristine_copy copes with a table of the project named sequences"
+
+    connection = FakeConnection()
+    connection.connection.executescript('''
+        CREATE TABLE sequences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT);
+        INSERT INTO sequences (name) VALUES ('migrated');
+    ''')
+    pristine.keep_pristine_copy(connection)
+
+    connection.connection.executescript('''
+        INSERT INTO sequences (name) VALUES ('written by a test');
+    ''')
+    pristine.restore_pristine_copy(connection)
+
+    cursor = connection.cursor()
+    cursor.execute('SELECT id, name FROM sequences')
+    assert that(cursor.fetchall()).equals([(1, u'migrated')])
+
+    cursor.execute("INSERT INTO sequences (name) VALUES ('next')")
+    assert that(cursor.lastrowid).equals(2)
+
+
+def test_restore_pristine_copy_needs_a_copy():
+    u"restore_pristine_copy does nothing when no copy was kept"
+
+    connection = FakeConnection()
+    connection.connection.executescript('''
+        CREATE TABLE thing (id INTEGER PRIMARY KEY, name TEXT);
+        INSERT INTO thing (name) VALUES ('kept');
+    ''')
+    pristine.restore_pristine_copy(connection)
+
+    assert that(count(connection, 'thing')).equals(1)
@@ -0,0 +1,102 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import pstats
+import cProfile
+
+from sure import that
+
+from unclebob import profiling
+
+
+def inner():
+    return sum(range(10000))
+
+
+def outer():
+    return [inner() for _ in range(20)]
+
+
+def test_wants_the_tests_of_the_kind_or_app():
+    u"wants takes every test without only, else the ones of its kind or app"
+
+    assert that(profiling.wants(None, 'foo', 'unit')).equals(True)
+    assert that(profiling.wants('unit', 'foo', 'unit')).equals(True)
+    assert that(profiling.wants('foo', 'foo', 'integration')).equals(True)
+    assert that(profiling.wants('bar', 'foo', 'unit')).equals(False)
+
+
+def test_label_names_the_file_line_and_function():
+    u"label shows builtins by name, else file:line(function)"
+
+    assert that(profiling.label(('~', 0, '<len>'))).equals('<len>')
+    assert that(profiling.label(('/apps/foo/views.py', 12, 'index'))) \
+        .equals('views.py:12(index)')
+
+
+def test_collapse_keeps_the_time_under_the_stack_it_was_spent_in():
+    u"collapse writes the stacks from the callers pstats keeps"
+
+    profile = cProfile.Profile()
+    profile.enable()
+    outer()
+    profile.disable()
+    stats = pstats.Stats(profile)
+
+    stacks = profiling.collapse(stats, ('test_it',))
+    under_inner = [stack for stack in stacks
+                   if stack.endswith('(inner)')]
+    assert that(under_inner).equals([
+        'test_it;test_profiling.py:38(outer);test_profiling.py:34(inner)',
+    ])
+    assert abs(sum(stacks.values()) - stats.total_tt) < 1e-5
+
+
+def test_format_report_lists_the_functions_and_tests():
+    u"format_report shows the hottest functions, then the tests"
+
+    stats = mock_stats({
+        ('/apps/foo/views.py', 12, 'index'): (1, 1, 0.5, 0.7, {}),
+        ('~', 0, '<len>'): (3, 3, 0.2, 0.2, {}),
+    })
+    records = [dict(test='test_a', app='foo', kind='unit', seconds=0.7)]
+
+    assert that(profiling.format_report(stats, records, 1)).equals(
+        '\n'.join([
+            '',
+            "Uncle Bob's 1 hottest functions (own time, cumulative time, "
+            "calls):",
+            '     0.500s     0.700s         1  views.py:12(index)',
+            '',
+            "Uncle Bob's 1 most expensive tests to profile:",
+            '     0.700s  test_a (foo unit)',
+        ]))
+
+
+def mock_stats(entries):
+    class Stats(object):
+        stats = entries
+
+    return Stats()
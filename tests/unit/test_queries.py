@@ -0,0 +1,79 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+from sure import that
+
+from unclebob import queries
+
+
+def test_get_shape_takes_the_literals_out():
+    u"get_shape replaces numbers, strings and lists of them"
+
+    sql = ('SELECT "name" FROM "foo" WHERE "id" = 42 AND "name" = \'it\'\'s\''
+           ' AND "bar_id" IN (1, 2, 3)')
+    assert that(queries.get_shape(sql)).equals(
+        'SELECT "name" FROM "foo" WHERE "id" = ? AND "name" = ?'
+        ' AND "bar_id" IN (...)')
+
+
+def test_summarize_counts_the_queries_and_the_repeated_shapes():
+    u"summarize returns the count, the seconds and the repeated shapes"
+
+    found = [
+        {'sql': 'SELECT * FROM "foo" WHERE "id" = 1', 'time': '0.002'},
+        {'sql': 'SELECT * FROM "foo" WHERE "id" = 2', 'time': '0.003'},
+        {'sql': 'SELECT * FROM "bar"', 'time': '0.001'},
+    ]
+    count, seconds, repeated = queries.summarize(found)
+
+    assert that(count).equals(3)
+    assert that(round(seconds, 3)).equals(0.006)
+    assert that(repeated).equals([(2, 'SELECT * FROM "foo" WHERE "id" = ?')])
+
+
+def test_get_max_queries_per_app():
+    u"get_max_queries reads a number for every app or a dict per app"
+
+    assert that(queries.get_max_queries('foo', 10)).equals(10)
+    assert that(queries.get_max_queries('foo', {'foo': 5})).equals(5)
+    assert that(queries.get_max_queries('bar', {'foo': 5})).equals(None)
+    assert that(queries.get_max_queries('bar', {'*': 20})).equals(20)
+
+
+def test_format_report_lists_the_tests_that_ran_the_most_queries():
+    u"format_report shows the tests with the most queries first"
+
+    records = [
+        dict(test='test_few', app='foo', kind='unit', queries=1,
+             seconds=0.001, repeated=[]),
+        dict(test='test_many', app='bar', kind='integration', queries=12,
+             seconds=0.25, repeated=[(10, 'SELECT ?')]),
+    ]
+    assert that(queries.format_report(records, 1)).equals('\n'.join([
+        '',
+        "Uncle Bob's 1 tests that ran the most queries:",
+        '      12     0.250s  test_many (bar integration)',
+        '             10x  SELECT ?',
+    ]))
@@ -0,0 +1,99 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import sys
+import signal
+
+from sure import that
+
+from unclebob import sampling
+from unclebob.timing import Timer
+
+
+def test_timer_knows_the_current_phase():
+    u"Timer.current is the innermost phase going on"
+
+    timer = Timer()
+    assert that(timer.current).equals(None)
+    with timer.phase('tests'):
+        with timer.phase('preload'):
+            assert that(timer.current).equals('preload')
+
+        assert that(timer.current).equals('tests')
+
+    assert that(timer.current).equals(None)
+
+
+def test_sample_counts_the_stack_under_the_phase_and_test():
+    u"Sampler.sample counts the stack under the current phase and test"
+
+    timer = Timer()
+    sampler = sampling.Sampler(timer)
+    sampler.test = 'test_it'
+    with timer.phase('tests'):
+        sampler.sample(signal.SIGPROF, sys._getframe())
+        sampler.sample(signal.SIGPROF, sys._getframe())
+
+    stack, = sampler.get_stacks().keys()
+    assert stack.startswith('tests;test_it;')
+    assert stack.endswith(';%s' % sampling.label(sys._getframe().f_code))
+    assert that(sampler.get_stacks()[stack]).equals(2)
+
+
+def test_start_and_stop_arm_the_cpu_timer():
+    u"Sampler.start arms the cpu timer, Sampler.stop disarms it"
+
+    sampler = sampling.Sampler(Timer(), interval=0.5)
+    assert that(sampler.start()).equals(True)
+    try:
+        assert that(sampler.is_running()).equals(True)
+        assert that(signal.getitimer(signal.ITIMER_PROF)[1]).equals(0.5)
+    finally:
+        sampler.stop()
+
+    assert that(sampler.is_running()).equals(False)
+    assert that(signal.getitimer(signal.ITIMER_PROF)).equals((0.0, 0.0))
+
+
+def test_format_report_shows_the_phases_tests_and_functions():
+    u"format_report shows the cpu time per phase, test and function"
+
+    stacks = {
+        'migrate;-;manage.py:1(<module>);south.py:10(migrate)': 25,
+        'tests;test_a;case.py:1(run);views.py:5(index)': 20,
+        'tests;test_b;case.py:1(run);views.py:5(index)': 10,
+    }
+    assert that(sampling.format_report(stacks, 0.01, 1)).equals('\n'.join([
+        '',
+        'Uncle Bob took 55 samples, cpu time per phase:',
+        '      0.30s  tests',
+        '      0.25s  migrate',
+        '',
+        "Uncle Bob's 1 tests with the most cpu time:",
+        '      0.20s  test_a',
+        '',
+        "Uncle Bob's 1 busiest functions:",
+        '      0.30s  views.py:5(index)',
+    ]))
@@ -0,0 +1,197 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import json
+import mock
+import signal
+import shutil
+import socket
+import tempfile
+import threading
+
+from os.path import join
+from StringIO import StringIO
+from sure import that, that_with_context
+
+from unclebob import client
+from unclebob.server import Server
+
+
+def prepare_a_socket(context, *args, **kw):
+    context.directory = tempfile.mkdtemp()
+    context.path = join(context.directory, 'server.sock')
+    context.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    context.listener.bind(context.path)
+    context.listener.listen(1)
+    context.requests = []
+
+
+def and_close_it(context, *args, **kw):
+    context.listener.close()
+    shutil.rmtree(context.directory)
+
+
+def answer(context, *chunks):
+    "accepts one connection in a thread, replying with chunks"
+    def serve():
+        connection, _ = context.listener.accept()
+        context.requests.append(json.loads(client.read_line(connection)))
+        for chunk in chunks:
+            connection.sendall(chunk)
+        connection.close()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    return thread
+
+
+@that_with_context(prepare_a_socket, and_close_it)
+def test_client_streams_the_output_and_returns_the_status(context):
+    u"the client writes out what the server streams and exits with its status"
+
+    thread = answer(context, 'Ran 2 tests\n', 'FAILED\n\x001\n')
+    output = StringIO()
+
+    status = client.request(context.path, ['foo', '--unit'], output)
+    thread.join()
+
+    assert that(status).equals(1)
+    assert that(output.getvalue()).equals('Ran 2 tests\nFAILED\n')
+    assert that(context.requests).equals([{'argv': ['foo', '--unit']}])
+
+
+@that_with_context(prepare_a_socket, and_close_it)
+def test_client_knows_when_the_server_restarts(context):
+    u"the client returns None when the server is starting over"
+
+    thread = answer(context, 'restarting...\n\x00restart\n')
+    status = client.request(context.path, [], StringIO())
+    thread.join()
+
+    assert that(status).equals(None)
+
+
+def test_client_without_a_server():
+    u"the client tells how to start the server when there is none"
+
+    stderr = StringIO()
+    with mock.patch.object(client, 'get_socket_path') as get_socket_path:
+        get_socket_path.return_value = '/nowhere/server.sock'
+        with mock.patch('sys.stderr', stderr):
+            assert that(client.main(['--unit'])).equals(2)
+
+    assert 'unclebob_serve' in stderr.getvalue()
+
+
+def test_server_restarts_when_the_models_change():
+    u"Server.handle starts over instead of running stale models"
+
+    runner = mock.Mock()
+    runner.get_schema_fingerprint.return_value = 'new'
+    server = Server(runner, path='/tmp/unused.sock')
+    server.fingerprint = 'old'
+    server.watcher = mock.Mock()
+    server.watcher.poll.return_value = ['/apps/foo/models.py']
+    server.fork = mock.Mock()
+
+    connection = mock.Mock()
+    connection.recv.side_effect = [json.dumps({'argv': ['--unit']}) + '\n']
+
+    assert that(server.handle(connection)).equals(True)
+    assert that(server.fork.call_count).equals(0)
+    assert connection.sendall.call_args[0][0].endswith('\x00restart\n')
+
+
+def test_server_forks_a_run_per_request():
+    u"Server.handle runs the request in a child and sends its status"
+
+    runner = mock.Mock()
+    runner.get_schema_fingerprint.return_value = 'same'
+    server = Server(runner, path='/tmp/unused.sock')
+    server.fingerprint = 'same'
+    server.watcher = mock.Mock()
+    server.watcher.poll.return_value = []
+    server.fork = mock.Mock(return_value=1)
+
+    connection = mock.Mock()
+    connection.recv.side_effect = [json.dumps({'argv': ['--unit']}) + '\n']
+
+    with mock.patch('sys.stdout', StringIO()):
+        assert that(server.handle(connection)).equals(False)
+
+    server.fork.assert_called_once_with(connection, ['--unit'])
+    connection.sendall.assert_called_once_with('\x001\n')
+
+
+def fork_a_run(run, old_config=None):
+    runner = mock.Mock()
+    server = Server(runner, path='/tmp/unused.sock')
+    server.old_config = old_config
+    server.graph = mock.Mock()
+    server.graph.get_reachable.return_value = set()
+    server.run = run
+
+    ours, theirs = socket.socketpair()
+    try:
+        return server.fork(theirs, ['--unit'])
+    finally:
+        ours.close()
+        theirs.close()
+
+
+def test_server_fork_reports_the_children_killed_by_a_signal():
+    u"Server.fork tells 128 plus the signal when the child got killed"
+
+    def get_killed(argv):
+        os.kill(os.getpid(), signal.SIGKILL)
+
+    assert that(fork_a_run(get_killed)).equals(128 + signal.SIGKILL)
+
+
+def test_server_fork_takes_sys_exit_for_a_success():
+    u"Server.fork takes a bare sys.exit() as a success, like python does"
+
+    def exit(argv):
+        raise SystemExit()
+
+    assert that(fork_a_run(exit)).equals(0)
+    assert that(fork_a_run(mock.Mock(side_effect=SystemExit(3)))).equals(3)
+
+
+@mock.patch('unclebob.server.databases.TemplateClones')
+def test_server_fork_gives_every_run_a_copy_of_the_database(TemplateClones):
+    u"Server.fork copies the warm test database for each run, then drops it"
+
+    clones = TemplateClones.return_value
+
+    def run(argv):
+        # the child runs on the copy
+        return list(clones.prepare.call_args_list) != [mock.call(0)]
+
+    assert that(fork_a_run(run, 'old config')).equals(0)
+    TemplateClones.assert_called_once_with('old config')
+    clones.create.assert_called_once_with(1)
+    clones.drop.assert_called_once_with()
@@ -0,0 +1,155 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import mock
+import shutil
+import sqlite3
+import tempfile
+
+from sure import that, that_with_context
+from django.conf import settings
+
+from unclebob import snapshots
+
+
+def prepare_the_cache(context, *args, **kw):
+    context.old_cache_dir = getattr(settings, 'UNCLEBOB_CACHE_DIR', None)
+    settings.UNCLEBOB_CACHE_DIR = tempfile.mkdtemp()
+
+
+def and_clean_it(context, *args, **kw):
+    shutil.rmtree(settings.UNCLEBOB_CACHE_DIR)
+    settings.UNCLEBOB_CACHE_DIR = context.old_cache_dir
+
+
+def make_sqlite_connection(name=':memory:'):
+    connection = mock.Mock()
+    connection.alias = 'default'
+    connection.settings_dict = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+    }
+
+    def cursor():
+        if not isinstance(connection.connection, sqlite3.Connection):
+            connection.connection = sqlite3.connect(name)
+        return connection.connection.cursor()
+
+    connection.cursor.side_effect = cursor
+    return connection
+
+
+@that_with_context(prepare_the_cache, and_clean_it)
+def test_sqlite_snapshot_round_trip(context):
+    u"a sqlite snapshot brings back the schema and the migration history"
+
+    migrated = make_sqlite_connection()
+    migrated.cursor().executescript(
+        'CREATE TABLE south_migrationhistory (migration varchar(255));'
+        "INSERT INTO south_migrationhistory VALUES ('0001_initial');")
+
+    snapshots.save_snapshot(migrated, 'uncle.bob', 'abc')
+    assert that(snapshots.has_snapshot(migrated, 'abc')).equals(True)
+    assert that(snapshots.has_snapshot(migrated, 'def')).equals(False)
+
+    fresh = make_sqlite_connection()
+    snapshots.load_snapshot(fresh, 'uncle.bob', 'abc')
+
+    rows = fresh.cursor().execute(
+        'SELECT migration FROM south_migrationhistory').fetchall()
+    assert that(rows).equals([(u'0001_initial',)])
+
+
+@that_with_context(prepare_the_cache, and_clean_it)
+def test_saving_a_snapshot_removes_the_stale_ones(context):
+    u"save_snapshot throws away the snapshots of older migrations"
+
+    connection = make_sqlite_connection()
+    connection.cursor().execute('CREATE TABLE t (id integer)')
+
+    snapshots.save_snapshot(connection, 'uncle.bob', 'old')
+    snapshots.save_snapshot(connection, 'uncle.bob', 'new')
+
+    assert that(os.listdir(settings.UNCLEBOB_CACHE_DIR + '/snapshots')).equals(
+        ['default-new.sql'])
+
+
+@mock.patch.object(snapshots, 'run_ddl')
+def test_postgresql_snapshots_are_template_databases(run_ddl):
+    u"on postgresql the snapshot is a template database to create from"
+
+    connection = mock.Mock()
+    connection.alias = 'default'
+    connection.settings_dict = {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': 'test_uncle',
+        'TEST_NAME': None,
+    }
+    connection.creation._get_test_db_name.return_value = 'test_uncle'
+
+    snapshots.load_snapshot(connection, 'uncle', '0123456789abcdef')
+
+    run_ddl.assert_called_once_with(
+        connection, 'uncle',
+        ('DROP DATABASE IF EXISTS %s', ['test_uncle']),
+        ('CREATE DATABASE %s TEMPLATE %s', [
+            'test_uncle', 'test_uncle_snapshot_0123456789ab']))
+
+
+@that_with_context(prepare_the_cache, and_clean_it)
+@mock.patch.object(snapshots, 'run_ddl')
+def test_saving_a_postgresql_snapshot_drops_the_stale_template(context,
+                                                               run_ddl):
+    u"save_snapshot drops the template database of older migrations"
+
+    connection = mock.Mock()
+    connection.alias = 'default'
+    connection.settings_dict = {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': 'test_uncle',
+        'TEST_NAME': None,
+    }
+    connection.creation._get_test_db_name.return_value = 'test_uncle'
+
+    snapshots.save_snapshot(connection, 'uncle', 'aaaaaaaaaaaaaaaa')
+    snapshots.save_snapshot(connection, 'uncle', 'bbbbbbbbbbbbbbbb')
+
+    assert that(list(run_ddl.call_args_list)).equals([
+        mock.call(
+            connection, 'uncle',
+            ('DROP DATABASE IF EXISTS %s', [
+                'test_uncle_snapshot_aaaaaaaaaaaa']),
+            ('CREATE DATABASE %s TEMPLATE %s', [
+                'test_uncle_snapshot_aaaaaaaaaaaa', 'test_uncle'])),
+        mock.call(
+            connection, 'uncle',
+            ('DROP DATABASE IF EXISTS %s', [
+                'test_uncle_snapshot_bbbbbbbbbbbb']),
+            ('DROP DATABASE IF EXISTS %s', [
+                'test_uncle_snapshot_aaaaaaaaaaaa']),
+            ('CREATE DATABASE %s TEMPLATE %s', [
+                'test_uncle_snapshot_bbbbbbbbbbbb', 'test_uncle'])),
+    ])
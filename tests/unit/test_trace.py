@@ -0,0 +1,71 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import json
+import tempfile
+
+from sure import that
+
+from unclebob import trace
+
+
+def test_build_puts_the_phases_and_the_tests_on_tracks():
+    u"build puts the phases on the runner's track, each worker on its own"
+
+    phases = [('setup_databases', 10.0, 2.5)]
+    records = [
+        dict(test='test_a', app='foo', kind='unit', started=13.0,
+             seconds=0.25, outcome='success', pid=200),
+        dict(test=None, started=12.5, seconds=1.0, pid=200),
+    ]
+    events = trace.build(phases, records, pid=100)
+
+    assert that(events).equals([
+        dict(name='thread_name', ph='M', pid=100, tid=100,
+             args=dict(name='runner')),
+        dict(name='setup_databases', cat='phase', ph='X', ts=10000000,
+             dur=2500000, pid=100, tid=100, args={}),
+        dict(name='thread_name', ph='M', pid=100, tid=200,
+             args=dict(name='worker 1 (pid 200)')),
+        dict(name='test_a', cat='unit', ph='X', ts=13000000, dur=250000,
+             pid=100, tid=200, args=dict(outcome='success', app='foo')),
+        dict(name='nose', cat='process', ph='X', ts=12500000, dur=1000000,
+             pid=100, tid=200, args={}),
+    ])
+
+
+def test_save_writes_the_trace_event_format():
+    u"save writes the events under traceEvents"
+
+    path = tempfile.mktemp(suffix='.json')
+    trace.save(path, [dict(name='tests', ph='X')])
+    try:
+        assert that(json.load(open(path))).equals({
+            'traceEvents': [{'name': 'tests', 'ph': 'X'}],
+            'displayTimeUnit': 'ms',
+        })
+    finally:
+        os.remove(path)
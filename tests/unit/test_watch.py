@@ -0,0 +1,99 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import sys
+import types
+import shutil
+import tempfile
+
+from os.path import join
+from sure import that, that_with_context
+
+from unclebob import watch
+
+
+def prepare_a_dir(context, *args, **kw):
+    context.root = tempfile.mkdtemp()
+    context.module = join(context.root, 'models.py')
+    open(context.module, 'w').write('LIMIT = 1\n')
+    open(join(context.root, 'models.pyc'), 'w').close()
+
+
+def and_remove_it(context, *args, **kw):
+    shutil.rmtree(context.root)
+
+
+@that_with_context(prepare_a_dir, and_remove_it)
+def test_watcher_notices_what_changed(context):
+    u"Watcher.poll tells the files added, changed and removed"
+
+    watcher = watch.Watcher([context.root])
+    assert that(watcher.poll()).equals([])
+
+    added = join(context.root, 'views.py')
+    open(added, 'w').close()
+    os.utime(context.module, (0, 0))
+
+    assert that(watcher.poll()).equals([context.module, added])
+
+    os.remove(added)
+    assert that(watcher.poll()).equals([added])
+
+
+@that_with_context(prepare_a_dir, and_remove_it)
+def test_forget_modules_drops_the_stale_ones(context):
+    u"forget_modules drops the modules loaded out of the given files"
+
+    module = types.ModuleType('unclebob_watched')
+    module.__file__ = context.module + 'c'
+    sys.modules['unclebob_watched'] = module
+
+    watch.forget_modules([context.module])
+
+    assert 'unclebob_watched' not in sys.modules
+
+
+@that_with_context(prepare_a_dir, and_remove_it)
+def test_find_stale_modules_follows_the_imports(context):
+    u"find_stale_modules finds what imports the changed files"
+
+    class FakeGraph(object):
+        def is_project_file(self, filename):
+            return filename == context.module
+
+        def get_reachable(self, filename):
+            return set([filename, '/project/helpers.py'])
+
+    module = types.ModuleType('unclebob_watched')
+    module.__file__ = context.module
+    sys.modules['unclebob_watched'] = module
+    try:
+        assert that(watch.find_stale_modules(
+            FakeGraph(), ['/project/helpers.py'])).equals([context.module])
+        assert that(watch.find_stale_modules(
+            FakeGraph(), ['/project/views.py'])).equals([])
+    finally:
+        del sys.modules['unclebob_watched']
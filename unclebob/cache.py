@@ -0,0 +1,66 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+
+from os.path import exists, join
+from django.conf import settings
+
+
+def get_cache_dir():
+    "where unclebob keeps what it learns between runs"
+    return getattr(settings, 'UNCLEBOB_CACHE_DIR', None) or \
+        join(os.getcwd(), '.unclebob')
+
+
+def cache_path(*parts):
+    return join(get_cache_dir(), *parts)
+
+
+def writable_path(*parts):
+    "like cache_path, but making sure its directory exists"
+    path = cache_path(*parts)
+    if not exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    return path
+
+
+def read(name, default=None):
+    path = cache_path(name)
+    if not exists(path):
+        return default
+
+    return open(path).read()
+
+
+def write(name, content):
+    path = writable_path(name)
+    # write then rename, so that a killed run never leaves half a file
+    partial = '%s.%d' % (path, os.getpid())
+    with open(partial, 'w') as f:
+        f.write(content)
+
+    os.rename(partial, path)
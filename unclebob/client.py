@@ -0,0 +1,131 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import sys
+import json
+import time
+import socket
+
+from os.path import join
+
+# keep this module free of django imports, it must start in no time
+
+SOCKET_FILE = 'server.sock'
+
+# what follows the output of a run: the exit status of the run, or
+# "restart" when the server is starting over
+MARKER = '\0'
+
+usage = """usage: python -m unclebob.client [test labels] [test options]
+
+runs the tests in the server started with `python manage.py unclebob_serve`
+"""
+
+
+def get_socket_path():
+    return os.environ.get('UNCLEBOB_SOCKET') or \
+        join(os.getcwd(), '.unclebob', SOCKET_FILE)
+
+
+def read_line(connection):
+    data = ''
+    while not data.endswith('\n'):
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+
+    return data
+
+
+def connect(path, timeout=0):
+    "connects to the server, waiting up to timeout seconds for it"
+    deadline = time.time() + timeout
+    while True:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(path)
+            return client
+        except socket.error:
+            client.close()
+            if time.time() >= deadline:
+                raise
+
+            time.sleep(0.1)
+
+
+def request(path, argv, output, timeout=0):
+    """sends argv to the server and streams the output of the run,
+    returning its exit status, or None when the server restarted"""
+    client = connect(path, timeout)
+    client.sendall(json.dumps({'argv': argv}) + '\n')
+
+    tail = None
+    while True:
+        chunk = client.recv(4096)
+        if not chunk:
+            break
+
+        if tail is not None:
+            tail += chunk
+        elif MARKER in chunk:
+            chunk, tail = chunk.split(MARKER, 1)
+            output.write(chunk)
+        else:
+            output.write(chunk)
+        output.flush()
+
+    client.close()
+    status = (tail or '1').strip()
+    if status == 'restart':
+        return None
+
+    return int(status)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if '-h' in argv or '--help' in argv:
+        sys.stdout.write(usage)
+        return 0
+
+    path = get_socket_path()
+    try:
+        status = request(path, argv, sys.stdout)
+        while status is None:
+            # the server is starting over, give it time to come back
+            status = request(path, argv, sys.stdout, timeout=120)
+    except socket.error:
+        sys.stderr.write(
+            "Uncle Bob found no server at %s, start one with `python "
+            "manage.py unclebob_serve`\n" % path)
+        return 2
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import sys
+
+from glob import glob
+from django.conf import settings
+
+from unclebob import cache
+
+try:
+    import coverage
+except ImportError:
+    coverage = None
+
+DATA_FILE = ('coverage', '.coverage')
+
+
+def get_packages(nose_argv):
+    "the packages the --cover-package arguments of nose_argv name"
+    prefix = '--cover-package='
+    return [arg[len(prefix):].strip('"\'') for arg in nose_argv
+            if arg.startswith(prefix)]
+
+
+def without_nose_coverage(nose_argv):
+    """nose_argv without nose's own coverage plugin, whose tracer would
+    run on top of the one unclebob starts"""
+    return [arg for arg in nose_argv if arg != '--with-coverage']
+
+
+def has_c_tracer():
+    "whether coverage got built with its C tracer, many times cheaper"
+    from coverage import collector
+    return getattr(collector, 'CTracer', None) is not None
+
+
+class Measurement(object):
+    """coverage measured across every process of a run. Each process
+    writes a data file of its own, and the parent combines them once
+    all of them are done"""
+
+    def __init__(self, packages):
+        self.packages = packages
+        self.data_file = cache.writable_path(*DATA_FILE)
+        # lines only, branches cost a second lookup on every line
+        self.coverage = coverage.Coverage(
+            data_file=self.data_file, data_suffix=True, branch=False,
+            timid=False, source=packages or None)
+
+    def start(self):
+        for path in glob('%s*' % self.data_file):
+            os.remove(path)  # left by an older run
+
+        self.coverage.start()
+
+    def save(self):
+        """stops measuring and writes what this process measured. Worker
+        processes call it right before they are done"""
+        self.coverage.stop()
+        self.coverage.save()
+
+    def combine(self):
+        "combines the data files of every process and writes the reports"
+        self.save()
+        combined = coverage.Coverage(
+            data_file=self.data_file, source=self.packages or None)
+        combined.combine()
+        combined.save()
+
+        combined.report(file=sys.stdout)
+        html = getattr(settings, 'UNCLEBOB_COVERAGE_HTML',
+                       cache.cache_path('coverage', 'html'))
+        if html:
+            combined.html_report(directory=html)
+
+        xml = getattr(settings, 'UNCLEBOB_COVERAGE_XML', 'coverage.xml')
+        if xml:
+            combined.xml_report(outfile=xml)
+
+        return combined
@@ -0,0 +1,335 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import shutil
+import django
+import hashlib
+
+from os.path import exists, isfile, join, relpath, splitext
+from django.conf import settings
+from django.db import connections, load_backend, transaction
+from django.test.testcases import (
+    connections_support_transactions,
+    disable_transaction_methods,
+    restore_transaction_methods,
+)
+
+from unclebob import cache
+
+FINGERPRINT_FILE = 'database.fingerprint'
+
+
+def is_sqlite(connection):
+    return 'sqlite3' in connection.settings_dict['ENGINE']
+
+
+def is_postgresql(connection):
+    return 'postgresql' in connection.settings_dict['ENGINE']
+
+
+def is_in_memory(connection):
+    return is_sqlite(connection) and \
+        connection.settings_dict['NAME'] in ('', ':memory:')
+
+
+def get_clone_name(name, index):
+    root, extension = splitext(name)
+    return '%s_worker%d%s' % (root, index, extension)
+
+
+def get_maintenance_connection(connection, name):
+    "a throwaway connection to a database other than the test one"
+    settings_dict = connection.settings_dict.copy()
+    settings_dict['NAME'] = name
+    backend = load_backend(settings_dict['ENGINE'])
+    return backend.DatabaseWrapper(
+        settings_dict,
+        alias='__unclebob__',
+        allow_thread_sharing=False)
+
+
+def close_connections():
+    for connection in connections.all():
+        # closing an in-memory sqlite database would throw it away
+        if not is_in_memory(connection):
+            connection.close()
+
+
+def clone_database(connection, original_name, index):
+    """copies the (already migrated) test database of the given
+    connection and returns the name of the copy"""
+    template = connection.settings_dict['NAME']
+    clone = get_clone_name(template, index)
+
+    if is_sqlite(connection):
+        shutil.copyfile(template, clone)
+        return clone
+
+    if is_postgresql(connection):
+        maintenance = get_maintenance_connection(connection, original_name)
+        quote = maintenance.ops.quote_name
+        cursor = maintenance.cursor()
+        maintenance.creation._prepare_for_test_db_ddl()
+        cursor.execute('DROP DATABASE IF EXISTS %s' % quote(clone))
+        cursor.execute('CREATE DATABASE %s TEMPLATE %s' % (
+            quote(clone), quote(template)))
+        maintenance.close()
+        return clone
+
+    raise NotImplementedError(
+        "Uncle Bob can't clone %s databases" %
+        connection.settings_dict['ENGINE'])
+
+
+def drop_database(connection, original_name, name):
+    if is_sqlite(connection):
+        if os.path.exists(name):
+            os.remove(name)
+        return
+
+    maintenance = get_maintenance_connection(connection, original_name)
+    cursor = maintenance.cursor()
+    maintenance.creation._prepare_for_test_db_ddl()
+    cursor.execute('DROP DATABASE IF EXISTS %s' %
+                   maintenance.ops.quote_name(name))
+    maintenance.close()
+
+
+def use_database(alias, name):
+    "points both the settings and the connection of alias to name"
+    connection = connections[alias]
+    connection.close()
+    connection.settings_dict['NAME'] = name
+    if alias in settings.DATABASES:
+        settings.DATABASES[alias]['NAME'] = name
+
+
+class TemplateClones(object):
+    """clones the test databases built by ``setup_databases`` once per
+    worker process, so that workers never step on each other's data"""
+
+    def __init__(self, old_config):
+        old_names, mirrors = old_config or ([], [])
+        self.originals = dict(
+            (connection.alias, old_name)
+            for connection, old_name, destroy in old_names)
+        self.clones = {}
+
+    def get_aliases(self):
+        aliases = []
+        for alias in self.originals:
+            connection = connections[alias]
+            # forked workers get their own private copy of an
+            # in-memory database for free
+            if not is_in_memory(connection):
+                aliases.append(alias)
+
+        return sorted(aliases)
+
+    def create(self, workers):
+        close_connections()
+        for alias in self.get_aliases():
+            connection = connections[alias]
+            self.clones[alias] = [
+                clone_database(connection, self.originals[alias], index)
+                for index in range(workers)
+            ]
+
+    def prepare(self, index):
+        "meant to be called inside of the worker process number index"
+        for alias, names in self.clones.items():
+            use_database(alias, names[index])
+
+    def drop(self):
+        for alias, names in self.clones.items():
+            for name in names:
+                drop_database(
+                    connections[alias], self.originals[alias], name)
+
+        self.clones = {}
+
+
+def get_test_name(connection):
+    return connection.creation._get_test_db_name()
+
+
+def get_test_connections():
+    "the connections that get a test database of their own"
+    return [connections[alias] for alias in sorted(connections)
+            if not connections[alias].settings_dict['TEST_MIRROR']]
+
+
+def get_unclonable_engines():
+    "the engines of the test databases that workers can't get a copy of"
+    return sorted(set(
+        connection.settings_dict['ENGINE']
+        for connection in get_test_connections()
+        if not (is_sqlite(connection) or is_postgresql(connection))))
+
+
+def can_be_reused():
+    for connection in get_test_connections():
+        if is_sqlite(connection) and \
+           get_test_name(connection) in ('', ':memory:'):
+            return False
+
+    return True
+
+
+def database_exists(connection, name):
+    if is_sqlite(connection):
+        return exists(name)
+
+    probe = get_maintenance_connection(connection, name)
+    try:
+        probe.cursor()
+        return True
+    except Exception:
+        return False
+    finally:
+        probe.close()
+
+
+def find_schema_files(app_path):
+    "the files that define the database schema of an app"
+    filenames = []
+    models = join(app_path, 'models.py')
+    if isfile(models):
+        filenames.append(models)
+
+    for name in ('models', 'migrations'):
+        for root, dirnames, files in os.walk(join(app_path, name)):
+            dirnames.sort()
+            filenames.extend(
+                join(root, f) for f in sorted(files) if f.endswith('.py'))
+
+    return filenames
+
+
+def get_versions():
+    "the versions of what builds the test databases"
+    versions = ['django %s' % django.get_version()]
+    try:
+        import south
+        versions.append('south %s' % south.__version__)
+    except ImportError:
+        pass
+
+    return versions
+
+
+def get_fingerprint(app_paths):
+    """hashes the models and migrations of the given apps along with
+    where the test databases live, the installed apps and the versions of
+    django and south"""
+    fingerprint = hashlib.sha1()
+    for connection in get_test_connections():
+        fingerprint.update(connection.settings_dict['ENGINE'])
+        fingerprint.update(get_test_name(connection))
+
+    for name in list(settings.INSTALLED_APPS) + get_versions():
+        fingerprint.update(name)
+
+    for app_path in sorted(app_paths):
+        for filename in find_schema_files(app_path):
+            fingerprint.update(relpath(filename, app_path))
+            fingerprint.update(open(filename, 'rb').read())
+
+    return fingerprint.hexdigest()
+
+
+def is_up_to_date(fingerprint):
+    if cache.read(FINGERPRINT_FILE) != fingerprint:
+        return False
+
+    return all(database_exists(connection, get_test_name(connection))
+               for connection in get_test_connections())
+
+
+def save_fingerprint(fingerprint):
+    cache.write(FINGERPRINT_FILE, fingerprint)
+
+
+def point_to_test_databases(prepare=None):
+    """does what ``setup_databases`` does, but for test databases that
+    already exist (or that ``prepare`` fills), and returns the same kind
+    of old_config"""
+    old_names = []
+    mirrors = []
+    for connection in get_test_connections():
+        old_name = connection.settings_dict['NAME']
+        old_names.append((connection, old_name, True))
+        test_name = get_test_name(connection)
+        connection.close()
+        connection.settings_dict['NAME'] = test_name
+        if prepare is not None:
+            prepare(connection, old_name)
+
+        connection.features.confirm()
+
+    for alias in connections:
+        mirror = connections[alias].settings_dict['TEST_MIRROR']
+        if mirror:
+            mirrors.append((alias, connections[alias].settings_dict['NAME']))
+            connections[alias].settings_dict['NAME'] = \
+                connections[mirror].settings_dict['NAME']
+            connections[alias].features = connections[mirror].features
+
+    return old_names, mirrors
+
+
+def leave_test_databases(old_config):
+    "points the connections back to their original databases"
+    old_names, mirrors = old_config
+    for connection, old_name, destroy in old_names:
+        connection.close()
+        connection.settings_dict['NAME'] = old_name
+
+    for alias, old_name in mirrors:
+        connections[alias].settings_dict['NAME'] = old_name
+
+
+def start_rolled_back_transaction():
+    """opens a transaction on every database that the matching
+    ``rollback_transaction`` throws away, the way django's TestCase does.
+    Returns whether it could"""
+    if not connections_support_transactions():
+        return False
+
+    for alias in connections:
+        transaction.enter_transaction_management(using=alias)
+        transaction.managed(True, using=alias)
+
+    # what the test commits must be rolled back as well
+    disable_transaction_methods()
+    return True
+
+
+def rollback_transaction():
+    restore_transaction_methods()
+    for alias in connections:
+        transaction.rollback(using=alias)
+        transaction.leave_transaction_management(using=alias)
@@ -0,0 +1,226 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import re
+import imp
+import json
+
+from os.path import dirname, getmtime, isdir, isfile, join
+from nose.config import Config
+from nose.plugins.manager import DefaultPluginManager, NoPlugins
+from nose.selector import Selector
+from nose.util import tolist
+
+from unclebob import cache
+from unclebob.options import kinds
+
+INDEX_FILE = 'discovery.json'
+
+
+def get_selector(nose_argv=None):
+    """nose's own selector, configured from the argv unclebob runs nose
+    with, so that --match, --ignore-files, --include and --exclude pick
+    the test modules unclebob lists just like the ones nose finds. The
+    nose plugins get no say, they are not configured at this point"""
+    config = Config(env=os.environ, plugins=DefaultPluginManager())
+    options, _ = config.getParser().parse_args(list(nose_argv or [])[1:])
+
+    config.testMatch = re.compile(options.testMatch)
+    config.includeExe = options.includeExe
+    if options.ignoreFiles:
+        config.ignoreFiles = map(re.compile, tolist(options.ignoreFiles))
+    if options.include:
+        config.include = map(re.compile, tolist(options.include))
+    if options.exclude:
+        config.exclude = map(re.compile, tolist(options.exclude))
+
+    config.plugins = NoPlugins()
+    return Selector(config)
+
+
+def get_selection(selector):
+    "what the test modules selector picks depend on, as a string"
+    patterns = lambda regexes: [regex.pattern for regex in regexes or []]
+    config = selector.config
+    return json.dumps([
+        config.testMatch.pattern,
+        patterns(config.ignoreFiles),
+        patterns(config.include),
+        patterns(config.exclude),
+        config.includeExe,
+    ])
+
+
+def is_package(path):
+    return isfile(join(path, '__init__.py'))
+
+
+def find_app_path(name):
+    """finds the directory of an app through the import machinery, but
+    without running any of its code"""
+    path = None
+    # labels can be paths too, and those are no dotted names
+    parts = os.sep in name and [name] or name.split('.')
+    for part in parts:
+        if path is None:
+            handle, pathname, description = imp.find_module(part)
+        else:
+            handle, pathname, description = imp.find_module(part, [path])
+
+        if handle is not None:
+            handle.close()
+
+        if description[2] == imp.PKG_DIRECTORY:
+            path = pathname
+        else:
+            path = dirname(pathname)
+
+    return os.path.abspath(path)
+
+
+def classify(filename):
+    "the app and the kind of tests of the given test module"
+    parts = os.path.normpath(filename).split(os.sep)
+    if 'tests' not in parts[:-1]:
+        return None, None
+
+    index = len(parts) - 1 - parts[::-1].index('tests')
+    app = index and parts[index - 1] or None
+    kind = parts[index + 1] in kinds and parts[index + 1] or None
+    return app, kind
+
+
+def walk_test_modules(path, selector=None):
+    """walks path the way nose would, returning the test modules found
+    and the mtimes of the directories that were looked at"""
+    selector = selector or get_selector()
+    modules = []
+    directories = {}
+
+    for root, dirnames, filenames in os.walk(path):
+        directories[root] = getmtime(root)
+        # nose skips those whatever the selector says
+        dirnames[:] = sorted(
+            name for name in dirnames
+            if not name.startswith(('.', '_')) and
+            selector.wantDirectory(join(root, name)))
+
+        for filename in sorted(filenames):
+            if not filename.startswith('.') and \
+                    selector.wantFile(join(root, filename)):
+                modules.append(join(root, filename))
+
+    return modules, directories
+
+
+def find_test_modules(paths, index=None, selector=None):
+    "lists the test module files nose would collect under the given paths"
+    if index is None:
+        selector = selector or get_selector()
+
+    modules = []
+    for path in paths:
+        # path may also name a single test, as in test_module.py:Case.test
+        if isfile(path.split(':', 1)[0]):
+            modules.append(path)
+        elif index is not None:
+            modules.extend(index.get_test_modules(path))
+        else:
+            modules.extend(walk_test_modules(path, selector)[0])
+
+    return modules
+
+
+class DiscoveryIndex(object):
+    """remembers where the apps live and which test modules each one of
+    their test directories hold, so that warm runs neither import the
+    apps nor walk the test trees"""
+
+    def __init__(self, apps=None, tests=None, selector=None):
+        self.apps = apps or {}
+        self.tests = tests or {}
+        self.selector = selector or get_selector()
+        self.dirty = False
+
+    @classmethod
+    def load(cls, selector=None):
+        try:
+            data = json.loads(cache.read(INDEX_FILE, '{}'))
+        except ValueError:
+            data = {}
+
+        index = cls(data.get('apps'), data.get('tests'), selector)
+        if data.get('selection') != get_selection(index.selector):
+            # other nose arguments, maybe other test modules
+            index.tests = {}
+
+        return index
+
+    def save(self):
+        if self.dirty:
+            cache.write(INDEX_FILE, json.dumps({
+                'apps': self.apps,
+                'tests': self.tests,
+                'selection': get_selection(self.selector),
+            }))
+            self.dirty = False
+
+    def get_app_path(self, name):
+        path = self.apps.get(name)
+        if path and is_package(path):
+            return path
+
+    def set_app_path(self, name, path):
+        self.apps[name] = path
+        self.dirty = True
+
+    def is_fresh(self, entry):
+        for directory, mtime in entry['directories'].items():
+            if not isdir(directory) or getmtime(directory) != mtime:
+                return False
+
+        return True
+
+    def get_test_modules(self, path):
+        entry = self.tests.get(path)
+        if entry is not None and self.is_fresh(entry):
+            return entry['modules']
+
+        modules, directories = walk_test_modules(path, self.selector)
+        self.tests[path] = dict(modules=modules, directories=directories)
+        self.dirty = True
+        return modules
+
+    def expand(self, paths):
+        "replaces the test directories in paths with their test modules"
+        expanded = []
+        for path in paths:
+            if isdir(path):
+                expanded.extend(self.get_test_modules(path))
+            else:
+                expanded.append(path)
+
+        return expanded
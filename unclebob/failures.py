@@ -0,0 +1,91 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import json
+
+from os.path import abspath, exists, relpath
+
+from unclebob import cache
+
+FAILURES_FILE = 'last-failed.json'
+
+
+def get_test_name(address):
+    """the name nose takes to run a single test again, out of the
+    (filename, module, call) address of that test"""
+    filename, module, call = address
+    if not filename:
+        return None
+
+    name = relpath(filename)
+    if call:
+        name = '%s:%s' % (name, call)
+
+    return name
+
+
+def get_filename(name):
+    return name.split(':', 1)[0]
+
+
+def load_failures():
+    "the names of the tests that failed last time they ran"
+    names = json.loads(cache.read(FAILURES_FILE, '[]'))
+    # tests whose modules are gone can't fail again
+    return [name for name in names if exists(get_filename(name))]
+
+
+def save_failures(results):
+    """results maps the name of every test that ran to whether it
+    passed. The tests that did not run keep their previous state, so
+    that rerunning a few of them won't forget about the others"""
+    failures = set(load_failures())
+    for name, passed in results.items():
+        if passed:
+            failures.discard(name)
+        else:
+            failures.add(name)
+
+    cache.write(FAILURES_FILE, json.dumps(sorted(failures), indent=1))
+    return sorted(failures)
+
+
+def is_under(filename, path):
+    filename, path = abspath(filename), abspath(path)
+    return filename == path or filename.startswith(path.rstrip(os.sep) +
+                                                   os.sep)
+
+
+def select_failures(failures, paths):
+    "the failures that were found under the given paths"
+    return [name for name in failures
+            if any(is_under(get_filename(name), path) for path in paths)]
+
+
+def failed_first(modules, failures):
+    "the modules with failing tests go first, the rest keep their order"
+    failed = set(abspath(get_filename(name)) for name in failures)
+    return sorted(modules, key=lambda module: abspath(module) not in failed)
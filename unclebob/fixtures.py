@@ -0,0 +1,233 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import json
+import hashlib
+import cPickle as pickle
+
+from os.path import join
+from itertools import groupby
+
+from django.conf import settings
+from django.core import serializers
+
+from unclebob import cache
+
+FIXTURES_DIR = 'fixtures'
+
+
+def is_enabled():
+    "the fixture cache only kicks in while unclebob runs the tests"
+    return bool(getattr(settings, 'UNCLEBOB_FIXTURE_CACHE', False) and
+                os.environ.get('UNCLEBOB_RUNNING'))
+
+
+def get_signature(model):
+    "changes whenever the fields of the model do"
+    return '%s.%s:%s' % (model._meta.app_label, model._meta.object_name,
+                         ','.join(field.attname
+                                  for field in model._meta.fields))
+
+
+def is_current(signatures):
+    "whether the models of a cached fixture are still the same"
+    from django.db.models import get_model
+
+    for signature in signatures:
+        label = signature.split(':', 1)[0]
+        model = get_model(*label.split('.'))
+        if model is None or get_signature(model) != signature:
+            return False
+
+    return True
+
+
+def parse(format, content):
+    "the objects of a fixture as plain python data, before django sees it"
+    if format == 'json':
+        return json.loads(content)
+
+    if format == 'yaml':
+        import yaml
+        return yaml.safe_load(content)
+
+
+def refers_by_natural_key(entry):
+    """whether a serialized object names some related row by natural key
+    rather than by primary key"""
+    from django.db.models import get_model
+
+    if not isinstance(entry, dict) or '.' not in entry.get('model', ''):
+        return False
+
+    model = get_model(*entry['model'].split('.'))
+    if model is None:
+        return False
+
+    many_to_many = [field.name for field in model._meta.many_to_many]
+    for name, value in (entry.get('fields') or {}).items():
+        if name in many_to_many:
+            values = value or []
+        else:
+            values = [value]
+
+        if any(isinstance(value, (list, tuple)) for value in values):
+            return True
+
+    return False
+
+
+def uses_natural_keys(format, content):
+    """whether the fixture refers to rows by natural key. Django turns
+    those into primary keys with a query while deserializing, and the
+    rows may have other primary keys next time, so such fixtures can't
+    be cached"""
+    if format == 'xml':
+        return '<natural>' in content
+
+    try:
+        data = parse(format, content)
+    except Exception:
+        return True  # django will tell what's wrong with it
+
+    if data is None:
+        return True  # a format unclebob can't look into
+
+    return any(map(refers_by_natural_key, data))
+
+
+def read_objects(format, stream, **options):
+    """deserializes the fixture in stream, or loads what was deserialized
+    last time the very same fixture was read"""
+    content = stream.read()
+    key = hashlib.sha1('%s\0%s' % (format, content)).hexdigest()
+    name = join(FIXTURES_DIR, '%s.pickle' % key)
+
+    cached = cache.read(name)
+    if cached is not None:
+        signatures, objects = pickle.loads(cached)
+        if signatures is None:
+            # natural keys, django has to look them up again
+            return list(serializers.deserialize(format, content, **options))
+
+        if is_current(signatures):
+            return objects
+
+    objects = list(serializers.deserialize(format, content, **options))
+    if uses_natural_keys(format, content):
+        cache.write(name, pickle.dumps((None, None), pickle.HIGHEST_PROTOCOL))
+        return objects
+
+    signatures = set(get_signature(obj.object.__class__) for obj in objects)
+    cache.write(name, pickle.dumps((signatures, objects),
+                                   pickle.HIGHEST_PROTOCOL))
+    return objects
+
+
+def can_bulk_create(model, objects, using):
+    """bulk_create skips the parents of inherited models and never
+    updates rows, so it only fits new rows of models without parents"""
+    if model._meta.parents:
+        return False
+
+    pks = [obj.object.pk for obj in objects]
+    if None in pks or len(set(pks)) != len(pks):
+        return False
+
+    existing = model._base_manager.using(using).filter(pk__in=pks)
+    return not existing.exists()
+
+
+def save_in_bulk(objects, using):
+    """saves the deserialized objects with one bulk_create per run of
+    objects of the same model, falling back to saving them one by one"""
+    for model, run in groupby(objects, lambda obj: obj.object.__class__):
+        run = list(run)
+        if not can_bulk_create(model, run, using):
+            for obj in run:
+                obj.save(using=using)
+            continue
+
+        model._base_manager.using(using).bulk_create(
+            [obj.object for obj in run])
+        save_m2m_in_bulk(model, run, using)
+
+
+def save_m2m_in_bulk(model, objects, using):
+    """adds the many-to-many rows of freshly inserted objects, one
+    bulk_create per relation when django made up its through model"""
+    for field in model._meta.many_to_many:
+        through = field.rel.through
+        values = [(obj, (obj.m2m_data or {}).get(field.name))
+                  for obj in objects]
+        values = [(obj, pks) for obj, pks in values if pks]
+        if not values:
+            continue
+
+        if not through._meta.auto_created:
+            for obj, pks in values:
+                setattr(obj.object, field.name, pks)
+            continue
+
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        through._base_manager.using(using).bulk_create([
+            through(**{'%s_id' % source: obj.object.pk,
+                       '%s_id' % target: pk})
+            for obj, pks in values for pk in pks])
+
+
+class Batched(object):
+    "a deserialized object whose save is put off to the end of its fixture"
+
+    def __init__(self, deserialized, batch):
+        self.deserialized = deserialized
+        self.object = deserialized.object
+        self.batch = batch
+
+    def save(self, using=None):
+        self.batch.append(self.deserialized)
+
+
+def batched(objects, using):
+    batch = []
+    for obj in objects:
+        yield Batched(obj, batch)
+
+    # loaddata asked for more, so the whole fixture went through it
+    save_in_bulk(batch, using)
+
+
+class CachedSerializers(object):
+    """stands for ``django.core.serializers`` inside of loaddata, reading
+    the fixtures out of the cache and saving them in bulk"""
+
+    def __getattr__(self, name):
+        return getattr(serializers, name)
+
+    def deserialize(self, format, stream, **options):
+        return batched(read_objects(format, stream, **options),
+                       options.get('using'))
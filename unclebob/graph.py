@@ -0,0 +1,215 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import ast
+import json
+import subprocess
+
+from os.path import abspath, dirname, exists, getmtime, isdir, join
+
+from unclebob import cache
+from unclebob.discovery import classify
+
+GRAPH_FILE = 'imports.json'
+
+
+def get_changed_files(ref):
+    """lists the files changed since the given git ref, uncommitted and
+    untracked ones included"""
+    def git(*args):
+        return subprocess.check_output(('git',) + args).splitlines()
+
+    top = git('rev-parse', '--show-toplevel')[0]
+    names = git('diff', '--name-only', ref, '--')
+    # ls-files names the files relative to the current directory,
+    # unless it is asked for their full names
+    names.extend(git('ls-files', '--others', '--exclude-standard',
+                     '--full-name', top))
+
+    return sorted(set(abspath(join(top, name)) for name in names))
+
+
+def is_schema_file(filename):
+    "whether filename defines models or migrations"
+    parts = os.path.normpath(filename).split(os.sep)
+    return filename.endswith('.py') and (
+        parts[-1] == 'models.py' or
+        'models' in parts[:-1] or
+        'migrations' in parts[:-1])
+
+
+def find_imports(filename):
+    "the (module name, level) of every import statement in filename"
+    tree = ast.parse(open(filename).read(), filename)
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            found.extend((alias.name, 0) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ''
+            found.append((module, node.level))
+            # "from package import module" imports package.module too
+            found.extend(('.'.join(filter(None, [module, alias.name])),
+                          node.level)
+                         for alias in node.names)
+
+    return found
+
+
+class ImportGraph(object):
+    """the static import graph of the python files of the project,
+    parsed lazily and only again when a file changes"""
+
+    def __init__(self, roots, project, files=None):
+        self.project = abspath(project)
+        self.roots = [abspath(root) for root in roots
+                      if isdir(root) and self.is_project_file(abspath(root))]
+        self.files = files or {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, roots, project):
+        try:
+            files = json.loads(cache.read(GRAPH_FILE, '{}'))
+        except ValueError:
+            files = {}
+
+        return cls(roots, project, files)
+
+    def save(self):
+        if self.dirty:
+            cache.write(GRAPH_FILE, json.dumps(self.files))
+            self.dirty = False
+
+    def is_project_file(self, filename):
+        if not (filename + os.sep).startswith(self.project + os.sep):
+            return False
+
+        # a virtualenv living inside of the project is not the project
+        return not any(part in filename for part in (
+            'site-packages', 'dist-packages'))
+
+    def resolve(self, name, level, filename):
+        "the project file that importing name from filename would run"
+        if level:
+            base = dirname(filename)
+            for _ in range(level - 1):
+                base = dirname(base)
+            candidates = [base]
+        else:
+            # python 2 tries the implicit relative import first
+            candidates = [dirname(filename)] + self.roots
+
+        parts = name and name.split('.') or []
+        for root in candidates:
+            path = join(root, *parts)
+            for found in (path + '.py', join(path, '__init__.py')):
+                if exists(found) and self.is_project_file(found):
+                    return found
+
+    def get_dependencies(self, filename):
+        mtime = getmtime(filename)
+        entry = self.files.get(filename)
+        if entry is None or entry['mtime'] != mtime:
+            try:
+                imports = find_imports(filename)
+            except SyntaxError:
+                imports = []
+
+            dependencies = set()
+            for name, level in imports:
+                found = self.resolve(name, level, filename)
+                if found and found != filename:
+                    dependencies.add(found)
+                    # importing a.b.c runs a/__init__.py and a/b/__init__.py
+                    parent = dirname(found)
+                    while exists(join(parent, '__init__.py')):
+                        init = join(parent, '__init__.py')
+                        if init != found and init != filename:
+                            dependencies.add(init)
+                        parent = dirname(parent)
+
+            entry = dict(mtime=mtime, imports=sorted(dependencies))
+            self.files[filename] = entry
+            self.dirty = True
+
+        return entry['imports']
+
+    def get_reachable(self, filename):
+        "every project file that filename imports, directly or not"
+        seen = set([filename])
+        pending = [filename]
+        while pending:
+            current = pending.pop()
+            if not exists(current):
+                continue
+
+            for dependency in self.get_dependencies(current):
+                if dependency not in seen:
+                    seen.add(dependency)
+                    pending.append(dependency)
+
+        return seen
+
+    def select(self, modules, changed, app_paths=()):
+        """the test modules that depend on any of the changed files.
+        Changes to files other than python modules select every test
+        module of the app they belong to, changes to the models or the
+        migrations every test module but the unit ones. A change that
+        can't be traced to any test module (settings, urls, bourbon.py,
+        files outside of the apps) selects every test module"""
+        modules = map(abspath, modules)
+        changed = set(abspath(name) for name in changed)
+        reachable = dict((module, self.get_reachable(module))
+                         for module in modules)
+        imported = set()
+        for names in reachable.values():
+            imported.update(names)
+
+        touched_apps = []
+        schema_changed = False
+        for name in changed:
+            app = [path for path in app_paths
+                   if name.startswith(path + os.sep)]
+            if is_schema_file(name):
+                schema_changed = True
+            elif name.endswith('.py'):
+                if name not in imported:
+                    return modules
+            elif app:
+                touched_apps.extend(app)
+            else:
+                return modules
+
+        selected = []
+        for module in modules:
+            in_touched_app = any(module.startswith(path + os.sep)
+                                 for path in touched_apps)
+            needs_schema = schema_changed and classify(module)[1] != 'unit'
+            if in_touched_app or needs_schema or reachable[module] & changed:
+                selected.append(module)
+
+        return selected
@@ -0,0 +1,167 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import time
+import sqlite3
+
+from os.path import exists, getsize, relpath
+
+from unclebob import cache
+
+HISTORY_FILE = 'history.db'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tests (
+    run INTEGER NOT NULL,
+    test TEXT NOT NULL,
+    module TEXT,
+    app TEXT,
+    kind TEXT,
+    seconds REAL NOT NULL,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS tests_by_run ON tests (run);
+CREATE INDEX IF NOT EXISTS tests_by_module ON tests (module);
+CREATE TABLE IF NOT EXISTS phases (
+    run INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    started REAL NOT NULL,
+    seconds REAL NOT NULL
+);
+'''
+
+
+def estimate_durations(modules, known):
+    """how long each module should take: what the history says or,
+    for the modules it knows nothing about, their file size scaled by
+    how fast the known modules ran"""
+    sizes = dict((module, float(getsize(module)))
+                 for module in modules if exists(module))
+
+    known_modules = [module for module in modules if module in known]
+    known_size = sum(sizes.get(module, 0) for module in known_modules)
+    rate = 1.0
+    if known_size:
+        rate = sum(known[module] for module in known_modules) / known_size
+
+    return dict(
+        (module, known.get(module, sizes.get(module, 0) * rate))
+        for module in modules)
+
+
+class History(object):
+    """what unclebob remembers about previous runs, in a sqlite database
+    under the cache dir"""
+
+    def __init__(self, path, keep=20):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.keep = keep
+
+    @classmethod
+    def open(cls, keep=20):
+        return cls(cache.writable_path(HISTORY_FILE), keep=keep)
+
+    @classmethod
+    def exists(cls):
+        return exists(cache.cache_path(HISTORY_FILE))
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, tests, phases):
+        "stores a run and forgets about the runs that are too old"
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO runs (started) VALUES (?)', (time.time(),))
+            run = cursor.lastrowid
+            self.connection.executemany(
+                'INSERT INTO tests VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(run, test['test'], test['module'], test['app'],
+                  test['kind'], test['seconds'], test['outcome'])
+                 for test in tests])
+            self.connection.executemany(
+                'INSERT INTO phases VALUES (?, ?, ?, ?)',
+                [(run, name, started, seconds)
+                 for name, started, seconds in phases])
+
+            oldest = run - self.keep
+            for table in ('tests', 'phases'):
+                self.connection.execute(
+                    'DELETE FROM %s WHERE run <= ?' % table, (oldest,))
+            self.connection.execute(
+                'DELETE FROM runs WHERE id <= ?', (oldest,))
+
+        return run
+
+    def get_slowest_tests(self, run, count):
+        return self.connection.execute(
+            'SELECT test, app, kind, seconds FROM tests WHERE run = ? '
+            'ORDER BY seconds DESC LIMIT ?', (run, count)).fetchall()
+
+    def get_totals_by(self, column, run):
+        return self.connection.execute(
+            'SELECT %s, COUNT(*), SUM(seconds) FROM tests WHERE run = ? '
+            'GROUP BY %s ORDER BY SUM(seconds) DESC' % (column, column),
+            (run,)).fetchall()
+
+    def get_phases(self, run):
+        return self.connection.execute(
+            'SELECT phase, seconds FROM phases WHERE run = ? '
+            'ORDER BY started', (run,)).fetchall()
+
+    def get_module_durations(self, relative_to=None):
+        """the average time each test module took, across the stored
+        runs, optionally keyed by paths relative to the given directory"""
+        rows = self.connection.execute(
+            'SELECT module, SUM(seconds) / COUNT(DISTINCT run) FROM tests '
+            'WHERE module IS NOT NULL GROUP BY module').fetchall()
+
+        if relative_to is not None:
+            rows = [(relpath(module, relative_to), seconds)
+                    for module, seconds in rows]
+
+        return dict(rows)
+
+    def format_report(self, run, count):
+        lines = ['', "Uncle Bob's %d slowest tests:" % count]
+        for test, app, kind, seconds in self.get_slowest_tests(run, count):
+            lines.append('  %8.3fs  %s (%s %s)' % (seconds, test, app, kind))
+
+        for column in ('app', 'kind'):
+            lines.extend(['', 'Time per %s:' % column])
+            for name, tests, seconds in self.get_totals_by(column, run):
+                lines.append('  %8.3fs  %s (%d tests)' % (
+                    seconds, name or '-', tests))
+
+        lines.extend(['', 'Time per phase:'])
+        for phase, seconds in self.get_phases(run):
+            lines.append('  %8.3fs  %s' % (seconds, phase))
+
+        return '\n'.join(lines)
@@ -61,11 +61,19 @@ class Command(test.Command):
         interactive = options.get('interactive', True)
         failfast = options.get('failfast', False)
 
+        from unclebob.runners import Nose
         TestRunner = get_runner(settings)
 
         if USE_SOUTH:
+            # without the patch, south's syncdb leaves the migrated
+            # apps out of the test database
             patch_for_test_db_setup()
-            call_command('migrate', interactive=False, verbosity=0)
+
+            # unclebob's runner migrates the test database by itself,
+            # out of a snapshot when it can, so there is no need to
+            # replay every migration here
+            if not issubclass(TestRunner, Nose):
+                call_command('migrate', interactive=False, verbosity=0)
 
         test_runner = TestRunner(
             verbosity=verbosity,
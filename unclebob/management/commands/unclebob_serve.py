@@ -0,0 +1,47 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+from django.core.management.base import BaseCommand
+
+from unclebob.options import basic
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + tuple(basic)
+    help = 'Keeps the test database migrated and runs the tests asked ' \
+        'for by `python -m unclebob.client`, through a unix socket'
+    requires_model_validation = False
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+        from django.test.utils import get_runner
+        from unclebob.server import Server
+
+        TestRunner = get_runner(settings)
+        runner = TestRunner(
+            verbosity=int(options.get('verbosity', 1)),
+            interactive=False,
+        )
+        Server(runner).serve_forever()
@@ -0,0 +1,106 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import gc
+import resource
+
+
+def reset_peak_rss():
+    """makes the peak start over from the current resident memory, which
+    only linux allows. Returns whether it could"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def get_peak_rss():
+    """the most resident memory this process had since reset_peak_rss, or
+    ever without procfs, in megabytes"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, OSError):
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def count_types():
+    """how many objects of each type the garbage collector tracks, once
+    it collected what it could. It walks the whole heap, so it is
+    nowhere near as cheap as reading the rss"""
+    gc.collect()
+    counts = {}
+    for obj in gc.get_objects():
+        kind = type(obj)
+        name = '%s.%s' % (kind.__module__, kind.__name__)
+        counts[name] = counts.get(name, 0) + 1
+
+    return counts
+
+
+def grown_types(before, after, count=5):
+    "the count types that gained the most objects between two count_types"
+    grown = [(number - before.get(name, 0), name)
+             for name, number in after.items()]
+    return sorted([(number, name) for number, name in grown if number > 0],
+                  reverse=True)[:count]
+
+
+def format_report(records, count):
+    """the count tests that raised the peak memory the most, then the ones
+    that left the most memory behind once torn down. Unless the peak could
+    start over for every test, only the tests that set a new all-time
+    peak count"""
+    if all(record['reset'] for record in records):
+        title = "Uncle Bob's %d tests that allocated the most:"
+    else:
+        title = "Uncle Bob's %d tests that raised the all-time peak the " \
+            "most:"
+
+    lines = ['', title % count]
+    for record in sorted(records, key=lambda record: record['peak'],
+                         reverse=True)[:count]:
+        lines.append('  %8.1fMB  %s (%s %s)' % (
+            record['peak'], record['test'], record['app'], record['kind']))
+
+    lines.extend(['', "Uncle Bob's %d tests that held on to the most "
+                  "memory:" % count])
+    for record in sorted(records, key=lambda record: record['held'],
+                         reverse=True)[:count]:
+        if record['held'] <= 0:
+            break
+
+        lines.append('  %8.1fMB  %s (%s %s)' % (
+            record['held'], record['test'], record['app'], record['kind']))
+        for number, name in record['types']:
+            lines.append('              +%d %s' % (number, name))
+
+    return '\n'.join(lines)
@@ -24,7 +24,7 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
 from functools import wraps
-from unclebob.options import basic
+from unclebob.options import basic, option_strings
 from django.core import management
 
 
@@ -42,7 +42,7 @@ def patch():
 
             new_options = basic[:]
 
-            ignored_opts = ('--unit', '--functional', '--integration')
+            ignored_opts = option_strings(basic)
             for opt in tester.option_list:
                 if opt.get_opt_string() not in ignored_opts:
                     new_options.insert(0, opt)
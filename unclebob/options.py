@@ -23,7 +23,9 @@
 # WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
-from optparse import make_option
+from optparse import make_option, OptionValueError
+
+kinds = ('unit', 'functional', 'integration')
 
 
 def add_option(kind):
@@ -33,8 +35,115 @@ def add_option(kind):
         dest='is_%s' % kind, default=False,
         help=msg.format(kind))
 
+
+def parse_shard(option, opt_str, value, parser):
+    try:
+        index, total = map(int, value.split('/'))
+    except ValueError:
+        index, total = 0, 0
+
+    if not 0 < index <= total:
+        raise OptionValueError(
+            '%s takes i/n, with 1 <= i <= n, got %r' % (opt_str, value))
+
+    setattr(parser.values, option.dest, (index, total))
+
 basic = [
     add_option('unit'),
     add_option('functional'),
     add_option('integration'),
+    make_option(
+        '--processes', action='store', type='int',
+        dest='processes', default=None,
+        help='Split the test modules across N worker processes '
+        '(defaults to settings.UNCLEBOB_PROCESSES or 1)'),
+    make_option(
+        '--reuse-db', action='store_true',
+        dest='reuse_db', default=False,
+        help='Keep the test database between runs, rebuilding it only '
+        'when the models or migrations change'),
+    make_option(
+        '--snapshots', action='store_true',
+        dest='snapshots', default=False,
+        help='Load the migrated test database from a snapshot instead of '
+        'running every migration again'),
+    make_option(
+        '--changed-since', action='store',
+        dest='changed_since', default=None, metavar='GIT_REF',
+        help='Only run the test modules that import, directly or not, '
+        'the files changed since GIT_REF'),
+    make_option(
+        '--durations', action='store', type='int',
+        dest='durations', default=None, metavar='N',
+        help='Record how long each test took and report the N slowest '
+        'ones, along with the time spent per app, kind and phase'),
+    make_option(
+        '--shard', action='callback', type='string', callback=parse_shard,
+        dest='shard', default=None, metavar='i/n',
+        help='Only run the i-th of n shards of the test modules, balanced '
+        'by how long they took before'),
+    make_option(
+        '--last-failed', action='store_true',
+        dest='last_failed', default=False,
+        help='Only run the tests that failed last time'),
+    make_option(
+        '--failed-first', action='store_true',
+        dest='failed_first', default=False,
+        help='Run the test modules that failed last time before the '
+        'other ones'),
+    make_option(
+        '--watch', action='store_true',
+        dest='watch', default=False,
+        help='Keep the test database around and rerun the tests affected '
+        'by every change made to the apps'),
+    make_option(
+        '--overlap-db-setup', action='store_true',
+        dest='overlap_db_setup', default=False,
+        help='Run the unit tests in the background while the test '
+        'database is created and migrated'),
+    make_option(
+        '--tiers-parallel', action='store_true',
+        dest='tiers_parallel', default=False,
+        help='Run the unit, functional and integration tests at the same '
+        'time, each kind in a process of its own with its own copy of the '
+        'test database'),
+    make_option(
+        '--coverage', action='store_true',
+        dest='coverage', default=False,
+        help='Measure the coverage of the --cover-package packages in '
+        'every process and combine it at the end'),
+    make_option(
+        '--queries', action='store', type='int',
+        dest='queries', default=None, metavar='N',
+        help='Count the sql queries of each test and report the N tests '
+        'that ran the most, along with the queries they repeated'),
+    make_option(
+        '--memory', action='store', type='int',
+        dest='memory', default=None, metavar='N',
+        help='Measure the memory of each test and report the N tests that '
+        'allocated the most and the N that held on to the most'),
+    make_option(
+        '--profile', action='store', type='int',
+        dest='profile', default=None, metavar='N',
+        help='Profile each test on its own and report the N functions and '
+        'tests that took the most time'),
+    make_option(
+        '--profile-only', action='store',
+        dest='profile_only', default=None, metavar='KIND_OR_APP',
+        help='Only profile the tests of that kind (unit, functional or '
+        'integration) or of that app'),
+    make_option(
+        '--samples', action='store', type='int',
+        dest='samples', default=None, metavar='N',
+        help='Report the cpu time the sampling profiler saw per phase, '
+        'along with the N busiest tests and functions'),
+    make_option(
+        '--trace', action='store',
+        dest='trace', default=None, metavar='FILE',
+        help='Write a timeline of the phases of the run and of every test, '
+        'one track per process, for chrome://tracing or perfetto'),
 ]
+
+
+def option_strings(options):
+    return [opt.get_opt_string() for opt in options]
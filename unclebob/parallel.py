@@ -0,0 +1,211 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import gc
+import sys
+import nose
+import resource
+import multiprocessing
+
+from Queue import Empty
+from StringIO import StringIO
+from nose.importer import Importer
+from nose.selector import TestAddress
+
+from unclebob.plugins import Recycler, ResultCollector
+
+
+def get_rss():
+    "the resident memory of this process, in megabytes"
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / (1024.0 * 1024.0)
+    except (IOError, OSError):
+        # no procfs, the peak will do
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def preload_modules(modules):
+    """imports the given test modules the way nose would, so that the
+    workers forked afterwards find them imported already"""
+    importer = Importer()
+    for module in modules:
+        address = TestAddress(module.split(':', 1)[0])
+        try:
+            importer.importFromPath(address.filename, address.module)
+        except Exception:
+            pass  # the worker importing it again will report the error
+
+
+def freeze():
+    """gets rid of the garbage left by the imports before forking and,
+    where gc.freeze exists, hides what is left from the collector, so
+    that the workers won't copy the pages they share just to scan them"""
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+
+def balance(modules, count, weights):
+    """greedy bin-packing: the heaviest modules go first, each one to
+    the lightest bucket so far. Deterministic for the same input"""
+    buckets = [[] for _ in range(count)]
+    loads = [0.0] * count
+
+    heaviest_first = sorted(
+        modules, key=lambda module: (-weights.get(module, 0), module))
+    for module in heaviest_first:
+        lightest = min(range(count),
+                       key=lambda index: (loads[index], len(buckets[index])))
+        buckets[lightest].append(module)
+        loads[lightest] += weights.get(module, 0)
+
+    return [sorted(bucket) for bucket in buckets]
+
+
+def run_worker(index, argv, modules, results, prepare=None, plugins=(),
+               limits=None):
+    if prepare is not None:
+        prepare(index)
+
+    collector = ResultCollector()
+    extra = [collector]
+    recycler = None
+    if limits:
+        recycler = Recycler(modules, get_rss=get_rss, **limits)
+        extra.append(recycler)
+
+    stream = StringIO()
+    old_stderr = sys.stderr
+    sys.stderr = stream
+    try:
+        passed = nose.run(argv=argv + modules,
+                          addplugins=list(plugins) + extra)
+    finally:
+        sys.stderr = old_stderr
+
+    results.put(dict(
+        worker=index,
+        passed=bool(passed),
+        output=stream.getvalue(),
+        tests=collector.tests,
+        failures=collector.failures,
+        errors=collector.errors,
+        plugins=dict((plugin.name, plugin.get_report())
+                     for plugin in plugins),
+        remaining=recycler and recycler.get_report() or [],
+    ))
+
+
+def gather(results, workers, respawn=None):
+    """collects the report of every worker. Workers that were recycled
+    before running all of their modules get replaced through respawn"""
+    reports = []
+    pending = len(workers)
+    while pending:
+        try:
+            report = results.get(timeout=1)
+        except Empty:
+            if any(worker.is_alive() for worker in workers):
+                continue
+
+            # a worker may have reported and exited right after the get
+            # timed out, only the reports still missing then are lost
+            try:
+                report = results.get_nowait()
+            except Empty:
+                break
+
+        pending -= 1
+        reports.append(report)
+        if report.get('remaining') and respawn is not None:
+            workers[report['worker']].join()
+            respawn(report['worker'], report['remaining'])
+            pending += 1
+
+    for worker in workers:
+        worker.join()
+
+    return sorted(reports, key=lambda report: report['worker'])
+
+
+class Workers(object):
+    """worker processes running nose on buckets of test modules. With
+    limits, a worker that ran limits['max_tests'] tests or grew past
+    limits['max_rss'] megabytes hands the rest of its modules over to a
+    fresh one"""
+
+    def __init__(self, argv, prepare=None, plugins=(), limits=None):
+        self.argv = argv
+        self.prepare = prepare
+        self.plugins = plugins
+        self.limits = limits
+        self.results = multiprocessing.Queue()
+        self.processes = []
+
+    def start(self, index, modules):
+        worker = multiprocessing.Process(
+            target=run_worker,
+            args=(index, self.argv, modules, self.results, self.prepare,
+                  self.plugins, self.limits))
+        worker.start()
+        if index < len(self.processes):
+            self.processes[index] = worker
+        else:
+            self.processes.append(worker)
+
+    def start_all(self, buckets):
+        for index, modules in enumerate(buckets):
+            self.start(index, modules)
+
+        return self
+
+    def wait(self):
+        """waits for every worker and returns whether all of them passed
+        along with what the plugins of each worker reported"""
+        reports = gather(self.results, self.processes, respawn=self.start)
+
+        for report in reports:
+            sys.stderr.write(report['output'])
+
+        tests = sum(report['tests'] for report in reports)
+        failures = sum(report['failures'] for report in reports)
+        errors = sum(report['errors'] for report in reports)
+        recycled = sum(1 for report in reports if report.get('remaining'))
+        lost = len(self.processes) - len(reports) + recycled
+
+        print "Uncle Bob ran %d tests in %d processes " \
+            "(failures=%d, errors=%d, recycled workers=%d, " \
+            "lost workers=%d)" % (tests, len(self.processes), failures,
+                                  errors, recycled, lost)
+
+        passed = not lost and all(report['passed'] for report in reports)
+        return passed, [report['plugins'] for report in reports]
+
+
+def run_in_processes(argv, buckets, prepare=None, plugins=(), limits=None):
+    "runs nose once per bucket of test modules, each one in its own process"
+    return Workers(argv, prepare, plugins, limits).start_all(buckets).wait()
@@ -0,0 +1,472 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import time
+import types
+import pstats
+import cProfile
+
+from nose.plugins import Plugin
+from django.db import connections
+from django.test import TransactionTestCase
+
+from unclebob import databases, memory, pristine, profiling, queries
+from unclebob.discovery import classify
+from unclebob.failures import get_test_name
+from unclebob.watch import get_source
+
+
+class UncleBobPlugin(Plugin):
+    "base class for the plugins unclebob hands straight to nose"
+    enabled = True
+
+    def options(self, parser, env):
+        # always enabled, there is no --with-* flag to add
+        pass
+
+    def get_report(self):
+        "what the parent process should know once nose is done"
+        return None
+
+
+def get_test_module(test):
+    "the filename of the module test came from, when nose knows it"
+    try:
+        return test.address()[0]
+    except Exception:
+        return None
+
+
+def describe(test, **fields):
+    "the record of test that the plugins report, along with fields"
+    module = get_test_module(test)
+    app, kind = classify(module or '')
+    return dict(test=test.id(), module=module, app=app, kind=kind, **fields)
+
+
+class ResultCollector(UncleBobPlugin):
+    "keeps the counters of a nose run so they can be reported elsewhere"
+    name = 'unclebob-results'
+
+    def __init__(self):
+        super(ResultCollector, self).__init__()
+        self.tests = 0
+        self.failures = 0
+        self.errors = 0
+
+    def finalize(self, result):
+        self.tests = result.testsRun
+        self.failures = len(result.failures)
+        self.errors = len(result.errors)
+
+
+class Durations(UncleBobPlugin):
+    "times every test"
+    name = 'unclebob-durations'
+
+    def __init__(self):
+        super(Durations, self).__init__()
+        self.records = []
+        self.started = None
+        self.outcome = None
+
+    def startTest(self, test):
+        self.started = time.time()
+        self.outcome = 'success'
+
+    def addError(self, test, err):
+        self.outcome = 'error'
+
+    def addFailure(self, test, err):
+        self.outcome = 'failure'
+
+    def stopTest(self, test):
+        self.records.append(describe(
+            test,
+            seconds=time.time() - self.started,
+            outcome=self.outcome,
+        ))
+
+    def get_report(self):
+        return self.records
+
+
+class Outcomes(UncleBobPlugin):
+    "remembers which tests passed and which ones did not"
+    name = 'unclebob-outcomes'
+
+    def __init__(self):
+        super(Outcomes, self).__init__()
+        self.results = {}
+        self.passed = True
+
+    def startTest(self, test):
+        self.passed = True
+
+    def addError(self, test, err):
+        self.passed = False
+        self.record(test)
+
+    def addFailure(self, test, err):
+        self.passed = False
+
+    def stopTest(self, test):
+        self.record(test)
+
+    def record(self, test):
+        # errors raised while setting up a module or a class never reach
+        # stopTest, so they are recorded right away
+        try:
+            name = get_test_name(test.address())
+        except Exception:
+            return
+
+        if name:
+            self.results[name] = self.passed
+
+    def get_report(self):
+        return self.results
+
+
+class Recycler(UncleBobPlugin):
+    """stops the run once a test module is over and the worker either ran
+    max_tests tests or grew past max_rss megabytes, telling which of its
+    modules it did not get to"""
+    name = 'unclebob-recycler'
+
+    def __init__(self, modules, max_tests=None, max_rss=None, get_rss=None):
+        super(Recycler, self).__init__()
+        self.modules = modules
+        self.max_tests = max_tests
+        self.max_rss = max_rss
+        self.get_rss = get_rss
+        self.tests = 0
+        self.seen = set()
+        self.result = None
+        self.exhausted = False
+
+    def prepareTestResult(self, result):
+        self.result = result
+
+    def startContext(self, context):
+        if isinstance(context, types.ModuleType):
+            self.seen.add(get_source(context))
+
+    def startTest(self, test):
+        self.tests += 1
+        # modules that failed to import only show up as a failed test
+        module = get_test_module(test)
+        if module:
+            self.seen.add(os.path.abspath(module))
+
+    def is_exhausted(self):
+        if self.max_tests and self.tests >= self.max_tests:
+            return True
+
+        return bool(self.max_rss and self.get_rss() >= self.max_rss)
+
+    def stopContext(self, context):
+        if not isinstance(context, types.ModuleType) or self.exhausted:
+            return
+
+        if self.result is not None and self.is_exhausted():
+            self.exhausted = True
+            self.result.shouldStop = True
+
+    def get_report(self):
+        if not self.exhausted:
+            return []
+
+        return [module for module in self.modules
+                if os.path.abspath(module.split(':', 1)[0]) not in self.seen]
+
+
+class Rollback(UncleBobPlugin):
+    """runs every test of the given kinds inside of a transaction that
+    gets rolled back once it is over. django test cases take care of
+    their own transactions, so they are left alone"""
+    name = 'unclebob-rollback'
+
+    def __init__(self, kinds):
+        super(Rollback, self).__init__()
+        self.kinds = kinds
+        self.active = False
+
+    def wants(self, test):
+        if isinstance(getattr(test, 'test', None), TransactionTestCase):
+            return False
+
+        return classify(get_test_module(test) or '')[1] in self.kinds
+
+    def startTest(self, test):
+        if self.wants(test):
+            self.active = databases.start_rolled_back_transaction()
+
+    def stopTest(self, test):
+        if self.active:
+            databases.rollback_transaction()
+            self.active = False
+
+
+class Restore(UncleBobPlugin):
+    """puts the in-memory test databases back the way they were right
+    after the migrations, before each test module of the given kinds"""
+    name = 'unclebob-restore'
+
+    def __init__(self, kinds):
+        super(Restore, self).__init__()
+        self.kinds = kinds
+
+    def startContext(self, context):
+        if not isinstance(context, types.ModuleType):
+            return
+
+        if classify(get_source(context) or '')[1] in self.kinds:
+            pristine.restore_pristine_copies()
+
+
+class Covering(UncleBobPlugin):
+    "saves the coverage measured by the process nose ran in"
+    name = 'unclebob-coverage'
+
+    def __init__(self, measurement):
+        super(Covering, self).__init__()
+        self.measurement = measurement
+
+    def finalize(self, result):
+        self.measurement.save()
+
+
+class Queries(UncleBobPlugin):
+    """counts the sql queries of every test, and fails the tests that run
+    more of them than UNCLEBOB_MAX_QUERIES allows for their app"""
+    name = 'unclebob-queries'
+
+    def __init__(self, limits=None):
+        super(Queries, self).__init__()
+        self.limits = limits
+        self.records = []
+        self.debug_cursors = {}
+
+    def get_queries(self):
+        found = []
+        for connection in connections.all():
+            found.extend(connection.queries)
+
+        return found
+
+    def startTest(self, test):
+        for connection in connections.all():
+            self.debug_cursors[connection.alias] = connection.use_debug_cursor
+            connection.use_debug_cursor = True
+            connection.queries = []
+
+        limit = queries.get_max_queries(describe(test)['app'], self.limits)
+        if limit is not None:
+            self.limit(getattr(test, 'test', test), limit)
+
+    def limit(self, case, limit):
+        "makes the test method of case fail when it runs too many queries"
+        name = getattr(case, '_testMethodName', None)
+        method = name and getattr(case, name, None)
+        if method is None:
+            return
+
+        def run_at_most_limit_queries(*args, **kw):
+            result = method(*args, **kw)
+            count = len(self.get_queries())
+            if count > limit:
+                raise AssertionError(
+                    'the test ran %d sql queries, UNCLEBOB_MAX_QUERIES '
+                    'allows %d' % (count, limit))
+
+            return result
+
+        setattr(case, name, run_at_most_limit_queries)
+
+    def stopTest(self, test):
+        count, seconds, repeated = queries.summarize(self.get_queries())
+        for connection in connections.all():
+            connection.use_debug_cursor = self.debug_cursors.get(
+                connection.alias)
+            connection.queries = []
+
+        self.records.append(describe(
+            test,
+            queries=count,
+            seconds=seconds,
+            repeated=repeated[:5],
+        ))
+
+    def get_report(self):
+        return self.records
+
+
+class Memory(UncleBobPlugin):
+    """measures how much each test raised the peak memory of the process
+    and how much of it the process still holds after the teardown. With
+    types, it also tells which types of objects piled up"""
+    name = 'unclebob-memory'
+
+    def __init__(self, get_rss, types=False):
+        super(Memory, self).__init__()
+        self.get_rss = get_rss
+        self.types = types
+        self.records = []
+        self.before = None
+
+    def beforeTest(self, test):
+        # before the fixtures get loaded, after the teardown is over
+        counts = self.types and memory.count_types() or {}
+        reset = memory.reset_peak_rss()
+        self.before = (self.get_rss(), memory.get_peak_rss(), counts, reset)
+
+    def afterTest(self, test):
+        rss, peak, counts, reset = self.before
+        self.records.append(describe(
+            test,
+            peak=memory.get_peak_rss() - peak,
+            reset=reset,
+            held=self.get_rss() - rss,
+            types=self.types and memory.grown_types(
+                counts, memory.count_types()) or [],
+        ))
+
+    def get_report(self):
+        return self.records
+
+
+class Profile(UncleBobPlugin):
+    """profiles every test on its own, fixtures and teardown included,
+    writing each profile to a pstats file. Given only, a kind or an app,
+    it leaves the other tests alone"""
+    name = 'unclebob-profile'
+
+    def __init__(self, only=None):
+        super(Profile, self).__init__()
+        self.only = only
+        self.records = []
+        self.profile = None
+
+    def beforeTest(self, test):
+        record = describe(test)
+        if profiling.wants(self.only, record['app'], record['kind']):
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def afterTest(self, test):
+        if self.profile is None:
+            return
+
+        self.profile.disable()
+        path = profiling.get_profile_path(test.id())
+        self.profile.dump_stats(path)
+        self.profile = None
+
+        self.records.append(describe(
+            test,
+            path=path,
+            seconds=pstats.Stats(path).total_tt,
+        ))
+
+    def get_report(self):
+        return self.records
+
+
+class Sampling(UncleBobPlugin):
+    """tells the sampler which test is going on. Forked workers don't
+    inherit the timer of their parent, so they sample on their own and
+    hand their samples back"""
+    name = 'unclebob-sampling'
+
+    def __init__(self, sampler):
+        super(Sampling, self).__init__()
+        self.sampler = sampler
+        self.forked = False
+
+    def begin(self):
+        if not self.sampler.is_running():
+            self.forked = self.sampler.start()
+
+    def beforeTest(self, test):
+        self.sampler.test = test.id()
+
+    def afterTest(self, test):
+        self.sampler.test = None
+
+    def finalize(self, result):
+        if self.forked:
+            self.sampler.stop()
+
+    def get_report(self):
+        if self.forked:
+            return self.sampler.get_stacks()
+
+
+class Trace(UncleBobPlugin):
+    """remembers when each test started, how long it took and which
+    process ran it, along with the whole nose run of that process"""
+    name = 'unclebob-trace'
+
+    def __init__(self):
+        super(Trace, self).__init__()
+        self.records = []
+        self.began = None
+        self.started = None
+        self.outcome = None
+
+    def begin(self):
+        self.began = time.time()
+
+    def beforeTest(self, test):
+        self.started = time.time()
+        self.outcome = 'success'
+
+    def addError(self, test, err):
+        self.outcome = 'error'
+
+    def addFailure(self, test, err):
+        self.outcome = 'failure'
+
+    def afterTest(self, test):
+        self.records.append(describe(
+            test,
+            started=self.started,
+            seconds=time.time() - self.started,
+            outcome=self.outcome,
+            pid=os.getpid(),
+        ))
+
+    def finalize(self, result):
+        self.records.append(dict(
+            test=None,
+            started=self.began,
+            seconds=time.time() - self.began,
+            pid=os.getpid(),
+        ))
+
+    def get_report(self):
+        return self.records
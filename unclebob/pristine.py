@@ -0,0 +1,123 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+from django.db import connections
+
+from unclebob.databases import is_in_memory, is_sqlite
+
+PRISTINE = 'unclebob_pristine'
+# where sqlite_sequence is kept, named so that no table of the project
+# can take the name
+SEQUENCES = 'unclebob_sqlite_sequence'
+
+
+def use_memory_for_sqlite():
+    "makes every sqlite test database an in-memory one"
+    for connection in connections.all():
+        if is_sqlite(connection):
+            connection.settings_dict['TEST_NAME'] = None
+
+
+def get_tables(cursor, schema='main'):
+    cursor.execute(
+        "SELECT name FROM %s.sqlite_master WHERE type = 'table' AND "
+        "name NOT LIKE 'sqlite_%%'" % schema)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def has_sequences(cursor, schema='main'):
+    cursor.execute(
+        "SELECT count(*) FROM %s.sqlite_master WHERE type = 'table' AND "
+        "name = 'sqlite_sequence'" % schema)
+    return bool(cursor.fetchone()[0])
+
+
+def has_pristine_copy(cursor):
+    cursor.execute('PRAGMA database_list')
+    return PRISTINE in [row[1] for row in cursor.fetchall()]
+
+
+def get_memory_connections():
+    return [connection for connection in connections.all()
+            if is_in_memory(connection)]
+
+
+def keep_pristine_copy(connection):
+    """copies the rows of the freshly migrated in-memory database of
+    connection to another in-memory database, attached to the same
+    sqlite connection"""
+    connection.cursor()
+    raw = connection.connection
+    cursor = raw.cursor()
+    cursor.execute("ATTACH DATABASE ':memory:' AS %s" % PRISTINE)
+
+    quote = connection.ops.quote_name
+    for table in get_tables(cursor):
+        cursor.execute('CREATE TABLE %s.%s AS SELECT * FROM main.%s' % (
+            PRISTINE, quote(table), quote(table)))
+
+    if has_sequences(cursor):
+        cursor.execute('CREATE TABLE %s.%s AS SELECT * FROM '
+                       'main.sqlite_sequence' % (PRISTINE, SEQUENCES))
+    raw.commit()
+
+
+def restore_pristine_copy(connection):
+    """puts back the rows kept by ``keep_pristine_copy``, throwing away
+    whatever the tests wrote since"""
+    connection.cursor()
+    raw = connection.connection
+    cursor = raw.cursor()
+    if not has_pristine_copy(cursor):
+        return
+
+    pristine = set(get_tables(cursor, PRISTINE))
+
+    quote = connection.ops.quote_name
+    for table in get_tables(cursor):
+        cursor.execute('DELETE FROM main.%s' % quote(table))
+        if table in pristine:
+            cursor.execute('INSERT INTO main.%s SELECT * FROM %s.%s' % (
+                quote(table), PRISTINE, quote(table)))
+
+    if SEQUENCES in pristine and has_sequences(cursor):
+        cursor.execute('DELETE FROM main.sqlite_sequence')
+        cursor.execute('INSERT INTO main.sqlite_sequence SELECT * FROM '
+                       '%s.%s' % (PRISTINE, SEQUENCES))
+    raw.commit()
+
+
+def keep_pristine_copies():
+    "returns whether there was any in-memory database to keep a copy of"
+    memory = get_memory_connections()
+    for connection in memory:
+        keep_pristine_copy(connection)
+
+    return bool(memory)
+
+
+def restore_pristine_copies():
+    for connection in get_memory_connections():
+        restore_pristine_copy(connection)
@@ -0,0 +1,140 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import re
+import shutil
+import pstats
+
+from unclebob import cache
+
+PROFILES = 'profiles'
+UNSAFE = re.compile(r'[^\w.-]+')
+
+
+def get_profiles_dir():
+    return cache.cache_path(PROFILES)
+
+
+def erase():
+    "removes the profiles of an older run"
+    path = get_profiles_dir()
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+def get_profile_path(test_id):
+    "where the pstats of a single test go"
+    return cache.writable_path(
+        PROFILES, 'tests', '%s.pstats' % UNSAFE.sub('_', test_id))
+
+
+def wants(only, app, kind):
+    "whether a test of that app and kind should be profiled"
+    return not only or only in (app, kind)
+
+
+def label(func):
+    "how a pstats function key shows up in a stack"
+    filename, line, name = func
+    if filename == '~':
+        return name  # a builtin
+
+    return '%s:%d(%s)' % (os.path.basename(filename), line, name)
+
+
+def collapse(stats, prefix=(), depth=64):
+    """the stacks of stats in the collapsed format flamegraph tools read,
+    as {stack: seconds}. pstats only keeps who called whom, so the time of
+    a function called from different places is split between them in
+    proportion to what each of its callers spent in it"""
+    children = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def walk(func, path, share):
+        _, _, tottime, _, _ = stats.stats[func]
+        path = path + (func,)
+        stacks[path] = stacks.get(path, 0) + tottime * share
+        if len(path) >= depth:
+            return
+
+        for child, seconds in children.get(func, ()):
+            cumulative = stats.stats[child][3]
+            portion = cumulative and share * seconds / cumulative
+            if child not in path and portion * cumulative > 1e-6:
+                walk(child, path, portion)
+
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        if not callers:
+            walk(func, (), 1.0)
+
+    return dict((';'.join(prefix + tuple(map(label, path))), seconds)
+                for path, seconds in stacks.items())
+
+
+def write_collapsed(records, path):
+    "the collapsed stacks of every test, each under a frame named after it"
+    with open(path, 'w') as collapsed:
+        for record in records:
+            stats = pstats.Stats(record['path'])
+            stacks = collapse(stats, (record['test'].replace(';', '_'),))
+            for stack, seconds in sorted(stacks.items()):
+                microseconds = int(seconds * 1000000)
+                if microseconds:
+                    collapsed.write('%s %d\n' % (stack, microseconds))
+
+
+def aggregate(records):
+    """merges the profiles of every test into profiles/all.pstats and
+    writes the collapsed stacks to profiles/stacks.txt"""
+    stats = pstats.Stats(*[record['path'] for record in records])
+    stats.dump_stats(cache.writable_path(PROFILES, 'all.pstats'))
+    write_collapsed(records, cache.writable_path(PROFILES, 'stacks.txt'))
+    return stats
+
+
+def format_report(stats, records, count):
+    "the count functions and tests that took the most time"
+    lines = ['', "Uncle Bob's %d hottest functions (own time, cumulative "
+             "time, calls):" % count]
+    functions = sorted(stats.stats.items(), key=lambda item: item[1][2],
+                       reverse=True)[:count]
+    for func, (_, calls, tottime, cumulative, _) in functions:
+        lines.append('  %8.3fs  %8.3fs  %8d  %s' % (
+            tottime, cumulative, calls, label(func)))
+
+    lines.extend(['', "Uncle Bob's %d most expensive tests to profile:" %
+                  count])
+    for record in sorted(records, key=lambda record: record['seconds'],
+                         reverse=True)[:count]:
+        lines.append('  %8.3fs  %s (%s %s)' % (
+            record['seconds'], record['test'], record['app'],
+            record['kind']))
+
+    return '\n'.join(lines)
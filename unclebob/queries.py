@@ -0,0 +1,82 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import re
+
+from django.conf import settings
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LISTS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def get_shape(sql):
+    """the sql of a query without its literals, so that the queries an N+1
+    loop runs all have the same shape"""
+    shape = LITERALS.sub('?', sql)
+    return LISTS.sub('(...)', shape)
+
+
+def summarize(queries, repeated=2):
+    """how many queries ran, for how long, and the shapes that ran at least
+    `repeated` times, most repeated first"""
+    shapes = {}
+    seconds = 0.0
+    for query in queries:
+        seconds += float(query.get('time') or 0)
+        shape = get_shape(query['sql'])
+        shapes[shape] = shapes.get(shape, 0) + 1
+
+    repeats = sorted(((count, shape) for shape, count in shapes.items()
+                      if count >= repeated), reverse=True)
+    return len(queries), seconds, repeats
+
+
+def get_max_queries(app, limits=None):
+    """how many queries the tests of app may run, from UNCLEBOB_MAX_QUERIES.
+    It is either a number for every app, or a dict of app labels to
+    numbers, where '*' stands for the apps it doesn't name"""
+    if limits is None:
+        limits = getattr(settings, 'UNCLEBOB_MAX_QUERIES', None)
+
+    if isinstance(limits, dict):
+        return limits.get(app, limits.get('*'))
+
+    return limits
+
+
+def format_report(records, count):
+    "the count tests that ran the most queries, with their repeated shapes"
+    records = sorted(records, key=lambda record: record['queries'],
+                     reverse=True)[:count]
+
+    lines = ['', "Uncle Bob's %d tests that ran the most queries:" % count]
+    for record in records:
+        lines.append('  %6d  %8.3fs  %s (%s %s)' % (
+            record['queries'], record['seconds'], record['test'],
+            record['app'], record['kind']))
+        for times, shape in record['repeated'][:3]:
+            lines.append('          %5dx  %s' % (times, shape[:120]))
+
+    return '\n'.join(lines)
@@ -24,18 +24,63 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
 import os
+import sys
 import imp
 import nose
 
 from os import path as os_path
-from os.path import dirname, join
+from os.path import join
 from optparse import OptionParser
 
 from django.conf import settings
 from django.core import management
+from django.db import models
+from django.utils.importlib import import_module
 from django.test.simple import DjangoTestSuiteRunner
 
-from unclebob.options import basic
+from unclebob import (
+    cover,
+    databases,
+    memory,
+    parallel,
+    pristine,
+    profiling,
+    queries,
+    sampling,
+    snapshots,
+    trace,
+)
+from unclebob.timing import Timer
+from unclebob.history import History, estimate_durations
+from unclebob.plugins import (
+    Covering,
+    Durations,
+    Memory,
+    Outcomes,
+    Profile,
+    Queries,
+    Restore,
+    Rollback,
+    Sampling,
+    Trace,
+)
+from unclebob.failures import (
+    failed_first,
+    load_failures,
+    save_failures,
+    select_failures,
+)
+from unclebob.options import basic, kinds, option_strings
+from unclebob.databases import TemplateClones
+from unclebob.watch import Watcher, find_stale_modules, forget_modules
+from unclebob.graph import ImportGraph, get_changed_files
+from unclebob.discovery import (
+    DiscoveryIndex,
+    classify,
+    find_app_path,
+    find_test_modules,
+    get_selector,
+)
 
 
 def unique(lst):
@@ -46,8 +91,37 @@ def unique(lst):
     return l
 
 
+def collect(reports, plugin):
+    """puts together what plugin reported in every process, the items
+    of the plugins that report a dict"""
+    collected = []
+    for report in reports:
+        found = report.get(plugin.name) or []
+        if isinstance(found, dict):
+            found = found.items()
+
+        collected.extend(found)
+
+    return collected
+
+
 class Nose(DjangoTestSuiteRunner):
     IGNORED_APPS = ['unclebob', 'south']
+    reuse_db = False
+    snapshots = False
+    discovery_index = None
+    selector = None
+    record_durations = False
+    record_failures = False
+    failed_first = False
+    restart = False
+    warm_databases = None
+    measurement = None
+    sampler = None
+
+    def __init__(self, *args, **kw):
+        super(Nose, self).__init__(*args, **kw)
+        self.timer = Timer()
 
     def get_setting_or_list(self, name):
         return getattr(settings, name, [])
@@ -57,7 +131,7 @@ class Nose(DjangoTestSuiteRunner):
         apps.extend(self.get_setting_or_list('UNCLEBOB_IGNORED_APPS'))
         return apps
 
-    def get_argv_options(self):
+    def get_argv_parser(self):
         parser = OptionParser()
         map(parser.add_option, basic)
         command = management.get_commands()['test']
@@ -65,23 +139,148 @@ class Nose(DjangoTestSuiteRunner):
         if isinstance(command, basestring):
             command = management.load_command_class('django.core', 'test')
 
+        ignored_opts = option_strings(basic)
         for opt in command.option_list:
-            if opt.get_opt_string() not in (
-                '--unit',
-                '--functional',
-                '--integration',
-            ):
+            if opt.get_opt_string() not in ignored_opts:
                 parser.add_option(opt)
 
-        (_options, _) = parser.parse_args()
+        return parser
+
+    def get_argv_options(self):
+        (_options, _) = self.get_argv_parser().parse_args()
 
         options = dict(
             is_unit=_options.is_unit,
             is_functional=_options.is_functional,
             is_integration=_options.is_integration,
+            processes=_options.processes,
+            reuse_db=_options.reuse_db,
+            snapshots=_options.snapshots,
+            changed_since=_options.changed_since,
+            durations=_options.durations,
+            shard=_options.shard,
+            last_failed=_options.last_failed,
+            failed_first=_options.failed_first,
+            watch=_options.watch,
+            tiers_parallel=_options.tiers_parallel,
+            overlap_db_setup=_options.overlap_db_setup,
+            coverage=_options.coverage,
+            queries=_options.queries,
+            memory=_options.memory,
+            profile=_options.profile,
+            profile_only=_options.profile_only,
+            samples=_options.samples,
+            trace=_options.trace,
         )
         return options
 
+    def get_processes(self, options):
+        processes = options.get('processes')
+        if processes is None:
+            processes = getattr(settings, 'UNCLEBOB_PROCESSES', 1)
+
+        return max(int(processes), 1)
+
+    def get_reuse_db(self, options):
+        return bool(options.get('reuse_db') or
+                    getattr(settings, 'UNCLEBOB_REUSE_DB', False))
+
+    def get_snapshots(self, options):
+        return bool(options.get('snapshots') or
+                    getattr(settings, 'UNCLEBOB_SNAPSHOTS', False))
+
+    def get_record_durations(self, options):
+        return options.get('durations') is not None or \
+            getattr(settings, 'UNCLEBOB_RECORD_DURATIONS', False)
+
+    def start_measuring_coverage(self, options, nose_argv):
+        if not (options.get('coverage') or
+                getattr(settings, 'UNCLEBOB_COVERAGE', False)):
+            return None
+
+        if cover.coverage is None:
+            print "Uncle Bob can't measure the coverage without the " \
+                "coverage package, pip install coverage"
+            return None
+
+        if not cover.has_c_tracer():
+            print "Uncle Bob is measuring the coverage with the python " \
+                "tracer, reinstall coverage with its C extension to " \
+                "make it much faster"
+
+        measurement = cover.Measurement(cover.get_packages(nose_argv))
+        measurement.start()
+        return measurement
+
+    def start_sampling(self):
+        if not getattr(settings, 'UNCLEBOB_SAMPLING', True):
+            return None
+
+        sampler = sampling.Sampler(
+            self.timer, 1.0 / getattr(settings, 'UNCLEBOB_SAMPLING_HZ', 100))
+        if sampler.start():
+            return sampler
+
+    def stop_sampling(self, reports, count=None):
+        self.sampler.stop()
+        stacks = self.sampler.get_stacks()
+        for stack, samples in collect(reports, Sampling):
+            stacks[stack] = stacks.get(stack, 0) + samples
+
+        sampling.save(stacks, self.sampler.interval)
+        if count:
+            print sampling.format_report(
+                stacks, self.sampler.interval, count)
+
+    def get_overlap_db_setup(self, options):
+        return bool(options.get('overlap_db_setup') or
+                    getattr(settings, 'UNCLEBOB_OVERLAP_DB_SETUP', False))
+
+    def get_record_failures(self, options):
+        return bool(options.get('last_failed') or
+                    options.get('failed_first') or
+                    getattr(settings, 'UNCLEBOB_RECORD_FAILURES', True))
+
+    def get_plugins(self, options):
+        "the plugins unclebob hands to nose along with the argv"
+        plugins = []
+        if self.record_durations:
+            plugins.append(Durations())
+
+        if self.record_failures:
+            plugins.append(Outcomes())
+
+        rollback_kinds = self.get_setting_or_list('UNCLEBOB_ROLLBACK_KINDS')
+        if rollback_kinds:
+            plugins.append(Rollback(rollback_kinds))
+
+        restore_kinds = self.get_setting_or_list('UNCLEBOB_RESTORE_KINDS')
+        if restore_kinds:
+            plugins.append(Restore(restore_kinds))
+
+        if self.measurement is not None:
+            plugins.append(Covering(self.measurement))
+
+        max_queries = getattr(settings, 'UNCLEBOB_MAX_QUERIES', None)
+        if options.get('queries') is not None or max_queries is not None:
+            plugins.append(Queries(max_queries))
+
+        if options.get('memory'):
+            plugins.append(Memory(
+                parallel.get_rss,
+                getattr(settings, 'UNCLEBOB_MEMORY_TYPES', False)))
+
+        if options.get('profile'):
+            plugins.append(Profile(options.get('profile_only')))
+
+        if self.sampler is not None:
+            plugins.append(Sampling(self.sampler))
+
+        if options.get('trace'):
+            plugins.append(Trace())
+
+        return plugins
+
     def get_nose_argv(self, covered_package_names=None):
         packages_to_cover = covered_package_names or []
 
@@ -120,15 +319,32 @@ class Nose(DjangoTestSuiteRunner):
         return filter(not_ignored,
                       filter(not_builtin, settings.INSTALLED_APPS))
 
+    def get_discovery_index(self):
+        if getattr(settings, 'UNCLEBOB_DISCOVERY_INDEX', True):
+            return DiscoveryIndex.load(self.selector)
+
+    def find_test_modules(self, paths):
+        return find_test_modules(paths, index=self.discovery_index,
+                                 selector=self.selector)
+
+    def get_app_path(self, name):
+        index = self.discovery_index
+        if index is not None and index.get_app_path(name):
+            return index.get_app_path(name)
+
+        module_path = find_app_path(name)
+
+        if index is not None:
+            index.set_app_path(name, module_path)
+
+        return module_path
+
     def get_paths_for(self, appnames, appending=None):
         paths = []
 
         for name in appnames:
             try:
-                params = imp.find_module(name)
-                module = imp.load_module(name, *params)
-                module_filename = module.__file__
-                module_path = dirname(module_filename)
+                module_path = self.get_app_path(name)
             except ImportError:
                 module_path = name
                 if os_path.exists(module_path):
@@ -151,12 +367,404 @@ class Nose(DjangoTestSuiteRunner):
             print "Uncle Bob is running the database migrations..."
             management.call_command('migrate')
 
+    def get_schema_fingerprint(self):
+        # django's own apps and the ignored ones have tables as well
+        app_paths = self.get_paths_for(settings.INSTALLED_APPS)
+        return databases.get_fingerprint(app_paths)
+
+    def build_databases(self):
+        with self.timer.phase('setup_databases'):
+            old_config = self.setup_databases()
+
+        with self.timer.phase('migrate'):
+            self.migrate_to_south_if_needed()
+
+        return old_config
+
+    def setup_migrated_databases(self):
+        if not self.snapshots:
+            return self.build_databases()
+
+        fingerprint = self.get_schema_fingerprint()
+        if snapshots.has_snapshots(fingerprint):
+            print "Uncle Bob is loading the migrated database snapshot..."
+            with self.timer.phase('load_snapshot'):
+                return snapshots.load_snapshots(fingerprint)
+
+        old_config = self.build_databases()
+        snapshots.save_snapshots(old_config, fingerprint)
+        return old_config
+
+    def setup_reused_databases(self):
+        if not databases.can_be_reused():
+            print "Uncle Bob can't reuse in-memory test databases..."
+            self.reuse_db = False
+            return self.setup_migrated_databases()
+
+        fingerprint = self.get_schema_fingerprint()
+
+        if databases.is_up_to_date(fingerprint):
+            print "Uncle Bob is reusing the test database..."
+            with self.timer.phase('reuse_databases'):
+                return databases.point_to_test_databases()
+
+        print "Uncle Bob is rebuilding the test database..."
+        old_interactive = self.interactive
+        self.interactive = False  # the old test database must go away
+        old_config = self.setup_migrated_databases()
+        self.interactive = old_interactive
+
+        databases.save_fingerprint(fingerprint)
+        return old_config
+
+    def prepare_databases(self):
+        old_verbosity = self.verbosity
+        self.verbosity = 0
+        print "Uncle Bob is preparing the test database..."
+        self.setup_test_environment()
+        if getattr(settings, 'UNCLEBOB_SQLITE_IN_MEMORY', False):
+            pristine.use_memory_for_sqlite()
+
+        if self.reuse_db:
+            old_config = self.setup_reused_databases()
+        else:
+            old_config = self.setup_migrated_databases()
+
+        if self.get_setting_or_list('UNCLEBOB_RESTORE_KINDS'):
+            pristine.keep_pristine_copies()
+
+        self.verbosity = old_verbosity
+        return old_config
+
+    def teardown_databases(self, old_config, **kwargs):
+        if self.reuse_db:
+            databases.leave_test_databases(old_config)
+        else:
+            super(Nose, self).teardown_databases(old_config, **kwargs)
+
     def sip_some_bourbon(self):
         try:
             import bourbon
         except Exception:
             pass
 
+    def get_test_paths(self, app_names, options):
+        specific_kind = False
+        paths = []
+
+        for kind in kinds:
+            if options['is_%s' % kind] is True:
+                specific_kind = True
+                paths.extend(self.get_paths_for(app_names,
+                                                appending=['tests', kind]))
+
+        if not specific_kind:
+            paths.extend(self.get_paths_for(app_names, appending=['tests']))
+
+        if self.discovery_index is not None:
+            # nose gets the test modules straight from the index rather
+            # than walking the test directories by itself
+            expanded = self.discovery_index.expand(paths)
+            self.discovery_index.save()
+            # handed no path at all, nose would collect the whole current
+            # directory, so the empty test directories are kept instead
+            if expanded:
+                paths = expanded
+
+        return paths
+
+    def select_changed_tests(self, app_names, paths, ref):
+        modules = self.find_test_modules(paths)
+        graph = ImportGraph.load(sys.path, os.getcwd())
+        selected = graph.select(
+            modules, get_changed_files(ref),
+            app_paths=self.get_paths_for(app_names))
+        graph.save()
+
+        print "Uncle Bob selected %d of %d test modules affected by the " \
+            "changes since %s..." % (len(selected), len(modules), ref)
+        return selected
+
+    def get_module_weights(self, modules):
+        durations = {}
+        if History.exists():
+            history = History.open()
+            durations = history.get_module_durations(relative_to=os.getcwd())
+            history.close()
+
+        known = {}
+        for module in modules:
+            relative = os_path.relpath(module)
+            if relative in durations:
+                known[module] = durations[relative]
+
+        return estimate_durations(modules, known)
+
+    def select_shard(self, paths, shard):
+        index, total = shard
+        # relative paths, so that every node comes up with the same shards
+        modules = [os_path.relpath(module) for module in
+                   self.find_test_modules(paths)]
+        buckets = parallel.balance(
+            modules, total, self.get_module_weights(modules))
+
+        selected = buckets[index - 1]
+        print "Uncle Bob picked shard %d/%d: %d of %d test modules..." % (
+            index, total, len(selected), len(modules))
+        return map(os_path.abspath, selected)
+
+    def select_last_failed(self, paths):
+        failures = select_failures(load_failures(), paths)
+        if not failures:
+            print "Uncle Bob found no failed tests to rerun, running " \
+                "them all..."
+            return paths
+
+        print "Uncle Bob is rerunning the %d tests that failed last " \
+            "time..." % len(failures)
+        return failures
+
+    def sort_failed_first(self, modules):
+        failures = load_failures()
+        if not failures:
+            return modules
+
+        return failed_first(modules, failures)
+
+    def split_unit_tests(self, paths):
+        """the unit test modules out of paths, and the paths left. Both
+        are empty unless there is something left that needs a database"""
+        modules = self.find_test_modules(paths)
+        unit = [module for module in modules if classify(module)[1] == 'unit']
+        rest = [module for module in modules if module not in unit]
+        if not unit or not rest:
+            return [], paths
+
+        return unit, rest
+
+    def start_unit_tests(self, nose_argv, modules, processes, plugins):
+        """forks workers running the unit tests, which need no database,
+        while this process gets the test database ready"""
+        buckets = filter(None, parallel.balance(
+            modules, processes, self.get_module_weights(modules)))
+        print "Uncle Bob is running %d unit test modules while the test " \
+            "database gets ready..." % len(modules)
+
+        def prepare(index):
+            # the unit tests get everything the other tests get, but the
+            # database
+            self.setup_test_environment()
+            self.sip_some_bourbon()
+
+        return parallel.Workers(
+            unique(nose_argv), prepare=prepare, plugins=plugins,
+            limits=self.get_worker_limits()).start_all(buckets)
+
+    def needs_database(self, paths):
+        "whether any of the selected tests is not a unit test"
+        if not paths:
+            return True  # nose looks for tests all over the current dir
+
+        return any(classify(path)[1] != 'unit' for path in paths)
+
+    def run_nose(self, argv, plugins):
+        if not plugins:
+            return nose.run(argv=argv)
+
+        return nose.run(argv=argv, addplugins=plugins)
+
+    def get_worker_limits(self):
+        limits = dict(
+            max_tests=getattr(settings, 'UNCLEBOB_WORKER_MAX_TESTS', None),
+            max_rss=getattr(settings, 'UNCLEBOB_WORKER_MAX_RSS', None),
+        )
+        if any(limits.values()):
+            return limits
+
+    def preload(self, modules):
+        """imports the apps, their models and, with
+        settings.UNCLEBOB_PRELOAD_TESTS, the test modules, so that the
+        workers forked afterwards share them rather than import them"""
+        for name in self.get_apps():
+            try:
+                import_module(name)
+            except Exception:
+                pass  # the workers will report it
+
+        models.get_apps()  # loads the models of every installed app
+        if getattr(settings, 'UNCLEBOB_PRELOAD_TESTS', False):
+            parallel.preload_modules(modules)
+
+        parallel.freeze()
+
+    def run_in_processes(self, nose_argv, paths, processes, old_config=None,
+                         plugins=()):
+        modules = self.find_test_modules(paths)
+        buckets = filter(None, parallel.balance(
+            modules, processes, self.get_module_weights(modules)))
+        if self.failed_first:
+            buckets = map(self.sort_failed_first, buckets)
+
+        print "Uncle Bob is splitting %d test modules between %d " \
+            "processes..." % (len(modules), len(buckets))
+
+        return self.run_buckets(nose_argv, buckets, old_config, plugins)
+
+    def run_tiers(self, nose_argv, paths, old_config=None, plugins=()):
+        "runs each kind of tests in a process of its own"
+        tiers = {}
+        for module in self.find_test_modules(paths):
+            tiers.setdefault(classify(module)[1] or 'other', []).append(
+                module)
+
+        names = sorted(tiers)
+        print "Uncle Bob is running the %s tests in processes of their " \
+            "own..." % ', '.join(names)
+
+        buckets = [tiers[name] for name in names]
+        if self.failed_first:
+            buckets = map(self.sort_failed_first, buckets)
+
+        return self.run_buckets(nose_argv, buckets, old_config, plugins)
+
+    def run_buckets(self, nose_argv, buckets, old_config=None, plugins=()):
+        "runs every bucket of test modules in a worker process"
+        modules = sum(buckets, [])
+        with self.timer.phase('preload'):
+            self.preload(modules)
+
+        limits = self.get_worker_limits()
+        if old_config is None:
+            return parallel.run_in_processes(
+                unique(nose_argv), buckets, plugins=plugins, limits=limits)
+
+        # one migrated database was built already, every worker gets a
+        # copy of it instead of building its own
+        clones = TemplateClones(old_config)
+        clones.create(len(buckets))
+        try:
+            return parallel.run_in_processes(
+                unique(nose_argv), buckets, prepare=clones.prepare,
+                plugins=plugins, limits=limits)
+        finally:
+            clones.drop()
+
+    def run_watched(self, nose_argv, modules, graph, changed, plugins,
+                    old_config=None):
+        # the worker is forked out of this warm process, but whatever
+        # this process imported out of the changed files is stale there
+        stale = find_stale_modules(graph, changed)
+
+        # and it gets a copy of the test database, so that what a run
+        # leaves in there never reaches the next one
+        clones = TemplateClones(old_config)
+        clones.create(1)
+
+        def prepare(index):
+            forget_modules(stale)
+            clones.prepare(index)
+
+        try:
+            passed, reports = parallel.run_in_processes(
+                unique(nose_argv), [modules], prepare=prepare,
+                plugins=plugins)
+        finally:
+            clones.drop()
+
+        if self.record_failures:
+            self.save_failures(reports)
+
+        return passed, reports
+
+    def watch(self, nose_argv, app_names, paths, plugins, old_config=None):
+        """runs the selected tests, then the ones affected by every
+        change made to the apps, until interrupted. Schema changes need a
+        new test database, so they make unclebob start over"""
+        app_paths = self.get_paths_for(app_names)
+        fingerprint = self.get_schema_fingerprint()
+        graph = ImportGraph.load(sys.path, os.getcwd())
+        watcher = Watcher(app_paths)
+        changed = set()
+
+        modules = self.find_test_modules(paths)
+        passed, reports = self.run_watched(
+            nose_argv, modules, graph, changed, plugins, old_config)
+
+        try:
+            while True:
+                print "Uncle Bob is watching %d apps for changes, " \
+                    "ctrl-c to stop..." % len(app_paths)
+                news = watcher.wait()
+                if self.get_schema_fingerprint() != fingerprint:
+                    print "Uncle Bob noticed the models changed, " \
+                        "starting over..."
+                    self.restart = True
+                    break
+
+                changed.update(news)
+                modules = self.find_test_modules(paths)
+                selected = graph.select(modules, news, app_paths)
+                graph.save()
+                if not selected:
+                    continue
+
+                print "Uncle Bob is running the %d test modules affected " \
+                    "by %s..." % (len(selected), ', '.join(
+                        map(os_path.relpath, news)))
+                passed, reports = self.run_watched(
+                    nose_argv, selected, graph, changed, plugins,
+                    old_config)
+        except KeyboardInterrupt:
+            print "Uncle Bob stopped watching."
+
+        return passed, []
+
+    def save_durations(self, reports, count=None):
+        history = History.open()
+        run = history.add_run(collect(reports, Durations), self.timer.phases)
+        if count:
+            print history.format_report(run, count)
+
+        history.close()
+
+    def report_queries(self, reports, count):
+        records = collect(reports, Queries)
+
+        if records:
+            print queries.format_report(records, count)
+
+    def report_memory(self, reports, count):
+        records = collect(reports, Memory)
+
+        if records:
+            print memory.format_report(records, count)
+
+    def report_profiles(self, reports, count):
+        records = collect(reports, Profile)
+
+        if not records:
+            return
+
+        stats = profiling.aggregate(records)
+        print profiling.format_report(stats, records, count)
+        print
+        print "Uncle Bob saved the profiles under %s, all.pstats merges " \
+            "them and stacks.txt is ready for flamegraph.pl" % \
+            os_path.relpath(profiling.get_profiles_dir())
+
+    def save_trace(self, reports, path):
+        records = collect(reports, Trace)
+
+        trace.save(path, trace.build(self.timer.phases, records))
+        print "Uncle Bob wrote the timeline of the run to %s, open it " \
+            "with chrome://tracing or https://ui.perfetto.dev" % path
+
+    def save_failures(self, reports):
+        failures = save_failures(dict(collect(reports, Outcomes)))
+        if failures:
+            print "Uncle Bob will remember the %d failed tests, rerun " \
+                "them with --last-failed" % len(failures)
+
     def run_tests(self, test_labels, extra_tests=None, **kwargs):
         # Pretend it's a production environment.
         settings.DEBUG = False
@@ -167,54 +775,176 @@ class Nose(DjangoTestSuiteRunner):
 
         old_config = None
 
-        options = self.get_argv_options()
+        with self.timer.phase('options'):
+            options = self.get_argv_options()
+
+        self.sampler = self.start_sampling()
+        self.reuse_db = self.get_reuse_db(options)
+        self.snapshots = self.get_snapshots(options)
+        self.selector = get_selector(nose_argv)
+        self.discovery_index = self.get_discovery_index()
+        self.record_durations = self.get_record_durations(options)
+        self.record_failures = self.get_record_failures(options)
+        self.failed_first = options.get('failed_first')
+        # as early as possible, so that the imports count as well
+        self.measurement = self.start_measuring_coverage(options, nose_argv)
+        if self.measurement is not None:
+            nose_argv = cover.without_nose_coverage(nose_argv)
+        if options.get('watch'):
+            # tests modules may come and go while watching, the index
+            # would only know about those that were there at first
+            self.discovery_index = None
 
         is_unit = options['is_unit']
         is_functional = options['is_functional']
         is_integration = options['is_integration']
 
         not_unitary = not is_unit or (is_functional or is_integration)
-        specific_kind = is_unit or is_functional or is_integration
 
-        apps = []
+        changed_since = options.get('changed_since')
+        shard = options.get('shard')
+        last_failed = options.get('last_failed')
+        with self.timer.phase('discovery'):
+            apps = self.get_test_paths(app_names, options)
+            if changed_since:
+                apps = self.select_changed_tests(
+                    app_names, apps, changed_since)
+
+            if shard:
+                apps = self.select_shard(apps, shard)
+
+            if last_failed:
+                apps = self.select_last_failed(apps)
+            elif self.failed_first:
+                modules = self.find_test_modules(apps)
+                if modules:
+                    apps = self.sort_failed_first(modules)
+
+        if (changed_since or shard) and not apps:
+            if self.sampler is not None:
+                self.stop_sampling([])
 
-        for kind in ('unit', 'functional', 'integration'):
-            if options['is_%s' % kind] is True:
-                apps.extend(self.get_paths_for(app_names,
-                                               appending=['tests', kind]))
-
-        if not specific_kind:
-            apps.extend(self.get_paths_for(app_names, appending=['tests']))
+            return 0
 
-        nose_argv.extend(apps)
+        if last_failed:
+            # the failed tests are known one by one, when all of them are
+            # unit tests there is no database to prepare
+            not_unitary = not_unitary and self.needs_database(apps)
 
         eligible_for_test_db = not getattr(
             settings, 'UNCLEBOB_NO_DATABASE', False)
 
-        if eligible_for_test_db and not_unitary:
-            # eligible_for_test_db means the user did not set the
-            # settings.UNCLEBOB_NO_DATABASE = True
-
-            # and
-
-            # not unitary means that should create a test database and
-            # migrate if needed (support only south now)
-            old_verbosity = self.verbosity
-            self.verbosity = 0
-            print "Uncle Bob is preparing the test database..."
-            self.setup_test_environment()
-            old_config = self.setup_databases()
-            self.migrate_to_south_if_needed()
-            self.verbosity = old_verbosity
+        # eligible_for_test_db means the user did not set the
+        # settings.UNCLEBOB_NO_DATABASE = True
+
+        # and
+
+        # not unitary means that should create a test database and
+        # migrate if needed (support only south now)
+
+        # unless a server process did it already and owns it
+        owns_test_db = eligible_for_test_db and not_unitary and \
+            self.warm_databases is None
+
+        processes = self.get_processes(options)
+        tiers_parallel = options.get('tiers_parallel')
+        overlap = tiers_parallel or self.get_overlap_db_setup(options)
+
+        # the workers get a copy of the test database, which only works
+        # for some engines, so find out before building it
+        clone_reruns = True
+        if eligible_for_test_db and not_unitary and \
+           (processes > 1 or tiers_parallel or options.get('watch')):
+            unclonable = databases.get_unclonable_engines()
+            if unclonable and options.get('watch'):
+                print "Uncle Bob can't clone %s databases, every rerun " \
+                    "shares the test database..." % ', '.join(unclonable)
+                clone_reruns = False
+            elif unclonable:
+                print "Uncle Bob can't clone %s databases, running the " \
+                    "tests in a single process..." % ', '.join(unclonable)
+                processes = 1
+                tiers_parallel = False
+
+        if options.get('profile'):
+            profiling.erase()
+
+        plugins = self.get_plugins(options)
+
+        unit_workers = None
+        if owns_test_db and overlap and not options.get('watch'):
+            unit_modules, apps = self.split_unit_tests(apps)
+            if unit_modules:
+                unit_workers = self.start_unit_tests(
+                    nose_argv, unit_modules,
+                    tiers_parallel and 1 or processes, plugins)
+
+        if owns_test_db:
+            old_config = self.prepare_databases()
+        elif eligible_for_test_db and not_unitary:
+            old_config = self.warm_databases
 
         print "Uncle Bob will run the tests now..."
 
-        self.sip_some_bourbon()  # loading the "bourbon.py" file
-        passed = nose.run(argv=unique(nose_argv))
+        with self.timer.phase('bourbon'):
+            self.sip_some_bourbon()  # loading the "bourbon.py" file
 
-        if eligible_for_test_db and not_unitary:
-            self.teardown_databases(old_config)
-            self.teardown_test_environment()
+        try:
+            with self.timer.phase('tests'):
+                if options.get('watch'):
+                    passed, reports = self.watch(
+                        nose_argv, app_names, apps, plugins,
+                        old_config=clone_reruns and old_config or None)
+                elif tiers_parallel:
+                    passed, reports = self.run_tiers(
+                        nose_argv, apps, old_config=old_config,
+                        plugins=plugins)
+                elif processes > 1:
+                    passed, reports = self.run_in_processes(
+                        nose_argv, apps, processes, old_config=old_config,
+                        plugins=plugins)
+                else:
+                    passed = self.run_nose(unique(nose_argv + apps), plugins)
+                    reports = [dict((plugin.name, plugin.get_report())
+                                    for plugin in plugins)]
+
+                if unit_workers is not None:
+                    unit_passed, unit_reports = unit_workers.wait()
+                    passed = passed and unit_passed
+                    reports.extend(unit_reports)
+        finally:
+            if owns_test_db:
+                with self.timer.phase('teardown'):
+                    self.teardown_databases(old_config)
+                    self.teardown_test_environment()
+
+        if self.measurement is not None:
+            print "Uncle Bob is combining the coverage of every process..."
+            self.measurement.combine()
+
+        if self.record_durations:
+            self.save_durations(reports, options.get('durations'))
+
+        if self.record_failures:
+            self.save_failures(reports)
+
+        if options.get('queries'):
+            self.report_queries(reports, options['queries'])
+
+        if options.get('memory'):
+            self.report_memory(reports, options['memory'])
+
+        if options.get('profile'):
+            self.report_profiles(reports, options['profile'])
+
+        if self.sampler is not None:
+            self.stop_sampling(reports, options.get('samples'))
+
+        if options.get('trace'):
+            self.save_trace(reports, options['trace'])
+
+        if self.restart:
+            os.execv(sys.executable, [sys.executable] + sys.argv)
 
         if passed:
             return 0
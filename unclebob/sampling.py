@@ -0,0 +1,134 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import signal
+
+from unclebob import cache
+
+SAMPLES_FILE = 'samples.txt'
+
+
+def label(code):
+    "how a code object shows up in a stack"
+    return '%s:%d(%s)' % (os.path.basename(code.co_filename),
+                          code.co_firstlineno, code.co_name)
+
+
+class Sampler(object):
+    """a statistical profiler: every `interval` seconds of cpu the process
+    spends, it counts the stack it was in, under the phase of the run and
+    the test that were going on. At 100 samples a second it costs next to
+    nothing, so it can stay on"""
+
+    def __init__(self, timer, interval=0.01, depth=64):
+        self.timer = timer
+        self.interval = interval
+        self.depth = depth
+        self.test = None
+        self.counts = {}
+        self.pid = None
+        self.previous = None
+
+    def sample(self, signum, frame):
+        codes = []
+        while frame is not None and len(codes) < self.depth:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+
+        key = (self.timer.current or 'other', self.test, tuple(codes))
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        "starts sampling, unless this is not the main thread"
+        try:
+            self.previous = signal.signal(signal.SIGPROF, self.sample)
+        except ValueError:
+            return False
+
+        # blocking calls must not fail with EINTR because of a sample
+        signal.siginterrupt(signal.SIGPROF, False)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.pid = os.getpid()
+        self.counts = {}
+        return True
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous or signal.SIG_DFL)
+        self.pid = None
+
+    def is_running(self):
+        "whether it samples this very process, forks don't inherit timers"
+        return self.pid == os.getpid()
+
+    def get_stacks(self):
+        """the samples as collapsed stacks, the phase and the test (or -)
+        being the first two frames"""
+        stacks = {}
+        for (phase, test, codes), count in self.counts.items():
+            stack = ';'.join([phase, (test or '-').replace(';', '_')] +
+                             map(label, reversed(codes)))
+            stacks[stack] = stacks.get(stack, 0) + count
+
+        return stacks
+
+
+def save(stacks, interval):
+    "writes the collapsed stacks, in microseconds, to .unclebob/samples.txt"
+    lines = ['%s %d\n' % (stack, int(count * interval * 1000000))
+             for stack, count in sorted(stacks.items())]
+    cache.write(SAMPLES_FILE, ''.join(lines))
+
+
+def total_by(stacks, position):
+    "the samples per phase (position 0), test (1) or function (-1)"
+    totals = {}
+    for stack, count in stacks.items():
+        name = stack.split(';')[position]
+        totals[name] = totals.get(name, 0) + count
+
+    return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+
+def format_report(stacks, interval, count):
+    "the cpu time per phase, then the busiest tests and functions"
+    seconds = lambda samples: samples * interval
+    lines = ['', 'Uncle Bob took %d samples, cpu time per phase:' %
+             sum(stacks.values())]
+    for phase, samples in total_by(stacks, 0):
+        lines.append('  %8.2fs  %s' % (seconds(samples), phase))
+
+    lines.extend(['', "Uncle Bob's %d tests with the most cpu time:" % count])
+    tests = [(test, samples) for test, samples in total_by(stacks, 1)
+             if test != '-']
+    for test, samples in tests[:count]:
+        lines.append('  %8.2fs  %s' % (seconds(samples), test))
+
+    lines.extend(['', "Uncle Bob's %d busiest functions:" % count])
+    for function, samples in total_by(stacks, -1)[:count]:
+        lines.append('  %8.2fs  %s' % (seconds(samples), function))
+
+    return '\n'.join(lines)
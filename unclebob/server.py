@@ -0,0 +1,193 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import sys
+import json
+import socket
+import traceback
+
+from unclebob import cache, databases
+from unclebob.graph import ImportGraph
+from unclebob.client import MARKER, SOCKET_FILE, read_line
+from unclebob.watch import Watcher, find_stale_modules, forget_modules
+
+
+def get_exit_status(status):
+    """the exit status of a child, out of what waitpid returned. A child
+    killed by a signal exits with 128 plus the signal, like in a shell"""
+    if os.WIFSIGNALED(status):
+        return 128 + os.WTERMSIG(status)
+
+    return os.WEXITSTATUS(status)
+
+
+def get_exit_code(error):
+    "the status a SystemExit stands for, like the interpreter would tell"
+    if error.code is None:
+        return 0
+
+    if isinstance(error.code, int):
+        return error.code
+
+    print >> sys.stderr, error.code
+    return 1
+
+
+class Server(object):
+    """keeps django, the test runner and the migrated test databases
+    loaded, and runs the tests clients ask for over a unix socket, each
+    run in a child forked out of this process"""
+
+    def __init__(self, runner, path=None):
+        self.runner = runner
+        self.path = path or cache.writable_path(SOCKET_FILE)
+        self.old_config = None
+        self.clonable = True
+        self.fingerprint = None
+        self.watcher = None
+        self.graph = None
+        self.changed = set()
+
+    def start(self):
+        runner = self.runner
+        options = runner.get_argv_options()
+        runner.reuse_db = runner.get_reuse_db(options)
+        runner.snapshots = runner.get_snapshots(options)
+
+        app_paths = runner.get_paths_for(runner.get_apps())
+        self.fingerprint = runner.get_schema_fingerprint()
+        self.watcher = Watcher(app_paths)
+        self.graph = ImportGraph.load(sys.path, os.getcwd())
+
+        from django.conf import settings
+        if not getattr(settings, 'UNCLEBOB_NO_DATABASE', False):
+            self.old_config = runner.prepare_databases()
+            runner.warm_databases = self.old_config
+
+            unclonable = databases.get_unclonable_engines()
+            if unclonable:
+                print "Uncle Bob can't clone %s databases, every run " \
+                    "shares the test database..." % ', '.join(unclonable)
+                self.clonable = False
+
+    def stop(self):
+        if self.old_config is not None:
+            self.runner.teardown_databases(self.old_config)
+            self.runner.teardown_test_environment()
+
+    def listen(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)  # left behind by a server that died
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen(5)
+        return listener
+
+    def serve_forever(self):
+        "serves one run at a time, until interrupted"
+        self.start()
+        listener = self.listen()
+        print "Uncle Bob is serving the tests at %s, ctrl-c to stop..." % (
+            os.path.relpath(self.path))
+
+        restart = False
+        try:
+            while not restart:
+                connection, _ = listener.accept()
+                try:
+                    restart = self.handle(connection)
+                finally:
+                    connection.close()
+        except KeyboardInterrupt:
+            print "Uncle Bob stopped serving the tests."
+        finally:
+            listener.close()
+            os.remove(self.path)
+            self.stop()
+
+        if restart:
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def handle(self, connection):
+        "runs a request, returning whether the server must start over"
+        request = json.loads(read_line(connection) or '{}')
+        argv = request.get('argv', [])
+
+        self.changed.update(self.watcher.poll())
+        if self.runner.get_schema_fingerprint() != self.fingerprint:
+            connection.sendall(
+                "Uncle Bob noticed the models changed, restarting the "
+                "server...\n%srestart\n" % MARKER)
+            return True
+
+        print "Uncle Bob is running: test %s" % ' '.join(argv)
+        status = self.fork(connection, argv)
+        connection.sendall('%s%d\n' % (MARKER, status))
+        return False
+
+    def fork(self, connection, argv):
+        # the child must open its own connections, an in-memory sqlite
+        # database is the only one that can't be shared that way
+        databases.close_connections()
+        stale = find_stale_modules(self.graph, self.changed)
+        self.graph.save()
+
+        # and it gets a copy of the test databases, so that what a run
+        # leaves in there never reaches the next one
+        clones = databases.TemplateClones(
+            self.clonable and self.old_config or None)
+        clones.create(1)
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid:
+            try:
+                return get_exit_status(os.waitpid(pid, 0)[1])
+            finally:
+                clones.drop()
+
+        status = 1
+        try:
+            os.dup2(connection.fileno(), 1)
+            os.dup2(connection.fileno(), 2)
+            forget_modules(stale)
+            clones.prepare(0)
+            status = self.run(argv)
+        except SystemExit, e:
+            status = get_exit_code(e)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    def run(self, argv):
+        (_, labels) = self.runner.get_argv_parser().parse_args(argv)
+        sys.argv = ['manage.py', 'test'] + argv
+        return self.runner.run_tests(labels)
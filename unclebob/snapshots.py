@@ -0,0 +1,150 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+
+from glob import glob
+from os.path import exists
+
+from unclebob import cache
+from unclebob.databases import (
+    get_maintenance_connection,
+    get_test_connections,
+    get_test_name,
+    is_postgresql,
+    is_sqlite,
+    database_exists,
+    point_to_test_databases,
+)
+
+
+def get_dump_name(connection, fingerprint):
+    return os.path.join(
+        'snapshots', '%s-%s.sql' % (connection.alias, fingerprint))
+
+
+def get_template_name(connection, fingerprint):
+    return '%s_snapshot_%s' % (get_test_name(connection), fingerprint[:12])
+
+
+def get_template_record(connection):
+    return os.path.join('snapshots', '%s-template' % connection.alias)
+
+
+def is_supported(connection):
+    return is_sqlite(connection) or is_postgresql(connection)
+
+
+def has_snapshot(connection, fingerprint):
+    if is_sqlite(connection):
+        return exists(cache.cache_path(get_dump_name(connection, fingerprint)))
+
+    return database_exists(
+        connection, get_template_name(connection, fingerprint))
+
+
+def has_snapshots(fingerprint):
+    connections = get_test_connections()
+    return all(is_supported(connection) and
+               has_snapshot(connection, fingerprint)
+               for connection in connections)
+
+
+def run_ddl(connection, old_name, *statements):
+    "runs CREATE/DROP DATABASE statements away from the test database"
+    maintenance = get_maintenance_connection(connection, old_name)
+    cursor = maintenance.cursor()
+    maintenance.creation._prepare_for_test_db_ddl()
+    quote = maintenance.ops.quote_name
+    for statement, names in statements:
+        cursor.execute(statement % tuple(map(quote, names)))
+
+    maintenance.close()
+
+
+def save_snapshot(connection, old_name, fingerprint):
+    """keeps the schema and the migration history of the freshly
+    migrated test database of connection"""
+    if is_sqlite(connection):
+        connection.cursor()
+        dump = u'\n'.join(connection.connection.iterdump())
+
+        # snapshots of older migrations are useless from now on
+        stale = cache.cache_path('snapshots', '%s-*.sql' % connection.alias)
+        for path in glob(stale):
+            os.remove(path)
+
+        cache.write(get_dump_name(connection, fingerprint),
+                    dump.encode('utf-8'))
+        return
+
+    template = get_template_name(connection, fingerprint)
+    statements = [('DROP DATABASE IF EXISTS %s', [template])]
+
+    # the template of older migrations is useless from now on
+    previous = cache.read(get_template_record(connection))
+    if previous and previous != template:
+        statements.append(('DROP DATABASE IF EXISTS %s', [previous]))
+
+    statements.append(('CREATE DATABASE %s TEMPLATE %s', [
+        template, connection.settings_dict['NAME']]))
+
+    connection.close()
+    run_ddl(connection, old_name, *statements)
+    cache.write(get_template_record(connection), template)
+
+
+def load_snapshot(connection, old_name, fingerprint):
+    "fills the test database of connection in one go"
+    test_name = connection.settings_dict['NAME']
+
+    if is_sqlite(connection):
+        if exists(test_name):
+            os.remove(test_name)
+
+        dump = cache.read(get_dump_name(connection, fingerprint))
+        connection.cursor()
+        connection.connection.executescript(dump.decode('utf-8'))
+        return
+
+    run_ddl(connection, old_name,
+            ('DROP DATABASE IF EXISTS %s', [test_name]),
+            ('CREATE DATABASE %s TEMPLATE %s', [
+                test_name, get_template_name(connection, fingerprint)]))
+
+
+def save_snapshots(old_config, fingerprint):
+    old_names, mirrors = old_config
+    for connection, old_name, destroy in old_names:
+        if destroy and is_supported(connection):
+            save_snapshot(connection, old_name, fingerprint)
+
+
+def load_snapshots(fingerprint):
+    """creates the test databases out of their snapshots and returns the
+    same kind of old_config ``setup_databases`` does"""
+    return point_to_test_databases(
+        prepare=lambda connection, old_name: load_snapshot(
+            connection, old_name, fingerprint))
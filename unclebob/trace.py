@@ -0,0 +1,75 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import json
+
+
+def microseconds(seconds):
+    return int(seconds * 1000000)
+
+
+def span(name, category, started, seconds, pid, tid, **args):
+    "a complete event, as chrome://tracing and perfetto read them"
+    return dict(name=name, cat=category, ph='X', ts=microseconds(started),
+                dur=microseconds(seconds), pid=pid, tid=tid, args=args)
+
+
+def track_name(name, pid, tid):
+    return dict(name='thread_name', ph='M', pid=pid, tid=tid,
+                args=dict(name=name))
+
+
+def build(phases, records, pid=None):
+    """the events of a run: the phases of the runner on a track of its own,
+    then the tests on the track of the process that ran them"""
+    pid = pid or os.getpid()
+    events = [track_name('runner', pid, pid)]
+    for name, started, seconds in phases:
+        events.append(span(name, 'phase', started, seconds, pid, pid))
+
+    workers = []
+    for record in records:
+        tid = record['pid']
+        if tid != pid and tid not in workers:
+            workers.append(tid)
+            events.append(track_name(
+                'worker %d (pid %d)' % (len(workers), tid), pid, tid))
+
+        if record.get('test'):
+            events.append(span(
+                record['test'], record['kind'] or 'test', record['started'],
+                record['seconds'], pid, tid, outcome=record['outcome'],
+                app=record['app']))
+        else:
+            events.append(span('nose', 'process', record['started'],
+                               record['seconds'], pid, tid))
+
+    return events
+
+
+def save(path, events):
+    with open(path, 'w') as trace:
+        json.dump(dict(traceEvents=events, displayTimeUnit='ms'), trace)
@@ -0,0 +1,107 @@
+# #!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# <unclebob - django tool for running unit, functional and integration tests>
+# Copyright (C) <2011>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+import os
+import re
+import sys
+import time
+
+from os.path import abspath, getmtime, join
+
+IGNORED_SUFFIXES = ('.pyc', '.pyo', '.swp', '~')
+
+
+class Watcher(object):
+    """notices the files that are added, changed or removed under the
+    given directories, by polling their mtimes"""
+    interval = 0.5
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.mtimes = self.scan()
+
+    def scan(self):
+        mtimes = {}
+        for path in self.paths:
+            for root, dirnames, filenames in os.walk(path):
+                dirnames[:] = [name for name in dirnames
+                               if not name.startswith('.')]
+                for name in filenames:
+                    if name.startswith('.') or \
+                       name.endswith(IGNORED_SUFFIXES):
+                        continue
+
+                    filename = join(root, name)
+                    try:
+                        mtimes[filename] = getmtime(filename)
+                    except OSError:
+                        pass  # removed while we were looking
+
+        return mtimes
+
+    def poll(self):
+        "the files that changed since the last poll"
+        mtimes = self.scan()
+        changed = [filename for filename in set(mtimes) | set(self.mtimes)
+                   if mtimes.get(filename) != self.mtimes.get(filename)]
+        self.mtimes = mtimes
+        return sorted(changed)
+
+    def wait(self):
+        "blocks until something changes, and tells what did"
+        while True:
+            time.sleep(self.interval)
+            changed = self.poll()
+            if changed:
+                return changed
+
+
+def get_source(module):
+    filename = getattr(module, '__file__', None)
+    if filename:
+        return abspath(re.sub(r'\.py[co]$', '.py', filename))
+
+
+def find_stale_modules(graph, changed):
+    """the project files loaded in this process that import, directly
+    or not, any of the changed files"""
+    changed = set(changed)
+    stale = []
+    for module in sys.modules.values():
+        source = get_source(module)
+        if source and graph.is_project_file(source) and \
+           graph.get_reachable(source) & changed:
+            stale.append(source)
+
+    return stale
+
+
+def forget_modules(filenames):
+    """drops the modules loaded out of filenames, so that importing them
+    again runs their new code"""
+    filenames = set(filenames)
+    for name, module in sys.modules.items():
+        if get_source(module) in filenames:
+            del sys.modules[name]